@@ -1,8 +1,9 @@
 from datetime import datetime, timezone
-from app.utils.admin_cli_tool import create_admin, create_api_token, create_predigt_user, create_ocr_user, create_dating_graph_user
+from app.utils.admin_cli_tool import create_admin, create_api_token, create_predigt_user, create_ocr_user, create_dating_graph_user, import_songs
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+import multiprocessing
 import os
 
 # Initialize extensions
@@ -36,7 +37,10 @@ def create_app(config=None):
     db.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
-    
+
+    # Per-request SQL statement counts (X-Query-Count header in debug mode)
+    from app.utils.query_counter import init_query_counter
+    init_query_counter(app)
 
     # Add Cli
     app.cli.add_command(create_admin)
@@ -44,6 +48,7 @@ def create_app(config=None):
     app.cli.add_command(create_predigt_user)
     app.cli.add_command(create_ocr_user)
     app.cli.add_command(create_dating_graph_user)
+    app.cli.add_command(import_songs)
 
     # Import and register blueprints
     from app.blueprints.main import main_bp
@@ -65,10 +70,19 @@ def create_app(config=None):
     # Create database tables
     with app.app_context():
         db.create_all()
+        from app.models.predigt import upgrade_predigt_table
+        upgrade_predigt_table()
         
         # Import and register dynamic blueprints
         from app.utils.dynamic_blueprints import register_dynamic_blueprints
         register_dynamic_blueprints(app)
+
+    # Load the OCR models at startup instead of on the first OCR request
+    from app.workables.config.manager import get_typed_config
+    # Not in multiprocessing children: spawned OCR workers re-import run.py and build the app again
+    if get_typed_config().ocr_preload and multiprocessing.parent_process() is None:
+        from app.blueprints.ocr.inference import get_ocr_service
+        get_ocr_service()
     @app.context_processor
     def inject_now():
         return {'now': datetime.now(timezone.utc)}
@@ -8,6 +8,8 @@ from app import db
 from app.models.user import User
 from app.models.token import ApiToken
 from app.utils.auth import admin_required, login_required
+from app.utils.token_cache import invalidate_token, invalidate_user_tokens, token_cache_stats
+from app.workables.config.manager import ConfigError, reload_config, validate_config_data
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -46,10 +48,17 @@ def upload_config():
     if file and file.filename.endswith('.json'):
         config_file_path = get_config_file_path()
         try:
+            # Validate before replacing the active configuration
+            validate_config_data(file.read().decode('utf-8'))
+            file.seek(0)
+            
             # Ensure instance directory exists
             os.makedirs(current_app.instance_path, exist_ok=True)
             file.save(config_file_path)
+            reload_config(force=True)
             flash('Configuration file uploaded successfully.', 'success')
+        except (ConfigError, UnicodeDecodeError) as e:
+            flash(f"Invalid configuration file: {e}", "error")
         except Exception as e:
             flash(f"Error saving uploaded config file: {e}", "error")
     else:
@@ -68,16 +77,17 @@ def save_config():
 
     config_file_path = get_config_file_path()
     try:
-        # Validate if it's valid JSON before saving
-        json.loads(config_data) # This will raise an error if not valid JSON
+        # Validate JSON and config values before saving
+        validate_config_data(config_data) # This will raise an error if not valid
         
         # Ensure instance directory exists
         os.makedirs(current_app.instance_path, exist_ok=True)
         with open(config_file_path, 'w', encoding='utf-8') as f:
             f.write(config_data)
+        reload_config(force=True)
         flash('Configuration saved successfully.', 'success')
-    except json.JSONDecodeError:
-        flash('Invalid JSON content. Please correct it before saving.', 'error')
+    except ConfigError as e:
+        flash(f'Invalid configuration: {e}. Please correct it before saving.', 'error')
     except Exception as e:
         flash(f"Error saving configuration: {e}", "error")
         
@@ -103,6 +113,7 @@ def approve_user(user_id):
     user.is_approved = True
     # Commit user approval first
     db.session.commit()
+    invalidate_user_tokens(user.id)
 
     # Generate API token for the newly approved user - WITH user_id
     token = ApiToken(
@@ -123,6 +134,7 @@ def api_approve_user(user_id):
     user = User.query.get_or_404(user_id)
     user.is_approved = True
     db.session.commit()
+    invalidate_user_tokens(user.id)
     
     # Generate API token for the newly approved user
     token = ApiToken(user_id=user.id)
@@ -147,6 +159,7 @@ def decline_user(user_id):
     # Delete the user from the database
     db.session.delete(user)
     db.session.commit()
+    invalidate_user_tokens(user_id)
     
     flash(f'User {username} has been declined and removed', 'warning')
     return redirect(url_for('admin.pending_users'))
@@ -207,10 +220,18 @@ def delete_token(token_id):
     
     db.session.delete(token)
     db.session.commit()
+    invalidate_token(token_id, forget_stats=True)
     
     flash('Token was successfully deleted', 'success')
     return redirect(url_for('admin.manage_tokens'))
 
+@admin_bp.route('/tokens/cache-stats', methods=['GET'])
+@login_required
+@admin_required
+def token_cache_statistics():
+    """Hit/miss counters of the API token cache"""
+    return jsonify(token_cache_stats())
+
 @admin_bp.route('/users', methods=['GET'])
 @login_required
 @admin_required
@@ -333,6 +354,7 @@ def edit_user(user_id):
     
     try:
         db.session.commit()
+        invalidate_user_tokens(user.id)
         flash(f'Benutzer {user.username} erfolgreich aktualisiert', 'success')
     except Exception as e:
         db.session.rollback()
@@ -362,6 +384,7 @@ def delete_user(user_id):
         # Delete the user
         db.session.delete(user)
         db.session.commit()
+        invalidate_user_tokens(user_id)
         
         flash(f'Benutzer {username} und alle zugehörigen Daten wurden gelöscht', 'success')
     except Exception as e:
@@ -381,6 +404,7 @@ def toggle_user_approval(user_id):
     
     try:
         db.session.commit()
+        invalidate_user_tokens(user.id)
         status = "genehmigt" if user.is_approved else "gesperrt"
         flash(f'Benutzer {user.username} wurde {status}', 'success')
     except Exception as e:
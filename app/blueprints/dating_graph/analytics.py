@@ -0,0 +1,141 @@
+# Graph analytics over persons, connections and categories.
+# The networkx graph is built once per structural graph version (see versioning.py) and
+# every result computed on it is cached until the next person, category or connection
+# change; saving node positions does not invalidate it.
+import threading
+
+from app import db
+from app.models.dating_graph import Category, Connection, Person, person_category
+from app.blueprints.dating_graph.layout import load_networkx
+from app.blueprints.dating_graph.versioning import structural_version
+
+MAX_STRENGTH = 10
+MAX_CACHED_RESULTS = 10000  # Per structural version; mostly shortest paths
+
+
+class GraphAnalytics:
+    """Analytics for one structural graph version. Persons are nodes, connections are undirected edges."""
+
+    def __init__(self, version):
+        self.version = version
+        self.graph = load_networkx().Graph()
+        self.categories = {}
+        self.category_members = {}
+        self._results = {}
+        self._lock = threading.RLock()  # category_reach() uses the cached components()
+        self._load()
+
+    def _load(self):
+        for person_id, name, nickname, custom_id, status in db.session.query(
+                Person.id, Person.name, Person.nickname, Person.custom_id, Person.status):
+            self.graph.add_node(person_id, name=name, nickname=nickname, custom_id=custom_id, status=status)
+
+        for from_id, to_id, connection_type, strength in db.session.query(
+                Connection.from_person_id, Connection.to_person_id, Connection.connection_type, Connection.strength):
+            strength = min(max(strength or 5, 1), MAX_STRENGTH)
+            # Several connection types between the same pair collapse into the strongest one
+            if self.graph.has_edge(from_id, to_id) and self.graph[from_id][to_id]['strength'] >= strength:
+                continue
+            # Stronger connections are "shorter" when paths are weighted
+            self.graph.add_edge(from_id, to_id, strength=strength, connection_type=connection_type,
+                                distance=MAX_STRENGTH + 1 - strength)
+
+        self.categories = {category_id: (name, color) for category_id, name, color in
+                           db.session.query(Category.id, Category.name, Category.color)}
+        self.category_members = {category_id: set() for category_id in self.categories}
+        for person_id, category_id in db.session.query(person_category.c.person_id, person_category.c.category_id):
+            self.category_members.setdefault(category_id, set()).add(person_id)
+
+    def _cached(self, key, compute):
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+            result = compute()
+            if len(self._results) < MAX_CACHED_RESULTS:
+                self._results[key] = result
+            return result
+
+    def person(self, person_id):
+        attributes = self.graph.nodes[person_id]
+        return {'id': person_id, 'name': attributes['name'], 'nickname': attributes['nickname'],
+                'custom_id': attributes['custom_id'], 'status': attributes['status']}
+
+    def shortest_path(self, from_id, to_id, weighted=False):
+        """Shortest introduction path as a list of person ids, or None if they are not connected"""
+        nx = load_networkx()
+        if from_id not in self.graph or to_id not in self.graph:
+            raise KeyError('Unknown person')
+
+        def compute():
+            try:
+                return nx.shortest_path(self.graph, from_id, to_id, weight='distance' if weighted else None)
+            except nx.NetworkXNoPath:
+                return None
+        return self._cached(('path', from_id, to_id, weighted), compute)
+
+    def components(self):
+        """Connected components, largest first, as sorted lists of person ids"""
+        nx = load_networkx()
+        return self._cached('components', lambda: sorted(
+            (sorted(component) for component in nx.connected_components(self.graph)),
+            key=lambda component: (-len(component), component[0])
+        ))
+
+    def centrality(self):
+        """{person_id: {'degree', 'degree_centrality', 'betweenness'}}"""
+        nx = load_networkx()
+
+        def compute():
+            degree = nx.degree_centrality(self.graph) if len(self.graph) > 1 else {n: 0.0 for n in self.graph}
+            betweenness = nx.betweenness_centrality(self.graph)
+            return {
+                person_id: {
+                    'degree': self.graph.degree(person_id),
+                    'degree_centrality': round(degree[person_id], 4),
+                    'betweenness': round(betweenness[person_id], 4)
+                }
+                for person_id in self.graph
+            }
+        return self._cached('centrality', compute)
+
+    def category_reach(self):
+        """
+        Per category: direct members and everyone reachable from them through connections
+        (members plus the rest of their connected components).
+        """
+        def compute():
+            component_of = {}
+            for index, component in enumerate(self.components()):
+                for person_id in component:
+                    component_of[person_id] = index
+            sizes = [len(component) for component in self.components()]
+
+            reach = []
+            for category_id, (name, color) in self.categories.items():
+                members = self.category_members.get(category_id, set())
+                touched = {component_of[p] for p in members if p in component_of}
+                reach.append({
+                    'category_id': category_id,
+                    'name': name,
+                    'color': color,
+                    'direct': len(members),
+                    'reach': sum(sizes[i] for i in touched),
+                    'components': len(touched)
+                })
+            reach.sort(key=lambda item: (-item['reach'], item['name']))
+            return reach
+        return self._cached('category_reach', compute)
+
+
+_lock = threading.Lock()
+_analytics = None
+
+
+def get_graph_analytics():
+    """GraphAnalytics for the current structural version; rebuilt only after the graph changed"""
+    global _analytics
+    version = structural_version()
+    with _lock:
+        if _analytics is None or _analytics.version != version:
+            _analytics = GraphAnalytics(version)
+        return _analytics
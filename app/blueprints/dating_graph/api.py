@@ -1,12 +1,18 @@
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
-from flask_login import login_required
+from flask import Blueprint, current_app, render_template, request, jsonify, flash, redirect, session, url_for
+from flask_login import current_user, login_required
 from app import db
-from app.models.dating_graph import Category, Person, DateEvent, GraphSnapshot, person_category
+from app.models.dating_graph import Category, Person, DateEvent, GraphSnapshot, category_person_counts
 from datetime import datetime
-from sqlalchemy import or_, func
+from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
 from sqlalchemy.exc import IntegrityError
 
 from app.blueprints.dating_graph import dating_graph_bp
+from app.blueprints.dating_graph.analytics import get_graph_analytics
+from app.blueprints.dating_graph.layout import layout_graph, layout_missing_nodes
+from app.blueprints.dating_graph.positions import parse_positions, save_positions as save_node_positions
+from app.blueprints.dating_graph.statistics import get_graph_statistics
+from app.blueprints.dating_graph.versioning import category_edge_id, category_node_id, graph_changes, graph_version, oldest_diff_version, parse_category_edge_id, person_node_id
 
 # ============================================================================
 # WEB ROUTES
@@ -31,7 +37,8 @@ def get_persons():
     status = request.args.get('status')
     search = request.args.get('search')
     
-    query = Person.query
+    # Categories for all persons in one extra query instead of one per person
+    query = Person.query.options(selectinload(Person.categories))
     
     # Apply filters
     if category_id:
@@ -51,7 +58,8 @@ def get_persons():
         )
     
     persons = query.all()
-    return jsonify([p.to_dict() for p in persons])
+    counts = category_person_counts()
+    return jsonify([p.to_dict(counts) for p in persons])
 
 
 @dating_graph_bp.route('/api/persons/<int:person_id>', methods=['GET'])
@@ -61,7 +69,7 @@ def get_person(person_id):
     person = Person.query.get_or_404(person_id)
     
     # Include categories and dates
-    data = person.to_dict()
+    data = person.to_dict(category_person_counts())
     data['dates'] = [d.to_dict() for d in person.dates.order_by(DateEvent.date.desc())]
     
     return jsonify(data)
@@ -119,6 +127,9 @@ def create_person():
         db.session.add(person)
         db.session.commit()
         
+        # Give the new node a position next to its categories right away
+        layout_missing_nodes()
+        
         return jsonify(person.to_dict()), 201
         
     except IntegrityError as e:
@@ -189,7 +200,8 @@ def delete_person(person_id):
 def get_categories():
     """Get all categories"""
     categories = Category.query.all()
-    return jsonify([c.to_dict() for c in categories])
+    counts = category_person_counts()
+    return jsonify([c.to_dict(counts.get(c.id, 0)) for c in categories])
 
 
 @dating_graph_bp.route('/api/categories', methods=['POST'])
@@ -216,6 +228,8 @@ def create_category():
     db.session.add(category)
     db.session.commit()
     
+    layout_missing_nodes()
+    
     return jsonify(category.to_dict()), 201
 
 
@@ -317,39 +331,25 @@ def delete_date(date_id):
 @dating_graph_bp.route('/api/statistics', methods=['GET'])
 @login_required
 def get_statistics():
-    """Get overall statistics"""
-    total_persons = Person.query.count()
-    total_categories = Category.query.count()
-    total_dates = DateEvent.query.count()
-    
-    # Calculate total connections based on person-category relationships
-    # Count all category assignments across all persons
-    total_connections = db.session.query(func.count()).select_from(person_category).scalar()
-    
-    # Status breakdown
-    status_counts = db.session.query(
-        Person.status,
-        func.count(Person.id)
-    ).group_by(Person.status).all()
-    
-    # Category breakdown
-    category_stats = []
-    for category in Category.query.all():
-        category_stats.append({
-            'name': category.name,
-            'count': category.persons.count(),
-            'color': category.color
-        })
+    """Get overall statistics, read from the materialized GraphStatistics row"""
+    statistics = get_graph_statistics()
+    
+    # Category breakdown, in category creation order
+    category_stats = [
+        {'name': entry['name'], 'count': entry['count'], 'color': entry['color']}
+        for _, entry in sorted(statistics.category_counts.items(), key=lambda item: int(item[0]))
+    ]
     
     # Recent activity
     recent_dates = DateEvent.query.order_by(DateEvent.date.desc()).limit(5).all()
     
     return jsonify({
-        'total_persons': total_persons,
-        'total_categories': total_categories,
-        'total_connections': total_connections, 
-        'total_dates': total_dates,
-        'status_breakdown': dict(status_counts),
+        'total_persons': statistics.total_persons,
+        'total_categories': statistics.total_categories,
+        # Connections are the person-category assignments across all persons
+        'total_connections': statistics.total_connections, 
+        'total_dates': statistics.total_dates,
+        'status_breakdown': statistics.status_counts,
         'category_stats': category_stats,
         'recent_dates': [d.to_dict() for d in recent_dates]
     })
@@ -360,144 +360,333 @@ def get_statistics():
 @dating_graph_bp.route('/api/graph-data', methods=['GET'])
 @login_required
 def get_graph_data():
-    """Get complete graph data: categories as central nodes, persons connected to categories"""
-    persons = Person.query.all()
-    categories = Category.query.all()
-    
-    # Format for vis.js
-    nodes = []
-    edges = []
-    
-    # Add category nodes (central hubs) - LARGER AND MORE PROMINENT
-    for category in categories:
-        person_count = category.persons.count()
-        nodes.append({
-            'id': f'cat_{category.id}',
-            'label': f"📁 {category.name}\n({person_count} {'Person' if person_count == 1 else 'Personen'})",
-            'title': f"{category.name}\n{category.description or ''}\n{person_count} Personen",
-            'type': 'category',
-            'color': {
-                'background': category.color,
-                'border': category.color,
-                'highlight': {
-                    'background': category.color,
-                    'border': '#1f2937'
-                }
-            },
-            'shape': 'box',
-            'size': 40,  # Larger than person nodes
-            'font': {
-                'size': 18,
-                'color': '#ffffff',
-                'bold': True,
-                'multi': 'html'
-            },
-            'borderWidth': 3,
-            'x': category.position_x,
-            'y': category.position_y,
-            'fixed': False,
-            'icon': category.icon,
-            'margin': 15
+    """
+    Get complete graph data: categories as central nodes, persons connected to categories.
+    Needs a constant number of queries: persons, their categories (selectinload),
+    categories and one grouped person count.
+    With ?since=<version> only the nodes and edges added, changed or removed after that
+    graph version are returned (see _graph_diff); the full graph is sent if since is unknown
+    or older than the pruned change log.
+    """
+    version = graph_version()
+    since = request.args.get('since', type=int)
+    if since is not None and oldest_diff_version() <= since <= version:
+        response = jsonify(_graph_diff(since, version))
+    else:
+        # Nodes without coordinates are placed server side, so clients can skip physics
+        if layout_missing_nodes():
+            version = graph_version()
+        persons = Person.query.options(selectinload(Person.categories)).all()
+        categories = Category.query.all()
+        counts = category_person_counts()
+        
+        nodes = [_category_node(category, counts.get(category.id, 0)) for category in categories]
+        edges = []
+        for person in persons:
+            nodes.append(_person_node(person))
+            edges.extend(_category_edge(person, category) for category in person.categories)
+        
+        response = jsonify({
+            'version': version,
+            'nodes': nodes,
+            'edges': edges
         })
     
-    # Add person nodes
-    for person in persons:
-        # Get status icon
-        status_icons = {
-            'interested': '💖',
-            'dating': '❤️',
-            'friend': '😊',
-            'no_connection': '😐',
-            'ghosted': '👻',
-            'unknown': '❓'
+    response.headers['X-Graph-Version'] = str(version)
+    return response
+
+
+def _graph_diff(since, version):
+    """Nodes and edges changed after graph version `since`, built with a constant number of queries"""
+    changes = graph_changes(since)
+    node_ids = changes['nodes']['added'] | changes['nodes']['changed']
+    edge_ids = changes['edges']['added'] | changes['edges']['changed']
+    
+    person_ids = {int(node_id[len('person_'):]) for node_id in node_ids if node_id.startswith('person_')}
+    category_ids = {int(node_id[len('cat_'):]) for node_id in node_ids if node_id.startswith('cat_')}
+    edge_keys = [parse_category_edge_id(edge_id) for edge_id in edge_ids]
+    person_ids.update(person_id for person_id, _ in edge_keys)
+    category_ids.update(category_id for _, category_id in edge_keys)
+    
+    persons = {}
+    if person_ids:
+        persons = {p.id: p for p in Person.query.options(selectinload(Person.categories)).filter(Person.id.in_(person_ids))}
+    categories = {}
+    if category_ids:
+        categories = {c.id: c for c in Category.query.filter(Category.id.in_(category_ids))}
+    counts = category_person_counts() if category_ids else {}
+    
+    def build_nodes(ids):
+        nodes = []
+        for node_id in ids:
+            if node_id.startswith('person_'):
+                person = persons.get(int(node_id[len('person_'):]))
+                if person:
+                    nodes.append(_person_node(person))
+            else:
+                category = categories.get(int(node_id[len('cat_'):]))
+                if category:
+                    nodes.append(_category_node(category, counts.get(category.id, 0)))
+        return nodes
+    
+    def build_edges(ids):
+        edges = []
+        for edge_id in ids:
+            person_id, category_id = parse_category_edge_id(edge_id)
+            person, category = persons.get(person_id), categories.get(category_id)
+            # Skip edges whose membership vanished again since the change was logged
+            if person and category and category in person.categories:
+                edges.append(_category_edge(person, category))
+        return edges
+    
+    return {
+        'version': version,
+        'since': since,
+        'nodes': {
+            'added': build_nodes(sorted(changes['nodes']['added'])),
+            'changed': build_nodes(sorted(changes['nodes']['changed'])),
+            'removed': sorted(changes['nodes']['removed'])
+        },
+        'edges': {
+            'added': build_edges(sorted(changes['edges']['added'])),
+            'changed': build_edges(sorted(changes['edges']['changed'])),
+            'removed': sorted(changes['edges']['removed'])
         }
-        
-        nodes.append({
-            'id': f'person_{person.id}',
-            'label': f"{status_icons.get(person.status, '❓')} {person.nickname or person.name}",
-            'title': f"{person.name}\n{person.custom_id}\nStatus: {person.status}",
-            'type': 'person',
-            'status': person.status,
-            'custom_id': person.custom_id,
-            'person_id': person.id,
-            'shape': 'box',
-            'size': 20,
-            'font': {
-                'size': 14,
-                'color': '#1f2937'
-            },
-            'x': person.position_x,
-            'y': person.position_y,
-            'fixed': False,
-            'borderWidth': 2,
-            'color': {
-                'border': person.categories[0].color if person.categories else '#667eea',
-                'background': '#ffffff',
-                'highlight': {
-                    'border': person.categories[0].color if person.categories else '#667eea',
-                    'background': '#f0f0f0'
-                }
+    }
+
+
+# Status icons shown in person node labels
+STATUS_ICONS = {
+    'interested': '💖',
+    'dating': '❤️',
+    'friend': '😊',
+    'no_connection': '😐',
+    'ghosted': '👻',
+    'unknown': '❓'
+}
+
+
+def _category_node(category, person_count):
+    """vis.js node for a category (central hub) - larger and more prominent"""
+    return {
+        'id': category_node_id(category.id),
+        'label': f"📁 {category.name}\n({person_count} {'Person' if person_count == 1 else 'Personen'})",
+        'title': f"{category.name}\n{category.description or ''}\n{person_count} Personen",
+        'type': 'category',
+        'color': {
+            'background': category.color,
+            'border': category.color,
+            'highlight': {
+                'background': category.color,
+                'border': '#1f2937'
             }
-        })
-        
-        # Create edges from person to their categories
-        for category in person.categories:
-            edges.append({
-                'from': f'person_{person.id}',
-                'to': f'cat_{category.id}',
-                'color': {
-                    'color': category.color,
-                    'opacity': 0.5
-                },
-                'width': 2,
-                'smooth': {
-                    'enabled': True,
-                    'type': 'continuous'
-                }
-            })
-    
-    return jsonify({
-        'nodes': nodes,
-        'edges': edges
-    })
+        },
+        'shape': 'box',
+        'size': 40,  # Larger than person nodes
+        'font': {
+            'size': 18,
+            'color': '#ffffff',
+            'bold': True,
+            'multi': 'html'
+        },
+        'borderWidth': 3,
+        'x': category.position_x,
+        'y': category.position_y,
+        'fixed': False,
+        'icon': category.icon,
+        'margin': 15
+    }
+
+
+def _person_node(person):
+    """vis.js node for a person, bordered in the colour of their first category"""
+    border = person.categories[0].color if person.categories else '#667eea'
+    return {
+        'id': person_node_id(person.id),
+        'label': f"{STATUS_ICONS.get(person.status, '❓')} {person.nickname or person.name}",
+        'title': f"{person.name}\n{person.custom_id}\nStatus: {person.status}",
+        'type': 'person',
+        'status': person.status,
+        'custom_id': person.custom_id,
+        'person_id': person.id,
+        'shape': 'box',
+        'size': 20,
+        'font': {
+            'size': 14,
+            'color': '#1f2937'
+        },
+        'x': person.position_x,
+        'y': person.position_y,
+        'fixed': False,
+        'borderWidth': 2,
+        'color': {
+            'border': border,
+            'background': '#ffffff',
+            'highlight': {
+                'border': border,
+                'background': '#f0f0f0'
+            }
+        }
+    }
+
+
+def _category_edge(person, category):
+    """vis.js edge from a person to one of their categories"""
+    return {
+        'id': category_edge_id(person.id, category.id),
+        'from': person_node_id(person.id),
+        'to': category_node_id(category.id),
+        'color': {
+            'color': category.color,
+            'opacity': 0.5
+        },
+        'width': 2,
+        'smooth': {
+            'enabled': True,
+            'type': 'continuous'
+        }
+    }
+
+
+@dating_graph_bp.route('/api/graph-data/layout', methods=['POST'])
+@login_required
+def compute_graph_layout():
+    """
+    Compute node positions server side and store them.
+    By default only nodes without coordinates are placed; {"full": true} re-lays out
+    every node, seeded from the stored positions.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        placed = layout_graph(full=bool(data.get('full')))
+    except ImportError as e:
+        return jsonify({'error': str(e)}), 503
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'placed': placed, 'version': graph_version()})
 
 
 @dating_graph_bp.route('/api/graph-data/save-positions', methods=['POST'])
 @login_required
 def save_positions():
-    """Save node positions from graph"""
-    data = request.get_json()
-    positions = data.get('positions', {})
-    
-    for node_id, pos in positions.items():
-        if node_id.startswith('person_'):
-            person_id = int(node_id.replace('person_', ''))
-            person = Person.query.get(person_id)
-            if person:
-                person.position_x = pos.get('x')
-                person.position_y = pos.get('y')
-        elif node_id.startswith('cat_'):
-            category_id = int(node_id.replace('cat_', ''))
-            category = Category.query.get(category_id)
-            if category:
-                category.position_x = pos.get('x')
-                category.position_y = pos.get('y')
-    
-    db.session.commit()
-    return jsonify({'message': 'Positions saved successfully'})
+    """
+    Save node positions from graph in one transaction.
+    Saves repeated within a couple of seconds by the same session are coalesced:
+    they answer 202 and are written together once the interval has passed.
+    """
+    data = request.get_json(silent=True) or {}
+    positions, skipped = parse_positions(data.get('positions', {}))
+    if not positions:
+        return jsonify({'message': 'No positions to save', 'skipped': skipped})
+    
+    session_key = f"{current_user.get_id()}:{session.get('_id', '')}"
+    updated = save_node_positions(current_app._get_current_object(), session_key, positions)
+    if updated is None:
+        return jsonify({'message': 'Positions queued', 'queued': len(positions), 'skipped': skipped}), 202
+    return jsonify({'message': 'Positions saved successfully', 'updated': updated, 'skipped': skipped})
 
 @dating_graph_bp.route('/api/quick-stats', methods=['GET'])
 @login_required
 def get_quick_stats():
     """Lightweight stats for cards view"""
+    statistics = get_graph_statistics()
     return jsonify({
-        'total_persons': Person.query.count(),
-        'total_categories': Category.query.count(),
-        'total_dates': DateEvent.query.count()
+        'total_persons': statistics.total_persons,
+        'total_categories': statistics.total_categories,
+        'total_dates': statistics.total_dates
     })
 
 
 
+# ============================================================================
+# API ENDPOINTS - ANALYTICS
+# ============================================================================
+
+def _analytics_or_error():
+    try:
+        return get_graph_analytics(), None
+    except ImportError as e:
+        return None, (jsonify({'error': str(e)}), 503)
+
+
+@dating_graph_bp.route('/api/analytics/path', methods=['GET'])
+@login_required
+def get_introduction_path():
+    """
+    Shortest introduction path between two persons over their connections.
+    ?from=<person_id>&to=<person_id>[&weighted=1] - weighted prefers strong connections.
+    """
+    from_id = request.args.get('from', type=int)
+    to_id = request.args.get('to', type=int)
+    if from_id is None or to_id is None:
+        return jsonify({'error': 'from and to are required'}), 400
+    weighted = request.args.get('weighted', 'false').lower() in ('1', 'true', 'yes')
+    
+    analytics, error = _analytics_or_error()
+    if error:
+        return error
+    try:
+        path = analytics.shortest_path(from_id, to_id, weighted)
+    except KeyError:
+        return jsonify({'error': 'Person not found'}), 404
+    
+    if path is None:
+        return jsonify({'version': analytics.version, 'path': None, 'length': None,
+                        'message': 'No connection between these persons'}), 404
+    return jsonify({
+        'version': analytics.version,
+        'path': [analytics.person(person_id) for person_id in path],
+        'length': len(path) - 1
+    })
+
+
+@dating_graph_bp.route('/api/analytics/components', methods=['GET'])
+@login_required
+def get_connected_components():
+    """Groups of persons connected to each other, largest first"""
+    analytics, error = _analytics_or_error()
+    if error:
+        return error
+    components = analytics.components()
+    return jsonify({
+        'version': analytics.version,
+        'count': len(components),
+        'components': [
+            {'size': len(component), 'persons': [analytics.person(person_id) for person_id in component]}
+            for component in components
+        ]
+    })
+
+
+@dating_graph_bp.route('/api/analytics/centrality', methods=['GET'])
+@login_required
+def get_centrality():
+    """Degree and betweenness centrality per person, most central first (?limit=N)"""
+    limit = request.args.get('limit', type=int)
+    analytics, error = _analytics_or_error()
+    if error:
+        return error
+    
+    ranking = sorted(analytics.centrality().items(),
+                     key=lambda item: (-item[1]['betweenness'], -item[1]['degree'], item[0]))
+    if limit is not None and limit >= 0:
+        ranking = ranking[:limit]
+    return jsonify({
+        'version': analytics.version,
+        'persons': [{**analytics.person(person_id), **scores} for person_id, scores in ranking]
+    })
+
+
+@dating_graph_bp.route('/api/analytics/category-reach', methods=['GET'])
+@login_required
+def get_category_reach():
+    """Per category: direct members and all persons reachable from them through connections"""
+    analytics, error = _analytics_or_error()
+    if error:
+        return error
+    return jsonify({'version': analytics.version, 'categories': analytics.category_reach()})
+
+
 # ============================================================================
 # API ENDPOINTS - SNAPSHOTS
 # ============================================================================
@@ -0,0 +1,130 @@
+# Server-side layout of the dating graph.
+# Nodes without stored coordinates are placed with a networkx spring layout that keeps
+# the already positioned nodes fixed, so the browser can render without running physics.
+import logging
+import math
+import random
+import threading
+
+from app import db
+from app.models.dating_graph import Category, Connection, Person, person_category
+from app.blueprints.dating_graph.positions import write_positions
+from app.blueprints.dating_graph.versioning import category_node_id, person_node_id
+
+LAYOUT_ITERATIONS = 100
+LAYOUT_SEED = 42
+NODE_SPACING = 120  # Rough vis.js distance between neighbouring nodes, in pixels
+MAX_LAYOUT_NODES = 499  # Larger graphs need scipy for networkx' sparse layout
+
+_layout_lock = threading.Lock()
+
+
+def load_networkx():
+    """Lazy import, networkx is only needed once nodes have to be placed"""
+    try:
+        import networkx
+    except ImportError as e:
+        raise ImportError("networkx is not installed. Install with: pip install networkx") from e
+    return networkx
+
+def _build_graph():
+    """
+    networkx graph of all persons and categories, with person -> category edges and
+    person <-> person connections (weighted by strength), plus the stored positions.
+    """
+    graph = load_networkx().Graph()
+    positions = {}
+    for person_id, x, y in db.session.query(Person.id, Person.position_x, Person.position_y):
+        graph.add_node(person_node_id(person_id))
+        if x is not None and y is not None:
+            positions[person_node_id(person_id)] = (x, y)
+    for category_id, x, y in db.session.query(Category.id, Category.position_x, Category.position_y):
+        graph.add_node(category_node_id(category_id))
+        if x is not None and y is not None:
+            positions[category_node_id(category_id)] = (x, y)
+
+    for person_id, category_id in db.session.query(person_category.c.person_id, person_category.c.category_id):
+        graph.add_edge(person_node_id(person_id), category_node_id(category_id), weight=1.0)
+    for from_id, to_id, strength in db.session.query(Connection.from_person_id, Connection.to_person_id, Connection.strength):
+        graph.add_edge(person_node_id(from_id), person_node_id(to_id), weight=(strength or 5) / 10)
+
+    return graph, positions
+
+def _initial_positions(graph, positions, center, extent):
+    """
+    Stored positions mapped into the unit space networkx works in. Nodes without one start
+    next to the mean of their positioned neighbours (or anywhere, if they have none).
+    """
+    rng = random.Random(LAYOUT_SEED)
+    initial = {node: ((x - center[0]) / extent, (y - center[1]) / extent) for node, (x, y) in positions.items()}
+    for node in graph.nodes:
+        if node in initial:
+            continue
+        anchors = [initial[n] for n in graph.neighbors(node) if n in initial]
+        if anchors:
+            ax = sum(p[0] for p in anchors) / len(anchors)
+            ay = sum(p[1] for p in anchors) / len(anchors)
+            initial[node] = (ax + rng.uniform(-0.1, 0.1), ay + rng.uniform(-0.1, 0.1))
+        else:
+            initial[node] = (rng.uniform(-1, 1), rng.uniform(-1, 1))
+    return initial
+
+def compute_layout(full=False):
+    """
+    Return {node_id: (x, y)} for the nodes that need a position.
+    By default only nodes without coordinates are placed and all others stay fixed;
+    with full=True every node is moved, seeded from the stored positions.
+    """
+    graph, positions = _build_graph()
+    if graph.number_of_nodes() == 0 or (not full and len(positions) == graph.number_of_nodes()):
+        return {}
+    if graph.number_of_nodes() > MAX_LAYOUT_NODES:
+        raise ValueError(f'Server-side layout supports at most {MAX_LAYOUT_NODES} nodes')
+
+    # Work in a unit space around the stored layout, so networkx' default spring length fits
+    radius = NODE_SPACING * math.sqrt(graph.number_of_nodes())
+    if positions:
+        center = (sum(p[0] for p in positions.values()) / len(positions),
+                  sum(p[1] for p in positions.values()) / len(positions))
+        spread = max(max(abs(x - center[0]), abs(y - center[1])) for x, y in positions.values())
+        extent = max(spread, radius)
+    else:
+        center, extent = (0.0, 0.0), radius
+
+    initial = _initial_positions(graph, positions, center, extent)
+    fixed = None if full or not positions else list(positions)
+    layout = load_networkx().spring_layout(graph, pos=initial, fixed=fixed, iterations=LAYOUT_ITERATIONS,
+                                       weight='weight', seed=LAYOUT_SEED)
+
+    return {
+        node: (round(center[0] + float(x) * extent, 1), round(center[1] + float(y) * extent, 1))
+        for node, (x, y) in layout.items()
+        if full or node not in positions
+    }
+
+def has_unpositioned_nodes():
+    return db.session.query(
+        Person.query.filter((Person.position_x.is_(None)) | (Person.position_y.is_(None))).exists()
+    ).scalar() or db.session.query(
+        Category.query.filter((Category.position_x.is_(None)) | (Category.position_y.is_(None))).exists()
+    ).scalar()
+
+def layout_graph(full=False):
+    """Compute and store positions (see compute_layout); returns the number of nodes placed"""
+    with _layout_lock:
+        positions = compute_layout(full)
+        if positions:
+            write_positions(positions)
+        return len(positions)
+
+def layout_missing_nodes():
+    """Place nodes added without coordinates; never fails the request that triggered it"""
+    try:
+        if has_unpositioned_nodes():
+            return layout_graph()
+    except (ImportError, ValueError) as e:
+        logging.warning("Skipping server-side graph layout: %s", e)
+    except Exception:
+        db.session.rollback()
+        logging.exception("Server-side graph layout failed")
+    return 0
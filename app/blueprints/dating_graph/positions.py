@@ -0,0 +1,110 @@
+# Bulk saving of graph node positions.
+# Positions are written with one IN query per node type and a single commit, and
+# rapid repeated saves from the same session are coalesced into one write.
+import logging
+import math
+import threading
+import time
+
+from app import db
+from app.models.dating_graph import Category, Person
+
+SAVE_INTERVAL = 2.0  # Minimum seconds between two position writes of one session
+IN_CHUNK_SIZE = 500  # Stay below SQLite's bound parameter limit
+
+_lock = threading.Lock()
+_pending = {}     # session key -> {node_id: (x, y)}, latest position wins
+_last_write = {}  # session key -> monotonic time of the last write
+_timers = {}      # session key -> threading.Timer flushing _pending
+
+
+def _coordinate(value):
+    if value is None:
+        return None
+    value = float(value)
+    if not math.isfinite(value):  # float() accepts 'nan' and 'inf'
+        raise ValueError(value)
+    return value
+
+def parse_positions(positions):
+    """
+    Split {'person_1': {'x': .., 'y': ..}, 'cat_2': {...}} into {node_id: (x, y)}.
+    Unknown node ids and malformed coordinates are skipped; returns (positions, skipped).
+    """
+    parsed = {}
+    skipped = 0
+    for node_id, pos in (positions or {}).items():
+        try:
+            prefix, _, number = node_id.partition('_')
+            if prefix not in ('person', 'cat') or not number.isdigit():
+                raise ValueError(node_id)
+            parsed[node_id] = (_coordinate(pos.get('x')), _coordinate(pos.get('y')))
+        except (AttributeError, TypeError, ValueError):
+            skipped += 1
+    return parsed, skipped
+
+def _apply(model, positions):
+    """Set positions of the given {id: (x, y)}; returns the number of rows that actually changed"""
+    updated = 0
+    ids = list(positions)
+    for start in range(0, len(ids), IN_CHUNK_SIZE):
+        for obj in model.query.filter(model.id.in_(ids[start:start + IN_CHUNK_SIZE])):
+            x, y = positions[obj.id]
+            if (obj.position_x, obj.position_y) != (x, y):
+                obj.position_x, obj.position_y = x, y
+                updated += 1
+    return updated
+
+def write_positions(positions):
+    """
+    Write {node_id: (x, y)} in one transaction: one IN query per node type to load the
+    rows, and the ORM batches the resulting UPDATEs into executemany calls on commit.
+    """
+    person_positions = {int(node_id[len('person_'):]): pos for node_id, pos in positions.items() if node_id.startswith('person_')}
+    category_positions = {int(node_id[len('cat_'):]): pos for node_id, pos in positions.items() if node_id.startswith('cat_')}
+    try:
+        updated = _apply(Person, person_positions) + _apply(Category, category_positions)
+        if updated:
+            db.session.commit()
+        return updated
+    except Exception:
+        db.session.rollback()
+        raise
+
+def _flush_pending(app, session_key):
+    with app.app_context():
+        with _lock:
+            _timers.pop(session_key, None)
+            positions = _pending.pop(session_key, None)
+            _last_write[session_key] = time.monotonic()
+        if not positions:
+            return
+        try:
+            write_positions(positions)
+        except Exception:
+            logging.exception("Saving coalesced graph positions failed")
+
+def save_positions(app, session_key, positions):
+    """
+    Save positions for a client session. Returns the number of updated nodes, or None if the
+    positions were merged into a write already scheduled for this session (within SAVE_INTERVAL).
+    """
+    now = time.monotonic()
+    with _lock:
+        # Forget sessions that have been quiet for a while
+        for key in [key for key, last in _last_write.items() if now - last > SAVE_INTERVAL and key not in _pending]:
+            del _last_write[key]
+
+        buffer = _pending.setdefault(session_key, {})
+        buffer.update(positions)
+        last = _last_write.get(session_key)
+        if last is not None and now - last < SAVE_INTERVAL:
+            if session_key not in _timers:
+                timer = threading.Timer(SAVE_INTERVAL - (now - last), _flush_pending, (app, session_key))
+                timer.daemon = True
+                _timers[session_key] = timer
+                timer.start()
+            return None
+        positions = _pending.pop(session_key)
+        _last_write[session_key] = now
+    return write_positions(positions)
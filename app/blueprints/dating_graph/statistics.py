@@ -0,0 +1,180 @@
+# Materialized dating graph statistics.
+# Session events turn every flush touching persons, categories, memberships or dates
+# into deltas on the single GraphStatistics row, so the statistics endpoints read one row
+# instead of counting everything on each call.
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.dating_graph import Category, DateEvent, GraphStatistics, Person, category_person_counts, person_category
+
+STATISTICS_ID = 1
+_PENDING_KEY = 'dating_graph_statistics'
+
+
+class _Deltas:
+    """Changes of one flush; categories are kept as objects since new ones get their id in the flush"""
+
+    def __init__(self):
+        self.persons = 0
+        self.categories = 0
+        self.dates = 0
+        self.connections = 0
+        self.status = Counter()
+        self.members = Counter()  # Category -> change of its person count
+        self.added_categories = []
+        self.renamed_categories = []
+        self.removed_categories = []
+
+    def __bool__(self):
+        return bool(self.persons or self.categories or self.dates or self.connections
+                    or any(self.status.values()) or any(self.members.values())
+                    or self.added_categories or self.renamed_categories or self.removed_categories)
+
+    def membership(self, category, delta):
+        self.members[category] += delta
+        self.connections += delta
+
+
+def _history(obj, attribute):
+    return inspect(obj).attrs[attribute].history
+
+def _collect(session):
+    deltas = _Deltas()
+
+    for obj in session.new:
+        if isinstance(obj, Person):
+            deltas.persons += 1
+            deltas.status[obj.status or 'unknown'] += 1
+            for category in obj.categories:
+                deltas.membership(category, 1)
+        elif isinstance(obj, Category):
+            deltas.categories += 1
+            deltas.added_categories.append(obj)
+        elif isinstance(obj, DateEvent):
+            deltas.dates += 1
+
+    for obj in session.dirty:
+        if isinstance(obj, Person):
+            status = _history(obj, 'status')
+            if status.has_changes():
+                for old in status.deleted:
+                    deltas.status[old or 'unknown'] -= 1
+                for new in status.added:
+                    deltas.status[new or 'unknown'] += 1
+            categories = _history(obj, 'categories')
+            for category in categories.added:
+                deltas.membership(category, 1)
+            for category in categories.deleted:
+                deltas.membership(category, -1)
+        elif isinstance(obj, Category):
+            if _history(obj, 'name').has_changes() or _history(obj, 'color').has_changes():
+                deltas.renamed_categories.append(obj)
+
+    for obj in session.deleted:
+        if isinstance(obj, Person):
+            deltas.persons -= 1
+            # Committed value: a status changed in the same flush was never counted
+            status = _history(obj, 'status')
+            old_status = (status.deleted or status.unchanged or [obj.status])[0]
+            deltas.status[old_status or 'unknown'] -= 1
+            for category in obj.categories:
+                deltas.membership(category, -1)
+        elif isinstance(obj, Category):
+            deltas.categories -= 1
+            # Not obj.persons.count(): the dynamic query would autoflush inside this flush
+            deltas.connections -= session.connection().execute(
+                select(func.count()).select_from(person_category).where(person_category.c.category_id == obj.id)
+            ).scalar()
+            deltas.removed_categories.append(obj)
+        elif isinstance(obj, DateEvent):
+            deltas.dates -= 1
+
+    return deltas
+
+@event.listens_for(Session, 'before_flush')
+def _before_flush(session, flush_context, instances):
+    session.info[_PENDING_KEY] = _collect(session)
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session, flush_context):
+    deltas = session.info.pop(_PENDING_KEY, None)
+    if not deltas:
+        return
+
+    table = GraphStatistics.__table__
+    connection = session.connection()
+    row = connection.execute(select(table).where(table.c.id == STATISTICS_ID)).mappings().first()
+    if row is None:
+        return  # Built from scratch, including this change, on the next read
+
+    status_counts = dict(row['status_counts'] or {})
+    for status, delta in deltas.status.items():
+        count = status_counts.get(status, 0) + delta
+        if count > 0:
+            status_counts[status] = count
+        else:
+            status_counts.pop(status, None)
+
+    category_counts = {key: dict(value) for key, value in (row['category_counts'] or {}).items()}
+    for category in deltas.added_categories:
+        category_counts[str(category.id)] = {'name': category.name, 'color': category.color, 'count': 0}
+    for category in deltas.renamed_categories:
+        entry = category_counts.get(str(category.id))
+        if entry is not None:
+            entry.update(name=category.name, color=category.color)
+    for category, delta in deltas.members.items():
+        entry = category_counts.get(str(category.id))
+        if entry is not None:
+            entry['count'] = max(entry['count'] + delta, 0)
+    for category in deltas.removed_categories:
+        category_counts.pop(str(category.id), None)
+
+    connection.execute(update(table).where(table.c.id == STATISTICS_ID).values(
+        total_persons=row['total_persons'] + deltas.persons,
+        total_categories=row['total_categories'] + deltas.categories,
+        total_dates=row['total_dates'] + deltas.dates,
+        total_connections=row['total_connections'] + deltas.connections,
+        status_counts=status_counts,
+        category_counts=category_counts,
+        updated_at=datetime.utcnow()
+    ))
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def rebuild_statistics():
+    """Count everything from scratch and store it as the statistics row"""
+    counts = category_person_counts()
+    statistics = GraphStatistics.query.get(STATISTICS_ID) or GraphStatistics(id=STATISTICS_ID)
+    statistics.total_persons = Person.query.count()
+    statistics.total_categories = Category.query.count()
+    statistics.total_dates = DateEvent.query.count()
+    statistics.total_connections = db.session.query(func.count()).select_from(person_category).scalar()
+    status_counts = Counter()
+    for status, count in db.session.query(Person.status, func.count(Person.id)).group_by(Person.status):
+        status_counts[status or 'unknown'] += count
+    statistics.status_counts = dict(status_counts)
+    statistics.category_counts = {
+        str(category_id): {'name': name, 'color': color, 'count': counts.get(category_id, 0)}
+        for category_id, name, color in db.session.query(Category.id, Category.name, Category.color)
+    }
+    statistics.updated_at = datetime.utcnow()
+    db.session.add(statistics)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request built the row at the same time
+        db.session.rollback()
+        return GraphStatistics.query.get(STATISTICS_ID)
+    return statistics
+
+def get_graph_statistics():
+    """The statistics row, built on first use"""
+    return GraphStatistics.query.get(STATISTICS_ID) or rebuild_statistics()
@@ -0,0 +1,217 @@
+# Graph versioning for the dating graph.
+# Session events record every node and edge touched by a flush in GraphChange, so
+# clients can fetch only what changed since the version they already have. Only the
+# latest move of a node is kept and rows older than CHANGE_RETENTION are pruned.
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.dating_graph import Category, Connection, DateEvent, GraphChange, Person, person_category
+
+CHANGE_RETENTION = timedelta(days=30)  # Clients behind by more than this get the full graph
+PRUNE_INTERVAL = 3600  # Seconds between two prunes of the change log per process
+DELETE_CHUNK_SIZE = 500  # Stay below SQLite's bound parameter limit
+
+_PENDING_KEY = 'dating_graph_changes'
+_POSITION_ATTRIBUTES = {'position_x', 'position_y'}
+_last_prune = None  # monotonic time of the last prune in this process
+
+
+def person_node_id(person_id):
+    return f'person_{person_id}'
+
+def category_node_id(category_id):
+    return f'cat_{category_id}'
+
+def category_edge_id(person_id, category_id):
+    return f'person_{person_id}-cat_{category_id}'
+
+def parse_category_edge_id(edge_id):
+    """'person_1-cat_2' -> (1, 2)"""
+    person_part, _, category_part = edge_id.partition('-')
+    return int(person_part[len('person_'):]), int(category_part[len('cat_'):])
+
+
+def _history(obj, attribute):
+    return inspect(obj).attrs[attribute].history
+
+def _moved_only(obj):
+    """True if only the stored layout position of a person / category changed"""
+    changed = {attr.key for attr in inspect(obj).attrs if attr.history.has_changes()}
+    return bool(changed) and changed <= _POSITION_ATTRIBUTES
+
+def _member_ids(session, category_id):
+    """
+    Ids of the persons in a category. Read on the flush's connection: the dynamic
+    Category.persons query would autoflush, which is not allowed inside a flush.
+    """
+    rows = session.connection().execute(
+        select(person_category.c.person_id).where(person_category.c.category_id == category_id)
+    )
+    return [person_id for person_id, in rows]
+
+def _collect(session):
+    """
+    Changes of the pending flush as (kind, resolve, action) tuples. resolve() returns
+    the element id; it is called after the flush so new objects already have their ids.
+    """
+    changes = []
+
+    def node(obj, action):
+        if isinstance(obj, Person):
+            changes.append(('node', lambda: person_node_id(obj.id), action))
+        else:
+            changes.append(('node', lambda: category_node_id(obj.id), action))
+
+    def edge(person, category, action):
+        changes.append(('edge', lambda: category_edge_id(person.id, category.id), action))
+        node(category, 'update')  # Category labels show the person count
+        node(person, 'update')    # Person border uses the first category's colour
+
+    def other(obj, action):
+        changes.append(('other', lambda: f'{type(obj).__name__.lower()}_{obj.id}', action))
+
+    for obj in session.new:
+        if isinstance(obj, Person):
+            node(obj, 'add')
+            for category in obj.categories:
+                edge(obj, category, 'add')
+        elif isinstance(obj, Category):
+            node(obj, 'add')
+        elif isinstance(obj, (Connection, DateEvent)):
+            other(obj, 'add')
+
+    for obj in session.dirty:
+        if not session.is_modified(obj):
+            continue
+        if isinstance(obj, (Person, Category)) and _moved_only(obj):
+            node(obj, 'move')
+        elif isinstance(obj, Person):
+            node(obj, 'update')
+            history = _history(obj, 'categories')
+            for category in history.added:
+                edge(obj, category, 'add')
+            for category in history.deleted:
+                edge(obj, category, 'remove')
+        elif isinstance(obj, Category):
+            node(obj, 'update')
+            if _history(obj, 'color').has_changes():
+                for person_id in _member_ids(session, obj.id):
+                    changes.append(('edge', lambda p=person_id, c=obj.id: category_edge_id(p, c), 'update'))
+                    changes.append(('node', lambda p=person_id: person_node_id(p), 'update'))
+        elif isinstance(obj, (Connection, DateEvent)):
+            other(obj, 'update')
+
+    for obj in session.deleted:
+        if isinstance(obj, Person):
+            for category in obj.categories:
+                edge(obj, category, 'remove')
+            node(obj, 'remove')
+        elif isinstance(obj, Category):
+            for person_id in _member_ids(session, obj.id):
+                changes.append(('edge', lambda p=person_id, c=obj.id: category_edge_id(p, c), 'remove'))
+                changes.append(('node', lambda p=person_id: person_node_id(p), 'update'))
+            node(obj, 'remove')
+        elif isinstance(obj, (Connection, DateEvent)):
+            other(obj, 'remove')
+
+    return changes
+
+@event.listens_for(Session, 'before_flush')
+def _before_flush(session, flush_context, instances):
+    session.info[_PENDING_KEY] = _collect(session)
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session, flush_context):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if not changes:
+        return
+
+    rows = []
+    seen = set()
+    for kind, resolve, action in changes:
+        element_id = resolve()
+        if (element_id, action) in seen:
+            continue
+        seen.add((element_id, action))
+        rows.append({'element_id': element_id, 'kind': kind, 'action': action})
+
+    # Written on the flush's connection, so the log commits or rolls back with the change itself
+    table = GraphChange.__table__
+    connection = session.connection()
+    # A later move supersedes the earlier ones for every client, so only the latest is kept
+    moved = [row['element_id'] for row in rows if row['action'] == 'move']
+    for start in range(0, len(moved), DELETE_CHUNK_SIZE):
+        connection.execute(delete(table).where(
+            table.c.action == 'move', table.c.element_id.in_(moved[start:start + DELETE_CHUNK_SIZE])
+        ))
+    connection.execute(table.insert(), rows)
+    _prune(connection)
+
+def _prune(connection):
+    """Drop changes older than CHANGE_RETENTION, at most every PRUNE_INTERVAL seconds"""
+    global _last_prune
+    now = time.monotonic()
+    if _last_prune is not None and now - _last_prune < PRUNE_INTERVAL:
+        return
+    _last_prune = now
+    table = GraphChange.__table__
+    # The newest row always stays: it carries the current graph version
+    connection.execute(delete(table).where(
+        table.c.created_at < datetime.utcnow() - CHANGE_RETENTION,
+        table.c.id < select(func.max(table.c.id)).scalar_subquery()
+    ))
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def graph_version():
+    """Current graph version; increases with every person, category, connection and date change"""
+    return db.session.query(func.max(GraphChange.id)).scalar() or 0
+
+def oldest_diff_version():
+    """Smallest `since` graph_changes() can answer; older versions may have been pruned"""
+    oldest = db.session.query(func.min(GraphChange.id)).scalar()
+    return oldest - 1 if oldest else 0
+
+def structural_version():
+    """
+    Version of the last change that is not a node move or a date, i.e. of the graph's
+    persons, categories, memberships and connections; layout saves leave it unchanged.
+    """
+    return db.session.query(GraphChange.id).filter(
+        GraphChange.action != 'move', ~GraphChange.element_id.startswith('dateevent_')
+    ).order_by(GraphChange.id.desc()).limit(1).scalar() or 0
+
+def graph_changes(since):
+    """
+    Net node / edge changes after version `since`:
+    {'nodes': {'added': set, 'changed': set, 'removed': set}, 'edges': {...}}.
+    Elements added and removed again in between are left out.
+    """
+    first_last = {}
+    rows = db.session.query(GraphChange.element_id, GraphChange.kind, GraphChange.action) \
+        .filter(GraphChange.id > since).order_by(GraphChange.id).all()
+    for element_id, kind, action in rows:
+        if kind == 'other':
+            continue
+        if element_id in first_last:
+            first_last[element_id][2] = action
+        else:
+            first_last[element_id] = [kind, action, action]
+
+    result = {kind: {'added': set(), 'changed': set(), 'removed': set()} for kind in ('node', 'edge')}
+    for element_id, (kind, first, last) in first_last.items():
+        if last == 'remove':
+            if first != 'add':
+                result[kind]['removed'].add(element_id)
+        elif first == 'add':
+            result[kind]['added'].add(element_id)
+        else:
+            result[kind]['changed'].add(element_id)
+    return {'nodes': result['node'], 'edges': result['edge']}
@@ -1,25 +1,42 @@
 from datetime import datetime
 import uuid
-from flask import jsonify, request, send_file, g
+from flask import jsonify, request, send_file, g, Response, stream_with_context
 from flask_login import current_user
 from werkzeug.utils import secure_filename
 from app.blueprints.ocr import ocr_bp, OCR_UPLOAD_FOLDER
 from app.blueprints.ocr.functions.chord_utils import ChordUtils
 from app.blueprints.ocr.functions.converter import finalize_song_data, merge_ocr_sections, parse_ocr_section_to_preliminary, parse_raw_text_to_preliminary, preliminary_to_structured, rebuild_plain_text
-from app.utils.auth import approved_user_required, ocr_user_required
+from app.utils.auth import admin_required, approved_user_required, login_required, ocr_user_required
 from app import db
 from app.models.storage import Directory, File as StorageFile
 from app.blueprints.storage import UPLOAD_FOLDER
 import hashlib
 import json
+import logging
 import os
 import re
+from collections import deque
+from dataclasses import asdict
 import cv2
-from app.blueprints.ocr.utils import process_ocr_result, get_ocr_reader
+import numpy as np
+from app.blueprints.ocr.utils import process_ocr_boxes
+from app.blueprints.ocr.ocr_cache import get_cached_boxes, ocr_cache_key, ocr_cache_stats, store_boxes
+from app.blueprints.ocr.inference import OCR_TIMEOUT, OcrQueueFull, OcrServiceError, get_ocr_service, ocr_service_stats
+from app.blueprints.ocr.uploads import OcrQuotaExceeded, get_upload, register_upload, remove_upload, upload_stats
+from app.workables.config.manager import get_typed_config
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf', 'tiff', 'bmp'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_PDF_PAGES = 50
+MIN_PDF_DPI = 72
+MAX_PDF_DPI = 400
+MAX_BATCH_ITEMS = 32
+
+
+class OcrInputError(Exception):
+    """Raised when an uploaded file can't be processed as given (unreadable PDF, too many pages)."""
+
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
@@ -53,6 +70,8 @@ def upload_file():
             os.remove(file_path)
             return jsonify({'error': f'File too large. Max size: {MAX_FILE_SIZE // 1024 // 1024}MB'}), 400
         
+        register_upload(unique_id, file_path, file_ext)
+        
         return jsonify({
             'success': True,
             'file_id': unique_id,
@@ -61,12 +80,165 @@ def upload_file():
             'type': file_ext
         }), 200
         
+    except OcrQuotaExceeded as e:
+        return jsonify({'error': str(e)}), 507
     except Exception as e:
         return jsonify({'error': f'Upload failed: {str(e)}'}), 500
 
+def _find_upload(file_id):
+    """Return the path of an uploaded OCR file, or None"""
+    record = get_upload(file_id)
+    return record.path if record is not None else None
+
+def _apply_preprocessing(image, preprocessing):
+    if preprocessing.get('grayscale'):
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+def _recognize_image(image_bytes, preprocessing, language):
+    """
+    Return (boxes, cached) for an image file's content, or (None, False) if it cannot be decoded.
+    Raw boxes depend only on the image and the preprocessing options.
+    """
+    cache_key = ocr_cache_key(image_bytes, preprocessing, language)
+    boxes = get_cached_boxes(cache_key)
+    if boxes is not None:
+        return boxes, True
+
+    # Load image
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None, False
+    image = _apply_preprocessing(image, preprocessing)
+
+    # Perform OCR in one of the inference worker processes
+    boxes = get_ocr_service().recognize([image])[0]
+    store_boxes(cache_key, boxes)
+    return boxes, False
+
+def _render_pdf_page(pdf, index, dpi, preprocessing):
+    """Render one PDF page to a BGR image"""
+    page = pdf[index]
+    try:
+        image = page.render(scale=dpi / 72).to_numpy().copy()
+    finally:
+        page.close()
+    if image.ndim == 3 and image.shape[2] == 4:
+        image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+    return _apply_preprocessing(image, preprocessing)
+
+def _iter_pdf_boxes(pdf_bytes, dpi, preprocessing, language):
+    """
+    Yield (page_index, boxes, cached) for every page of a PDF, in page order.
+    Pages are rendered one after another (pdfium is not thread-safe) while up to
+    ocr_workers rendered pages are recognized in parallel by the inference workers.
+    """
+    import pypdfium2 as pdfium
+
+    pdf_digest = hashlib.sha256(pdf_bytes).digest()
+    try:
+        pdf = pdfium.PdfDocument(pdf_bytes)
+    except pdfium.PdfiumError as e:
+        raise OcrInputError(f'Could not read PDF: {e}') from e
+    window = max(1, get_typed_config().ocr_workers)
+    in_flight = deque()  # [page_index, cache_key, future, boxes]
+
+    def pending():
+        return sum(1 for item in in_flight if item[2] is not None)
+
+    def finish(item):
+        index, cache_key, future, boxes = item
+        if future is None:
+            return index, boxes, True
+        boxes = future.result(timeout=OCR_TIMEOUT)[0]
+        store_boxes(cache_key, boxes)
+        return index, boxes, False
+
+    try:
+        page_count = len(pdf)
+        if page_count > MAX_PDF_PAGES:
+            raise OcrInputError(f'PDF has {page_count} pages, at most {MAX_PDF_PAGES} are supported')
+        service = get_ocr_service()
+
+        for index in range(page_count):
+            cache_key = ocr_cache_key(pdf_digest, dict(preprocessing, page=index, dpi=dpi), language)
+            boxes = get_cached_boxes(cache_key)
+            if boxes is not None:
+                in_flight.append((index, cache_key, None, boxes))
+            else:
+                image = _render_pdf_page(pdf, index, dpi, preprocessing)
+                while True:
+                    try:
+                        future = service.submit([image])
+                        break
+                    except OcrQueueFull:
+                        # Make room by waiting for our own oldest page; give up if we hold none
+                        if not pending():
+                            raise
+                        yield finish(in_flight.popleft())
+                in_flight.append((index, cache_key, future, None))
+
+            # Hand out finished pages in order, block once the window is full
+            while in_flight and (in_flight[0][2] is None or in_flight[0][2].done() or pending() >= window):
+                yield finish(in_flight.popleft())
+
+        while in_flight:
+            yield finish(in_flight.popleft())
+    finally:
+        pdf.close()
+
+def _plain_text(processed_data):
+    """Plain text of a structured section with chords positioned above the lyrics"""
+    plain_text = ""
+    for line in processed_data['lines']:
+        if line['type'] == 'lyrics':
+            # Simple concatenation for lyrics
+            plain_text += " ".join([item['text'] for item in line['content']]) + "\n"
+        elif line['type'] == 'chords':
+            # Position chords based on their position_x
+            chord_items = line['content']
+
+            if chord_items:
+                # Find min position for scaling
+                positions = [item['position_x'] for item in chord_items]
+                min_pos = min(positions)
+
+                # Calculate character positions (assume ~10 pixels per character)
+                avg_char_width = 10
+
+                # Build the chord line with proper spacing
+                chord_line = ""
+                last_char_pos = 0
+
+                for item in chord_items:
+                    # Convert pixel position to character position
+                    pixel_pos = item['position_x']
+                    char_pos = int((pixel_pos - min_pos) / avg_char_width)
+
+                    # Calculate spaces needed
+                    spaces_needed = max(1, char_pos - last_char_pos)
+
+                    chord_line += " " * spaces_needed + item['chord']
+                    last_char_pos = char_pos + len(item['chord'])
+
+                plain_text += chord_line + "\n"
+    return plain_text.strip()
+
+def _section_result(boxes, song_key, section_name):
+    """(text, structured_data, confidence) for the boxes of one image or page"""
+    if boxes:
+        processed_data = process_ocr_boxes(boxes, song_key, section_name)
+        return _plain_text(processed_data), processed_data, 0.95
+    return 'No text detected in image', {'section_name': section_name, 'lines': []}, 0.0
+
 @ocr_bp.route('/api/process', methods=['POST'])
 def process_ocr():
-    """Process uploaded file with OCR"""
+    """
+    Process uploaded file with OCR.
+    PDFs are rendered page by page at `dpi` (default: ocr_pdf_dpi from config.json);
+    each page becomes its own section "<section_name> <n>". With "stream": true
+    (or Accept: application/x-ndjson) the pages are sent as NDJSON lines as they finish.
+    """
     data = request.get_json()
     
     if not data or 'file_id' not in data:
@@ -81,101 +253,209 @@ def process_ocr():
         'preprocessing': data.get('preprocessing', {}),
         'output_format': data.get('output_format', 'text')
     }
+    preprocessing = options.get('preprocessing', {})
     
     try:
         # Find the file
-        file_path = None
-        for file in os.listdir(OCR_UPLOAD_FOLDER):
-            if file.startswith(file_id):
-                file_path = os.path.join(OCR_UPLOAD_FOLDER, file)
-                break
-        
+        file_path = _find_upload(file_id)
         if not file_path or not os.path.exists(file_path):
             return jsonify({'error': 'File not found'}), 404
         
-        # Load image
-        image = cv2.imread(file_path)
-        if image is None:
-            return jsonify({'error': 'Could not load image'}), 400
-        
-        # Apply preprocessing if specified
-        preprocessing = options.get('preprocessing', {})
-        if preprocessing.get('grayscale'):
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Get OCR reader (lazy loaded)
-        ocr_reader = get_ocr_reader()
-        
-        # Perform OCR
-        result = ocr_reader.predict(image)
-        
-        if result and len(result) > 0 and result[0]:
-            ocr_data = result[0]
-            processed_data = process_ocr_result(ocr_data, song_key, section_name)
-            # DEBUGGING: Print structured data
-            print(processed_data)
-            # Extract plain text with proper chord positioning
-            plain_text = ""
-            for line in processed_data['lines']:
-                if line['type'] == 'lyrics':
-                    # Simple concatenation for lyrics
-                    plain_text += " ".join([item['text'] for item in line['content']]) + "\n"
-                    print(plain_text)
-                elif line['type'] == 'chords':
-                    # Position chords based on their position_x
-                    chord_items = line['content']
-                    
-                    if chord_items:
-                        # Find min and max positions for scaling
-                        positions = [item['position_x'] for item in chord_items]
-                        min_pos = min(positions)
-                        max_pos = max(positions)
-                        
-                        # Calculate character positions (assume ~10 pixels per character)
-                        avg_char_width = 10
-                        
-                        # Build the chord line with proper spacing
-                        chord_line = ""
-                        last_char_pos = 0
-                        
-                        for item in chord_items:
-                            # Convert pixel position to character position
-                            pixel_pos = item['position_x']
-                            char_pos = int((pixel_pos - min_pos) / avg_char_width)
-                            
-                            # Calculate spaces needed
-                            spaces_needed = max(1, char_pos - last_char_pos)
-                            
-                            chord_line += " " * spaces_needed + item['chord']
-                            last_char_pos = char_pos + len(item['chord'])
-                        
-                        plain_text += chord_line + "\n"
-                        print(plain_text)
-            
-            return jsonify({
-                'success': True,
-                'file_id': file_id,
-                'text': plain_text.strip(),
-                'structured_data': processed_data,
-                'confidence': 0.95,
-                'language': language,
-                'page_count': 1
-            }), 200
-        else:
+        with open(file_path, 'rb') as f:
+            file_bytes = f.read()
+
+        if file_path.lower().endswith('.pdf'):
+            try:
+                dpi = int(data.get('dpi') or get_typed_config().ocr_pdf_dpi)
+            except (TypeError, ValueError):
+                return jsonify({'error': 'dpi must be a number'}), 400
+            dpi = min(max(dpi, MIN_PDF_DPI), MAX_PDF_DPI)
+
+            def page_result(index, boxes, cached):
+                page_name = f"{section_name} {index + 1}"
+                text, structured_data, confidence = _section_result(boxes, song_key, page_name)
+                return {
+                    'page': index + 1,
+                    'text': text,
+                    'structured_data': structured_data,
+                    'confidence': confidence,
+                    'cached': cached
+                }
+
+            wants_stream = data.get('stream') or 'application/x-ndjson' in request.headers.get('Accept', '')
+            if wants_stream:
+                def generate():
+                    page_count = 0
+                    try:
+                        for index, boxes, cached in _iter_pdf_boxes(file_bytes, dpi, preprocessing, language):
+                            page_count += 1
+                            yield json.dumps(dict(page_result(index, boxes, cached), file_id=file_id)) + "\n"
+                        yield json.dumps({'done': True, 'file_id': file_id, 'page_count': page_count, 'dpi': dpi}) + "\n"
+                    except OcrInputError as e:
+                        yield json.dumps({'done': True, 'error': str(e)}) + "\n"
+                    except Exception as e:
+                        logging.exception("OCR processing of %s failed", file_id)
+                        yield json.dumps({'done': True, 'error': f'Processing failed: {str(e)}'}) + "\n"
+
+                return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                                headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+            pages = [page_result(index, boxes, cached)
+                     for index, boxes, cached in _iter_pdf_boxes(file_bytes, dpi, preprocessing, language)]
             return jsonify({
                 'success': True,
                 'file_id': file_id,
-                'text': 'No text detected in image',
-                'structured_data': {'section_name': section_name, 'lines': []},
-                'confidence': 0.0,
+                'text': "\n\n".join(page['text'] for page in pages),
+                'structured_data': pages[0]['structured_data'] if pages else {'section_name': section_name, 'lines': []},
+                'pages': pages,
+                'confidence': min((page['confidence'] for page in pages), default=0.0),
                 'language': language,
-                'page_count': 1
+                'page_count': len(pages),
+                'dpi': dpi,
+                'cached': all(page['cached'] for page in pages)
             }), 200
+
+        boxes, cached = _recognize_image(file_bytes, preprocessing, language)
+        if boxes is None:
+            return jsonify({'error': 'Could not load image'}), 400
+
+        text, structured_data, confidence = _section_result(boxes, song_key, section_name)
+        return jsonify({
+            'success': True,
+            'file_id': file_id,
+            'text': text,
+            'structured_data': structured_data,
+            'confidence': confidence,
+            'language': language,
+            'page_count': 1,
+            'cached': cached
+        }), 200
         
+    except OcrQueueFull as e:
+        return jsonify({'error': str(e)}), 429
+    except OcrServiceError as e:
+        return jsonify({'error': str(e)}), 503
+    except OcrInputError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.exception("OCR processing of %s failed", file_id)
+        return jsonify({'error': f'Processing failed: {str(e)}'}), 500
+
+
+@ocr_bp.route('/api/process-batch', methods=['POST'])
+def process_ocr_batch():
+    """
+    Process several uploaded section images in one request.
+    Body: {"items": [{"file_id", "section_name", "song_key"}, ...], "language",
+    "preprocessing", "merge", "title", "key", "authors"}.
+    All images that are not cached yet go to a single batched predict call.
+    With "merge": true the sections are also run through merge_ocr_sections and,
+    if a title is given, finalized into a song.
+    """
+    data = request.get_json()
+
+    items = (data or {}).get('items')
+    if not items or not isinstance(items, list):
+        return jsonify({'error': 'items is required'}), 400
+    if len(items) > MAX_BATCH_ITEMS:
+        return jsonify({'error': f'At most {MAX_BATCH_ITEMS} items per batch'}), 400
+
+    language = data.get('language', 'en')
+    preprocessing = data.get('preprocessing', {})
+
+    try:
+        results = [None] * len(items)
+        boxes_by_index = {}
+        cached_by_index = {}
+        to_recognize = []  # (index, cache_key, image)
+
+        for index, item in enumerate(items):
+            file_id = item.get('file_id') if isinstance(item, dict) else None
+            file_path = _find_upload(file_id) if file_id else None
+            if not file_path or not os.path.exists(file_path):
+                results[index] = {'file_id': file_id, 'error': 'File not found'}
+                continue
+            if file_path.lower().endswith('.pdf'):
+                results[index] = {'file_id': file_id, 'error': 'PDFs are processed through /api/process'}
+                continue
+
+            with open(file_path, 'rb') as f:
+                image_bytes = f.read()
+            cache_key = ocr_cache_key(image_bytes, preprocessing, language)
+            boxes = get_cached_boxes(cache_key)
+            if boxes is not None:
+                boxes_by_index[index] = boxes
+                cached_by_index[index] = True
+                continue
+
+            image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                results[index] = {'file_id': file_id, 'error': 'Could not load image'}
+                continue
+            to_recognize.append((index, cache_key, _apply_preprocessing(image, preprocessing)))
+
+        if to_recognize:
+            batch_boxes = get_ocr_service().recognize([image for _, _, image in to_recognize])
+            for (index, cache_key, _), boxes in zip(to_recognize, batch_boxes):
+                store_boxes(cache_key, boxes)
+                boxes_by_index[index] = boxes
+                cached_by_index[index] = False
+
+        for index, boxes in boxes_by_index.items():
+            item = items[index]
+            section_name = item.get('section_name', 'Section')
+            text, structured_data, confidence = _section_result(boxes, item.get('song_key', 'C'), section_name)
+            results[index] = {
+                'file_id': item['file_id'],
+                'section_name': section_name,
+                'text': text,
+                'structured_data': structured_data,
+                'confidence': confidence,
+                'cached': cached_by_index[index]
+            }
+
+        response = {
+            'success': True,
+            'language': language,
+            'results': results,
+            'recognized': len(to_recognize),
+            'cached': sum(1 for cached in cached_by_index.values() if cached)
+        }
+
+        if data.get('merge'):
+            sections = [result for result in results if 'structured_data' in result]
+            preliminary_sections = merge_ocr_sections(sections)
+            response['sections'] = [asdict(section) for section in preliminary_sections]
+            if data.get('title'):
+                response['song'] = finalize_song_data(
+                    preliminary_sections=preliminary_sections,
+                    title=data['title'],
+                    key=data.get('key', 'C'),
+                    authors=data.get('authors', [])
+                )
+
+        return jsonify(response), 200
+
+    except OcrQueueFull as e:
+        return jsonify({'error': str(e)}), 429
+    except OcrServiceError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         import traceback
         traceback.print_exc()
-        return jsonify({'error': f'Processing failed: {str(e)}'}), 500
+        return jsonify({'error': f'Batch processing failed: {str(e)}'}), 500
+
+
+@ocr_bp.route('/api/workers', methods=['GET'])
+@login_required
+@admin_required
+def ocr_worker_stats():
+    """Per-worker inference stats, result cache counters and ocr_temp usage"""
+    return jsonify({
+        'service': ocr_service_stats(),
+        'cache': ocr_cache_stats(),
+        'uploads': upload_stats()
+    })
 
 
 @ocr_bp.route('/api/languages', methods=['GET'])
@@ -191,11 +471,8 @@ def get_languages():
 def delete_file(file_id):
     """Delete uploaded file"""
     try:
-        for file in os.listdir(OCR_UPLOAD_FOLDER):
-            if file.startswith(file_id):
-                file_path = os.path.join(OCR_UPLOAD_FOLDER, file)
-                os.remove(file_path)
-                return jsonify({'success': True, 'message': 'File deleted'}), 200
+        if remove_upload(file_id):
+            return jsonify({'success': True, 'message': 'File deleted'}), 200
         
         return jsonify({'error': 'File not found'}), 404
         
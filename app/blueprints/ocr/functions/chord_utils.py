@@ -1,6 +1,11 @@
 # chord_utils.py
+import copy
 import re
-from typing import List, Dict, Union
+from functools import lru_cache
+from typing import Any, List, Dict, Union
+
+# Memoized (chord, key) <-> Nashville conversions
+CONVERSION_CACHE_SIZE = 8192
 
 class ChordUtils:
     """
@@ -19,7 +24,13 @@ class ChordUtils:
     _major_scale_qualities = ['', 'm', 'm', '', '', 'm', 'dim']
     _minor_scale_qualities = ['m', 'dim', '', 'm', 'm', '', '']
 
+    # Pitch class of every note spelling (sharps and flats)
+    _note_index = {**{n: i for i, n in enumerate(_notes_flat)}, **{n: i for i, n in enumerate(_notes_sharp)}}
+
+    # Degrees are single digits; chord_to_nashville writes C7 in C as "17"
+    _nashville_number_pattern = re.compile(r'^(\d)(.*)')
     _bass_note_pattern = re.compile(r'^[A-Ga-g][#b]?$')
+    _root_note_pattern = re.compile(r'^[A-G][#b]?')
     _chord_pattern = re.compile(
         r'^([A-Ga-g][#b]?)'  # Root note
         r'(m|maj|min|aug|dim|sus|add|\+|°|ø|-)?'  # Quality/type
@@ -46,6 +57,16 @@ class ChordUtils:
 
     @staticmethod
     def _generate_scale(key: str) -> List[str]:
+        return list(ChordUtils._key_table(key)['scale'])
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _key_table(key: str) -> Dict[str, Any]:
+        """
+        Everything chord conversion needs to know about a key, computed once per key:
+        the scale, the default chord qualities, and the Nashville degree (with
+        accidental) of every chromatic pitch class.
+        """
         key_info = ChordUtils.parse_key(key)
         root, scale_type = key_info['root'], key_info['scale']
 
@@ -62,16 +83,33 @@ class ChordUtils:
                 raise ValueError(f"Invalid key root: {root}")
 
         intervals = ChordUtils._scale_intervals[scale_type]
-        return [chromatic_scale[(start_index + i) % 12] for i in intervals]
+        scale = tuple(chromatic_scale[(start_index + i) % 12] for i in intervals)
+        scale_indices = [ChordUtils._note_index[note] for note in scale]
+
+        # Chromatic notes: the first scale degree a semitone above (b) or below (#)
+        chromatic_degrees = {}
+        for note_index in range(12):
+            for i, scale_note_index in enumerate(scale_indices):
+                if (note_index + 1) % 12 == scale_note_index:
+                    chromatic_degrees[note_index] = ('b', str(i + 1))
+                    break
+                if (note_index - 1 + 12) % 12 == scale_note_index:
+                    chromatic_degrees[note_index] = ('#', str(i + 1))
+                    break
+
+        return {
+            'scale': scale,
+            'scale_type': scale_type,
+            'qualities': ChordUtils._minor_scale_qualities if scale_type == 'minor' else ChordUtils._major_scale_qualities,
+            'note_to_number': {note.lower(): str(i + 1) for i, note in enumerate(scale)},
+            'chromatic_degrees': chromatic_degrees,
+        }
 
     @staticmethod
     def _apply_accidental(note: str, accidental: str) -> str:
         if not accidental:
             return note
-        try:
-            index = ChordUtils._notes_sharp.index(note)
-        except ValueError:
-            index = ChordUtils._notes_flat.index(note)
+        index = ChordUtils._note_index[note]
         
         if accidental == 'b':
             index = (index - 1 + 12) % 12
@@ -84,6 +122,10 @@ class ChordUtils:
     def nashville_to_chord(nashville: str, key: str) -> str:
         if nashville == "N.C." or not key:
             return nashville
+        return _nashville_to_chord(nashville, key)
+
+    @staticmethod
+    def _nashville_to_chord(nashville: str, key: str) -> str:
         
         # Handle slash chords recursively
         if '/' in nashville:
@@ -92,10 +134,14 @@ class ChordUtils:
             bass_nashville = parts[1].strip()
             base_chord = ChordUtils.nashville_to_chord(base_nashville, key)
             bass_chord = ChordUtils.nashville_to_chord(bass_nashville, key)
+            # The bass is a single note, not a chord with the degree's default quality
+            bass_root = ChordUtils._root_note_pattern.match(bass_chord)
+            if bass_root and bass_nashville[-1:].isdigit():
+                bass_chord = bass_root.group(0)
             return f"{base_chord}/{bass_chord}"
 
-        key_info = ChordUtils.parse_key(key)
-        scale = ChordUtils._generate_scale(key)
+        table = ChordUtils._key_table(key)
+        scale = table['scale']
         
         accidental = ''
         number_str = nashville
@@ -104,7 +150,7 @@ class ChordUtils:
             number_str = nashville[1:]
             
         # Find where the number ends and modifiers begin
-        num_match = re.match(r'^(\d+)(.*)', number_str)
+        num_match = ChordUtils._nashville_number_pattern.match(number_str)
         if not num_match:
             return nashville # Invalid format
 
@@ -120,8 +166,7 @@ class ChordUtils:
         
         # If no quality is specified, use the default for the scale degree
         if not any(c in modifiers for c in ['m', 'dim', 'aug', '+', '°']) and not accidental:
-            qualities = ChordUtils._minor_scale_qualities if key_info['scale'] == 'minor' else ChordUtils._major_scale_qualities
-            default_quality = qualities[number - 1]
+            default_quality = table['qualities'][number - 1]
             return f"{root_note}{default_quality}{modifiers}"
         
         return f"{root_note}{modifiers}"
@@ -130,6 +175,10 @@ class ChordUtils:
     def chord_to_nashville(chord: str, key: str) -> str:
         if chord == "N.C." or not key:
             return chord
+        return _chord_to_nashville(chord, key)
+
+    @staticmethod
+    def _chord_to_nashville(chord: str, key: str) -> str:
 
         # Handle slash chords recursively
         if '/' in chord:
@@ -142,9 +191,7 @@ class ChordUtils:
             bass_nashville_num = re.sub(r'[^b#\d]', '', bass_nashville_num)
             return f"{base_nashville}/{bass_nashville_num}"
 
-        key_info = ChordUtils.parse_key(key)
-        scale = ChordUtils._generate_scale(key)
-        note_to_number_map = {note.lower(): str(i + 1) for i, note in enumerate(scale)}
+        table = ChordUtils._key_table(key)
         
         match = ChordUtils._chord_pattern.match(chord)
         if not match:
@@ -157,36 +204,19 @@ class ChordUtils:
         nashville_number = None
         accidental_prefix = ''
 
-        if root.lower() in note_to_number_map:
-            nashville_number = note_to_number_map[root.lower()]
+        if root.lower() in table['note_to_number']:
+            nashville_number = table['note_to_number'][root.lower()]
         else: # Chromatic note
-            try:
-                note_index = ChordUtils._notes_sharp.index(root)
-            except ValueError:
-                note_index = ChordUtils._notes_flat.index(root)
-            
-            for i, scale_note in enumerate(scale):
-                try:
-                    scale_note_index = ChordUtils._notes_sharp.index(scale_note)
-                except ValueError:
-                    scale_note_index = ChordUtils._notes_flat.index(scale_note)
-                
-                if (note_index + 1) % 12 == scale_note_index:
-                    accidental_prefix = 'b'
-                    nashville_number = str(i + 1)
-                    break
-                if (note_index - 1 + 12) % 12 == scale_note_index:
-                    accidental_prefix = '#'
-                    nashville_number = str(i + 1)
-                    break
+            note_index = ChordUtils._note_index.get(root[0].upper() + root[1:])
+            if note_index in table['chromatic_degrees']:
+                accidental_prefix, nashville_number = table['chromatic_degrees'][note_index]
         
         if nashville_number is None:
             return chord
 
         # Check if the quality is default for the scale degree
         if not accidental_prefix:
-            qualities = ChordUtils._minor_scale_qualities if key_info['scale'] == 'minor' else ChordUtils._major_scale_qualities
-            default_quality = qualities[int(nashville_number) - 1]
+            default_quality = table['qualities'][int(nashville_number) - 1]
             
             chord_quality = (components[1] or "")
             if (chord_quality == 'm' and default_quality == 'm') or \
@@ -197,6 +227,43 @@ class ChordUtils:
 
         return f"{accidental_prefix}{nashville_number}{modifiers}"
 
+    @staticmethod
+    def transpose_chord(chord: str, from_key: str, to_key: str) -> str:
+        """Transpose a chord name by way of its Nashville number"""
+        return ChordUtils.nashville_to_chord(ChordUtils.chord_to_nashville(chord, from_key), to_key)
+
+    @staticmethod
+    def convert_chords(chords: List[str], key: str, to_nashville: bool = True) -> List[str]:
+        """Convert many chords (or Nashville numbers, with to_nashville=False) in one call"""
+        convert = ChordUtils.chord_to_nashville if to_nashville else ChordUtils.nashville_to_chord
+        return [convert(chord, key) for chord in chords]
+
+    @staticmethod
+    def render_song(song: Dict[str, Any], key: str = None) -> Dict[str, Any]:
+        """
+        Return a copy of a song JSON (chords stored as Nashville numbers) with every
+        chord rendered as a chord name in `key` (default: the song's own key).
+        """
+        header = song.get('header', {}) or {}
+        key = key or header.get('key')
+        rendered = copy.deepcopy(song)
+        if not key:
+            return rendered
+        rendered.setdefault('header', {})['key'] = key
+
+        for section_lines in (rendered.get('data') or {}).values():
+            for line in section_lines:
+                chords = line.get('chords') or {}
+                line['chords'] = {position: ChordUtils.nashville_to_chord(value, key)
+                                  for position, value in chords.items()}
+        return rendered
+
+    @staticmethod
+    def conversion_cache_info() -> Dict[str, Any]:
+        return {
+            'chord_to_nashville': _chord_to_nashville.cache_info()._asdict(),
+            'nashville_to_chord': _nashville_to_chord.cache_info()._asdict(),
+        }
 
     @staticmethod
     def is_potential_chord_token(token: str) -> bool:
@@ -216,4 +283,13 @@ class ChordUtils:
 
     @staticmethod
     def extract_chords_from_line(line: str) -> List[str]:
-        return [token for token in line.split() if ChordUtils.is_potential_chord_token(token)]
\ No newline at end of file
+        return [token for token in line.split() if ChordUtils.is_potential_chord_token(token)]
+
+
+_chord_to_nashville = lru_cache(maxsize=CONVERSION_CACHE_SIZE)(ChordUtils._chord_to_nashville)
+_nashville_to_chord = lru_cache(maxsize=CONVERSION_CACHE_SIZE)(ChordUtils._nashville_to_chord)
+
+# Build the tables of all 24 keys (in both spellings) up front
+for _root in dict.fromkeys(ChordUtils._notes_sharp + ChordUtils._notes_flat):
+    ChordUtils._key_table(_root)
+    ChordUtils._key_table(_root + 'm')
@@ -1,36 +1,69 @@
 from dataclasses import dataclass
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple
 import re
 import hashlib
 from app.blueprints.ocr.functions.chord_utils import ChordUtils
 from app.blueprints.ocr.functions.cData import PreliminaryLine, PreliminarySection, Chord, LineData, SongSection
 
+_TOKEN_PATTERN = re.compile(r'\S+')
+_NASHVILLE_PATTERN = re.compile(r'^[b#]?[1-7][maug\-dim°ø+()\/\d]*$')
+_SECTION_PATTERN = re.compile(r'^\s*\[(.*?)\]\s*$', re.IGNORECASE)
+
+# Token kinds
+CHORD = 'chord'          # Traditional chord name, e.g. "F#m7"
+NASHVILLE = 'nashville'  # Nashville number, e.g. "4maj7"
+OTHER = 'other'
+
+@dataclass(frozen=True)
+class LineToken:
+    position: int  # Character offset in the line
+    text: str
+    kind: str
+
+@lru_cache(maxsize=8192)
+def _classify_token(token: str) -> str:
+    if ChordUtils.is_potential_chord_token(token):
+        return CHORD
+    if _NASHVILLE_PATTERN.match(token):
+        return NASHVILLE
+    return OTHER
+
+@lru_cache(maxsize=4096)
+def tokenize_line(text: str) -> Tuple[LineToken, ...]:
+    """
+    Split a line into whitespace-separated tokens with their offsets and kinds.
+    Cached per line text, so detection, structuring and finalizing classify each line once.
+    """
+    return tuple(
+        LineToken(match.start(), match.group(0), _classify_token(match.group(0)))
+        for match in _TOKEN_PATTERN.finditer(text)
+    )
+
+def chord_line_entries(text: str, key: str) -> List[Tuple[int, str, str]]:
+    """(position, nashville, original) for every chord token of a chord line"""
+    entries = []
+    for token in tokenize_line(text):
+        if token.kind == CHORD:
+            # Convert traditional chord to Nashville
+            entries.append((token.position, ChordUtils.chord_to_nashville(token.text, key), token.text))
+        elif token.kind == NASHVILLE:
+            # Already Nashville, use as-is
+            entries.append((token.position, token.text, token.text))
+    return entries
+
 def get_chord_line_certainty(line: str) -> float:
     """Enhanced chord line detection."""
-    line = line.strip()
-    if not line:
-        return 0.0
-    
-    tokens = re.split(r'\s+', line)
+    tokens = tokenize_line(line)
     if not tokens:
         return 0.0
     
-    chord_tokens = []
-    for token in tokens:
-        # Check traditional chords
-        if ChordUtils.is_potential_chord_token(token):
-            chord_tokens.append(token)
-        # Check Nashville numbers
-        elif re.match(r'^[b#]?[1-7][maug\-dim°ø+()\/\d]*$', token):
-            chord_tokens.append(token)
-        # Check pure numbers
-        elif token.isdigit() and 1 <= int(token) <= 7:
-            chord_tokens.append(token)
-    
-    ratio = len(chord_tokens) / len(tokens)
+    # Traditional chords and Nashville numbers both count as chord tokens
+    chord_tokens = sum(1 for token in tokens if token.kind != OTHER)
+    ratio = chord_tokens / len(tokens)
     
     # Also consider average token length (chords are typically short)
-    avg_length = sum(len(t) for t in tokens) / len(tokens)
+    avg_length = sum(len(token.text) for token in tokens) / len(tokens)
     
     # Boost certainty if tokens are short
     if avg_length < 4:
@@ -43,11 +76,9 @@ def parse_raw_text_to_preliminary(raw_text: str) -> List[PreliminarySection]:
     sections = []
     current_title = "Section"
     current_lines = []
-    
-    section_pattern = re.compile(r'^\s*\[(.*?)\]\s*$', re.IGNORECASE)
 
     for line_text in raw_text.split('\n'):
-        match = section_pattern.match(line_text)
+        match = _SECTION_PATTERN.match(line_text)
         if match:
             # Save the previous section if it has content
             if current_lines:
@@ -187,30 +218,13 @@ def finalize_song_data(
         while i < len(lines):
             line = lines[i]
             if line.is_chord_line:
-                chord_line_text = line.text
+                entries = chord_line_entries(line.text, key)
                 # Check for a following lyric line
                 if i + 1 < len(lines) and not lines[i+1].is_chord_line:
                     lyric_line = lines[i+1]
-                    chords_dict = {}
-                    
-                    # Use finditer to get match objects with positions
-                    for match in re.finditer(r'\S+', chord_line_text):
-                        chord_text = match.group(0)
-                        position = match.start()
-                        
-                        # Check if it's a traditional chord OR Nashville number
-                        is_traditional = ChordUtils.is_potential_chord_token(chord_text)
-                        is_nashville = re.match(r'^[b#]?[1-7][maug\-dim°ø+()\/\d]*$', chord_text)
-                        
-                        if is_traditional:
-                            # Convert traditional chord to Nashville
-                            nashville = ChordUtils.chord_to_nashville(chord_text, key)
-                            clamped_pos = min(position, len(lyric_line.text))
-                            chords_dict[str(clamped_pos)] = nashville
-                        elif is_nashville:
-                            # Already Nashville, use as-is
-                            clamped_pos = min(position, len(lyric_line.text))
-                            chords_dict[str(clamped_pos)] = chord_text
+                    # Chords past the end of the lyrics are placed at its end
+                    chords_dict = {str(min(position, len(lyric_line.text))): nashville
+                                   for position, nashville, _ in entries}
                     
                     final_lines.append({
                         "lyrics": lyric_line.text,
@@ -219,23 +233,9 @@ def finalize_song_data(
                     i += 2  # Skip both lines
                 else: 
                     # Chord-only instrumental line
-                    chords_dict = {}
-                    for match in re.finditer(r'\S+', chord_line_text):
-                        chord_text = match.group(0)
-                        position = match.start()
-                        
-                        is_traditional = ChordUtils.is_potential_chord_token(chord_text)
-                        is_nashville = re.match(r'^[b#]?[1-7][maug\-dim°ø+()\/\d]*$', chord_text)
-                        
-                        if is_traditional:
-                            nashville = ChordUtils.chord_to_nashville(chord_text, key)
-                            chords_dict[str(position)] = nashville
-                        elif is_nashville:
-                            chords_dict[str(position)] = chord_text
-                    
                     final_lines.append({
                         "lyrics": "",
-                        "chords": chords_dict
+                        "chords": {str(position): nashville for position, nashville, _ in entries}
                     })
                     i += 1
             else: 
@@ -277,34 +277,13 @@ def preliminary_to_structured(prelim_section, key):
     
     for line in prelim_section.lines:
         if line.is_chord_line:
-            # Parse chord tokens and their positions
-            chord_content = []
-            import re
-            for match in re.finditer(r'\S+', line.text):
-                chord_text = match.group(0)
-                position = match.start()
-                
-                # Check if it's a traditional chord OR a Nashville number
-                is_nashville_number = re.match(r'^[b#]?[1-7][maug\-dim°ø+()\/\d]*$', chord_text)
-                is_traditional_chord = ChordUtils.is_potential_chord_token(chord_text)
-                
-                if is_traditional_chord:
-                    # Convert traditional chord to Nashville
-                    nashville = ChordUtils.chord_to_nashville(chord_text, key)
-                    chord_content.append({
-                        'position_x': position * 10,  # Convert char to pixel
-                        'chord': nashville,
-                        'original': chord_text,
-                        'confidence': line.certainty
-                    })
-                elif is_nashville_number:
-                    # Already a Nashville number, keep as-is
-                    chord_content.append({
-                        'position_x': position * 10,
-                        'chord': chord_text,  # Keep the Nashville notation
-                        'original': chord_text,
-                        'confidence': line.certainty
-                    })
+            # Chord tokens and their positions (traditional chords converted to Nashville)
+            chord_content = [{
+                'position_x': position * 10,  # Convert char to pixel
+                'chord': nashville,
+                'original': original,
+                'confidence': line.certainty
+            } for position, nashville, original in chord_line_entries(line.text, key)]
             
             if chord_content:
                 lines.append({
@@ -0,0 +1,255 @@
+# OCR inference service: a fixed number of worker processes, each holding its own
+# PaddleOCR model, fed by a bounded queue. PaddleOCR predictors are not thread-safe
+# and take seconds to load, so Flask threads never touch a model directly.
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from app.workables.config.manager import get_typed_config
+from app.workables.ocr.worker import worker_main
+
+OCR_TIMEOUT = 300        # Seconds a request waits for its result
+QUICK_EXIT_SECONDS = 30  # A worker dying sooner than this after its start counts as a quick exit
+MAX_QUICK_EXITS = 5      # Quick exits in a row before a worker is given up ('failed')
+MAX_RESTART_DELAY = 60   # Upper bound of the exponential restart backoff, in seconds
+
+
+class OcrQueueFull(Exception):
+    """Raised when ocr_max_pending requests are already queued or running."""
+
+
+class OcrServiceError(RuntimeError):
+    """Raised when no worker can run inference (model missing, workers crashed)."""
+
+
+class OcrService:
+    def __init__(self, workers, max_pending, warmup=True):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.warmup = warmup
+        self._ctx = multiprocessing.get_context('spawn')
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._futures = {}     # task_id -> Future
+        self._processes = {}   # worker_id -> Process
+        self._stats = {}       # worker_id -> counters
+        self._running = {}     # worker_id -> task_id currently processed
+        self._started = {}     # worker_id -> monotonic start time of the current process
+        self._quick_exits = {} # worker_id -> quick exits in a row
+        self._respawn_at = {}  # worker_id -> monotonic time a dead worker is restarted
+        self._queued = 0
+        self._stopped = False
+        self._collector = None
+
+    def start(self):
+        for worker_id in range(self.workers):
+            self._spawn(worker_id)
+        self._collector = threading.Thread(target=self._collect, name='ocr-results', daemon=True)
+        self._collector.start()
+
+    def _spawn(self, worker_id):
+        process = self._ctx.Process(
+            target=worker_main,
+            args=(worker_id, self._tasks, self._results, self.warmup),
+            name=f'ocr-worker-{worker_id}',
+            daemon=True
+        )
+        process.start()
+        with self._lock:
+            self._processes[worker_id] = process
+            self._started[worker_id] = time.monotonic()
+            self._respawn_at.pop(worker_id, None)
+            restarts = self._stats.get(worker_id, {}).get('restarts', -1) + 1
+            self._stats[worker_id] = {
+                'pid': process.pid,
+                'state': 'starting',
+                'spawned_at': time.time(),
+                'load_seconds': None,
+                'tasks': 0,
+                'images': 0,
+                'errors': 0,
+                'busy_seconds': 0.0,
+                'last_error': None,
+                'restarts': restarts,
+            }
+
+    def _fail(self, task_id, error):
+        with self._lock:
+            future = self._futures.pop(task_id, None)
+        if future is not None:
+            self._slots.release()
+            future.set_exception(error)
+
+    def _collect(self):
+        """Resolve futures from worker messages and replace workers that died."""
+        last_check = time.monotonic()
+        while not self._stopped:
+            if time.monotonic() - last_check >= 1:
+                last_check = time.monotonic()
+                self._check_workers()
+            try:
+                message = self._results.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            kind, worker_id = message[0], message[1]
+            with self._lock:
+                stats = self._stats.get(worker_id)
+            if stats is None:
+                continue
+
+            if kind == 'ready':
+                stats.update(state='idle', pid=message[2], load_seconds=round(message[3], 2))
+                logging.info("OCR worker %s ready after %.1fs", worker_id, message[3])
+            elif kind == 'failed':
+                stats.update(state='failed', last_error=message[3])
+                logging.error("OCR worker %s could not load the model: %s", worker_id, message[3])
+                self._fail_if_no_workers()
+            elif kind == 'started':
+                stats['state'] = 'busy'
+                with self._lock:
+                    self._queued -= 1
+                    self._running[worker_id] = message[2]
+            elif kind == 'done':
+                _, _, task_id, boxes, error, elapsed = message
+                with self._lock:
+                    self._running.pop(worker_id, None)
+                    future = self._futures.pop(task_id, None)
+                stats['state'] = 'idle'
+                stats['tasks'] += 1
+                stats['busy_seconds'] += elapsed
+                if error is None:
+                    stats['images'] += len(boxes)
+                else:
+                    stats['errors'] += 1
+                    stats['last_error'] = error
+                if future is not None:
+                    self._slots.release()
+                    if error is None:
+                        future.set_result(boxes)
+                    else:
+                        future.set_exception(OcrServiceError(f"OCR failed: {error}"))
+
+    def _check_workers(self):
+        """
+        Restart workers that died, with exponential backoff. A worker that keeps dying
+        right after its start (e.g. crashing while importing) is marked 'failed'.
+        """
+        now = time.monotonic()
+        with self._lock:
+            dead = [(wid, p) for wid, p in self._processes.items()
+                    if p is not None and not p.is_alive() and self._stats[wid]['state'] != 'failed']
+            due = [wid for wid, at in self._respawn_at.items() if at <= now]
+
+        for worker_id, process in dead:
+            with self._lock:
+                self._processes[worker_id] = None
+                task_id = self._running.pop(worker_id, None)
+                if now - self._started.get(worker_id, now) < QUICK_EXIT_SECONDS:
+                    self._quick_exits[worker_id] = self._quick_exits.get(worker_id, 0) + 1
+                else:
+                    self._quick_exits[worker_id] = 1
+                quick_exits = self._quick_exits[worker_id]
+                stats = self._stats[worker_id]
+            if task_id is not None:
+                self._fail(task_id, OcrServiceError("OCR worker crashed while processing the image"))
+
+            if quick_exits >= MAX_QUICK_EXITS:
+                logging.error("OCR worker %s exited with code %s %s times in a row, giving up",
+                              worker_id, process.exitcode, quick_exits)
+                stats.update(state='failed', last_error=f'exited with code {process.exitcode} {quick_exits} times in a row')
+                self._fail_if_no_workers()
+                continue
+
+            delay = min(2 ** (quick_exits - 1), MAX_RESTART_DELAY)
+            logging.error("OCR worker %s exited with code %s, restarting in %ss", worker_id, process.exitcode, delay)
+            stats['state'] = 'restarting'
+            with self._lock:
+                self._respawn_at[worker_id] = now + delay
+
+        for worker_id in due:
+            if not self._stopped:
+                self._spawn(worker_id)
+
+    def _fail_if_no_workers(self):
+        with self._lock:
+            if any(s['state'] != 'failed' for s in self._stats.values()):
+                return
+            task_ids = list(self._futures)
+        for task_id in task_ids:
+            self._fail(task_id, OcrServiceError("No OCR worker available"))
+
+    def submit(self, images):
+        """Queue a list of images (numpy arrays). Returns a Future of one box list per image."""
+        with self._lock:
+            if self._stats and all(s['state'] == 'failed' for s in self._stats.values()):
+                errors = {s['last_error'] for s in self._stats.values()}
+                raise OcrServiceError(f"No OCR worker available: {'; '.join(sorted(errors))}")
+        if not self._slots.acquire(blocking=False):
+            raise OcrQueueFull(f"{self.max_pending} OCR requests are already pending")
+
+        task_id = next(self._ids)
+        future = Future()
+        with self._lock:
+            self._futures[task_id] = future
+            self._queued += 1
+        self._tasks.put((task_id, list(images)))
+        return future
+
+    def recognize(self, images, timeout=OCR_TIMEOUT):
+        """Run OCR on a list of images and return one [[bbox, (text, score)], ...] list per image."""
+        return self.submit(images).result(timeout=timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'pending': len(self._futures),
+                'queued': max(self._queued, 0),
+                'worker_stats': {wid: dict(s) for wid, s in self._stats.items()},
+            }
+
+    def shutdown(self):
+        self._stopped = True
+        processes = [p for p in self._processes.values() if p is not None]
+        for _ in processes:
+            self._tasks.put(None)
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_ocr_service():
+    """Return the OCR service, starting the worker processes on first use."""
+    global _service
+    if multiprocessing.parent_process() is not None:
+        # Spawned children re-import __main__ (run.py builds the app there); they must
+        # never start workers of their own
+        raise OcrServiceError("The OCR service cannot be started from a child process")
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                cfg = get_typed_config()
+                service = OcrService(cfg.ocr_workers, cfg.ocr_max_pending, cfg.ocr_warmup)
+                service.start()
+                _service = service
+    return _service
+
+
+def ocr_service_stats():
+    """Worker stats, or None if the service has not been started yet"""
+    return _service.stats() if _service is not None else None
@@ -0,0 +1,51 @@
+import hashlib
+import json
+import threading
+
+from cachetools import LRUCache
+
+# Raw OCR boxes of recently processed images. Section name and key are applied
+# afterwards by process_ocr_result, so renaming a section or changing its key
+# reuses the boxes instead of running inference again.
+OCR_CACHE_SIZE = 256
+
+_lock = threading.Lock()
+_cache = LRUCache(maxsize=OCR_CACHE_SIZE)
+_hits = 0
+_misses = 0
+
+
+def ocr_cache_key(image_bytes, preprocessing=None, language=None):
+    """Content hash of the image plus every option that changes the OCR output"""
+    digest = hashlib.sha256(image_bytes)
+    digest.update(json.dumps(preprocessing or {}, sort_keys=True).encode('utf-8'))
+    digest.update((language or '').encode('utf-8'))
+    return digest.hexdigest()
+
+def get_cached_boxes(key):
+    """Return the cached [[bbox, (text, score)], ...] list for a key, or None"""
+    global _hits, _misses
+    with _lock:
+        boxes = _cache.get(key)
+        if boxes is None:
+            _misses += 1
+        else:
+            _hits += 1
+        return boxes
+
+def store_boxes(key, boxes):
+    with _lock:
+        _cache[key] = boxes
+
+def clear_ocr_cache():
+    with _lock:
+        _cache.clear()
+
+def ocr_cache_stats():
+    with _lock:
+        return {
+            'size': len(_cache),
+            'max_size': OCR_CACHE_SIZE,
+            'hits': _hits,
+            'misses': _misses,
+        }
@@ -0,0 +1,181 @@
+import glob
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from app.blueprints.ocr import OCR_UPLOAD_FOLDER
+from app.workables.config.manager import get_typed_config
+
+SWEEP_INTERVAL = 300  # Seconds between two sweeps of ocr_temp
+
+
+class OcrQuotaExceeded(Exception):
+    """Raised when an upload does not fit into ocr_temp even after evicting older uploads."""
+
+
+@dataclass
+class UploadRecord:
+    file_id: str
+    path: str
+    size: int
+    type: str
+    created_at: float
+
+    def to_dict(self):
+        return {
+            'file_id': self.file_id,
+            'size': self.size,
+            'type': self.type,
+            'created_at': self.created_at
+        }
+
+
+_lock = threading.Lock()
+_uploads = {}  # file_id -> UploadRecord
+_total_size = 0
+_loaded = False
+_sweeper = None
+
+
+def _load_existing():
+    """Register files left in ocr_temp by an earlier run (called with _lock held)"""
+    global _loaded, _total_size
+    if _loaded:
+        return
+    for entry in os.scandir(OCR_UPLOAD_FOLDER):
+        if not entry.is_file():
+            continue
+        file_id, _, ext = entry.name.partition('.')
+        stat_result = entry.stat()
+        _uploads[file_id] = UploadRecord(file_id, entry.path, stat_result.st_size, ext.lower(), stat_result.st_mtime)
+        _total_size += stat_result.st_size
+    _loaded = True
+
+def _ensure_started():
+    global _sweeper
+    with _lock:
+        _load_existing()
+        if _sweeper is None:
+            _sweeper = threading.Thread(target=_sweep_loop, name='ocr-temp-sweeper', daemon=True)
+            _sweeper.start()
+
+def _delete(record):
+    """Forget a record and remove its file (called with _lock held)"""
+    global _total_size
+    if _uploads.pop(record.file_id, None) is None:
+        return
+    _total_size -= record.size
+    try:
+        os.remove(record.path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logging.error("Could not delete OCR upload %s: %s", record.path, e)
+
+def _limits():
+    cfg = get_typed_config()
+    return cfg.ocr_upload_ttl, cfg.ocr_temp_quota_mb * 1024 * 1024
+
+def sweep_uploads():
+    """Delete uploads older than ocr_upload_ttl and evict the oldest ones while over quota"""
+    ttl, quota = _limits()
+    cutoff = time.time() - ttl
+    with _lock:
+        _load_existing()
+        removed = 0
+        for record in sorted(_uploads.values(), key=lambda r: r.created_at):
+            if record.created_at >= cutoff and _total_size <= quota:
+                break
+            _delete(record)
+            removed += 1
+    return removed
+
+def _sweep_loop():
+    while True:
+        time.sleep(SWEEP_INTERVAL)
+        try:
+            removed = sweep_uploads()
+            if removed:
+                logging.info("Removed %s expired OCR uploads", removed)
+        except Exception:
+            logging.exception("Sweeping ocr_temp failed")
+
+def register_upload(file_id, path, file_type):
+    """
+    Record a file saved to ocr_temp. Older uploads are evicted to stay within
+    ocr_temp_quota_mb; raises OcrQuotaExceeded (and removes the file) if that is not enough.
+    """
+    global _total_size
+    _ensure_started()
+    _, quota = _limits()
+    size = os.path.getsize(path)
+    record = UploadRecord(file_id, path, size, file_type, time.time())
+
+    with _lock:
+        # The first call may already have picked the file up while scanning the folder
+        previous = _uploads.pop(file_id, None)
+        if previous is not None:
+            _total_size -= previous.size
+        if size > quota:
+            os.remove(path)
+            raise OcrQuotaExceeded(f'File exceeds the OCR upload quota of {quota // 1024 // 1024}MB')
+        for oldest in sorted(_uploads.values(), key=lambda r: r.created_at):
+            if _total_size + size <= quota:
+                break
+            _delete(oldest)
+        _uploads[file_id] = record
+        _total_size += size
+    return record
+
+def _lookup(file_id):
+    """
+    The record of file_id, registering a file saved by another worker process if this
+    process has not seen it (called with _lock held)
+    """
+    global _total_size
+    record = _uploads.get(file_id)
+    if record is not None or not file_id or os.path.basename(file_id) != file_id:
+        return record
+    for path in glob.glob(os.path.join(glob.escape(OCR_UPLOAD_FOLDER), glob.escape(file_id) + '.*')):
+        try:
+            stat_result = os.stat(path)
+        except FileNotFoundError:
+            continue
+        ext = os.path.basename(path).partition('.')[2]
+        record = UploadRecord(file_id, path, stat_result.st_size, ext.lower(), stat_result.st_mtime)
+        _uploads[file_id] = record
+        _total_size += stat_result.st_size
+        return record
+    return None
+
+def get_upload(file_id):
+    """Return the UploadRecord of an upload that still exists, or None"""
+    _ensure_started()
+    with _lock:
+        record = _lookup(file_id)
+        if record is not None and not os.path.exists(record.path):
+            _delete(record)
+            return None
+        return record
+
+def remove_upload(file_id):
+    """Delete an upload; returns False if it is unknown"""
+    _ensure_started()
+    with _lock:
+        record = _lookup(file_id)
+        if record is None:
+            return False
+        _delete(record)
+        return True
+
+def upload_stats():
+    ttl, quota = _limits()
+    with _lock:
+        return {
+            'files': len(_uploads),
+            'total_bytes': _total_size,
+            'quota_bytes': quota,
+            'ttl_seconds': ttl
+        }
@@ -1,13 +1,18 @@
 import json
 import os
 import re
-from flask import jsonify, g, request, send_from_directory, send_file
+import zipfile
+from flask import Response, jsonify, g, make_response, request, send_from_directory, send_file
 from werkzeug.utils import secure_filename
 
 from app import db
 from app.models.storage import File, Directory
 from app.models.user import User
 from app.blueprints.storage.utils import delete_directory_recursive, is_descendant # Import helpers
+from app.blueprints.storage.song_catalog import catalog_changes, catalog_version, delete_song_file, get_song_entry, list_catalog, update_song_file
+from app.blueprints.storage.song_bundle import iter_ndjson_bundle, iter_zip_bundle
+from app.blueprints.storage.song_import import MAX_SONG_FILE_SIZE, collect_from_zip, decode_song_text, import_songs, is_importable, summarize
+from app.blueprints.storage.song_transpose import iter_transposed_ndjson, normalize_key, render_song_file
 
 from app.utils.auth import admin_token, valid_token, approved_user_required
 from app.blueprints.storage import UPLOAD_FOLDER, storage_bp
@@ -23,45 +28,168 @@ def is_valid_json_file(filename):
 @storage_bp.route('/api/song_data/files', methods=['GET'])
 @valid_token
 def list_song_data():
-    """List all JSON files in the song_data folder and subfolders with their properties"""
+    """
+    List all JSON files in the song_data folder and subfolders with their properties.
+    Supports If-None-Match against the catalog version (304 when unchanged) and
+    ?since=<version> to return only the songs added, changed or deleted after that version.
+    """
     if not os.path.exists(SONG_DATA_FOLDER):
-        return jsonify({'files': []})
+        return jsonify({'files': [], 'version': 0})
     
-    files = []
-    # Walk through all subdirectories
-    for root, dirs, filenames in os.walk(SONG_DATA_FOLDER):
-        for filename in filenames:
-            if not is_valid_json_file(filename):
-                continue
-                
-            file_path = os.path.join(root, filename)
-            if os.path.isfile(file_path):
-                try:
-                    # Read the JSON file and extract its properties
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        json_content = json.load(f)
-
-                    header = json_content.get('header', {})
-                    name = header.get('name', 'Unknown')
-                    authors = header.get('authors', [])
-
-                    # Get relative path from SONG_DATA_FOLDER
-                    relative_path = os.path.relpath(file_path, SONG_DATA_FOLDER)
-                    
-                    # Add basic file info
-                    file_info = {
-                        'filename': filename,
-                        'path': relative_path,  # Include subfolder path
-                        'name': name,
-                        'authors': authors,
-                    }
-                    files.append(file_info)
-                except (json.JSONDecodeError, IOError) as e:
-                    # Skip files that can't be read or parsed
-                    print(f"Error reading {file_path}: {e}")
-                    continue
+    version = catalog_version()
+    etag = f'catalog-{version}'
+    
+    # Nothing changed since the client's last sync - don't even build the listing
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+    
+    since = request.args.get('since', type=int)
+    if since is not None and 0 <= since <= version:
+        changed, deleted = [], []
+        for entry in catalog_changes(since):
+            if entry.deleted:
+                deleted.append(entry.path)
+            else:
+                changed.append(entry.to_dict())
+        response = jsonify({
+            'version': version,
+            'since': since,
+            'changed': changed,
+            'deleted': deleted
+        })
+    else:
+        # Served from the persistent catalog; only files changed on disk get re-parsed
+        files = [entry.to_dict() for entry in list_catalog()]
+        response = jsonify({'files': files, 'version': version})
+    
+    response.set_etag(etag)
+    response.headers['X-Catalog-Version'] = str(version)
+    return response
+
+
+def _select_catalog_entries(paths, folder):
+    """Catalog entries matching the given song paths and/or folder, plus the number of unknown paths"""
+    entries = list_catalog()
+    missing = 0
+    
+    if paths:
+        by_path = {entry.path: entry for entry in entries}
+        selected = []
+        for path in paths:
+            entry = by_path.get(os.path.normpath(str(path).replace('/', os.sep)))
+            if entry is None:
+                missing += 1
+            else:
+                selected.append(entry)
+        entries = selected
+    
+    if folder:
+        prefix = os.path.normpath(folder.replace('/', os.sep)).rstrip(os.sep) + os.sep
+        entries = [entry for entry in entries if entry.path.startswith(prefix)]
+    
+    return entries, missing
+
+
+@storage_bp.route('/api/song_data/bundle', methods=['GET', 'POST'])
+@valid_token
+def bundle_song_data():
+    """
+    Stream many songs in one response instead of one request per song.
+    Parameters (query string or JSON body):
+      format: 'zip' (default) or 'ndjson'
+      paths:  list of song paths to include (as returned by /api/song_data/files)
+      folder: only include songs below this subfolder
+    Without paths and folder the whole catalog is streamed.
+    """
+    data = request.get_json(silent=True) or {}
+    bundle_format = (data.get('format') or request.args.get('format') or 'zip').lower()
+    paths = data.get('paths') or request.args.getlist('paths')
+    folder = data.get('folder') or request.args.get('folder')
+    if isinstance(paths, str):
+        paths = [paths]
+    
+    if bundle_format not in ('zip', 'ndjson'):
+        return jsonify({'error': 'Format must be zip or ndjson'}), 400
+    
+    entries, missing = _select_catalog_entries(paths, folder)
+    
+    if not entries:
+        return jsonify({'error': 'No matching songs found'}), 404
     
-    return jsonify({'files': files})
+    # Resolve everything up front; the generator runs after the request context is gone
+    songs = [(entry.path, os.path.join(SONG_DATA_FOLDER, entry.path), entry.etag) for entry in entries]
+    headers = {
+        'X-Bundle-Count': str(len(songs)),
+        'X-Bundle-Missing': str(missing),
+        'X-Catalog-Version': str(catalog_version()),
+        'X-Accel-Buffering': 'no',
+    }
+    
+    if bundle_format == 'ndjson':
+        return Response(iter_ndjson_bundle(songs), mimetype='application/x-ndjson', headers=headers)
+    
+    headers['Content-Disposition'] = 'attachment; filename=song_data.zip'
+    archive = [(path.replace(os.sep, '/'), full_path) for path, full_path, _ in songs]
+    return Response(iter_zip_bundle(archive), mimetype='application/zip', headers=headers)
+
+
+@storage_bp.route('/api/song_data/transpose', methods=['GET', 'POST'])
+@valid_token
+def transpose_song_data():
+    """
+    Return songs with their chords rendered in a target key.
+    Parameters (query string or JSON body):
+      key:    target key, e.g. 'D', 'Bb', 'F#m' (required)
+      path:   a single song -> JSON {path, key, etag, song}, with ETag/304 support
+      paths / folder: several songs -> NDJSON, one {path, etag, key, song} per line
+    Rendered songs are cached per (song etag, key).
+    """
+    data = request.get_json(silent=True) or {}
+    path = data.get('path') or request.args.get('path')
+    paths = data.get('paths') or request.args.getlist('paths')
+    folder = data.get('folder') or request.args.get('folder')
+    if isinstance(paths, str):
+        paths = [paths]
+    
+    try:
+        key = normalize_key(data.get('key') or request.args.get('key'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if path:
+        entries, _ = _select_catalog_entries([path], None)
+        if not entries:
+            return jsonify({'error': 'File not found'}), 404
+        entry = entries[0]
+        etag = f"{entry.etag}-{key}"
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+            response.set_etag(etag)
+            return response
+        try:
+            song = render_song_file(os.path.join(SONG_DATA_FOLDER, entry.path), entry.etag, key)
+        except (json.JSONDecodeError, IOError) as e:
+            return jsonify({'error': f'Could not read song: {e}'}), 500
+        response = jsonify({'path': entry.path, 'key': key, 'etag': entry.etag, 'song': song})
+        response.set_etag(etag)
+        return response
+    
+    if not paths and not folder:
+        return jsonify({'error': 'path, paths or folder is required'}), 400
+    
+    entries, missing = _select_catalog_entries(paths, folder)
+    if not entries:
+        return jsonify({'error': 'No matching songs found'}), 404
+    
+    songs = [(entry.path, os.path.join(SONG_DATA_FOLDER, entry.path), entry.etag) for entry in entries]
+    headers = {
+        'X-Bundle-Count': str(len(songs)),
+        'X-Bundle-Missing': str(missing),
+        'X-Accel-Buffering': 'no',
+    }
+    return Response(iter_transposed_ndjson(songs, key), mimetype='application/x-ndjson', headers=headers)
 
 
 @storage_bp.route('/api/song_data/<path:filepath>', methods=['GET'])
@@ -96,8 +224,12 @@ def download_song_data(filepath):
             print(f"Files in {directory}: {existing_files}")
         return jsonify({'error': 'File not found'}), 404
     
+    # ETag derived from the song hash, so unchanged songs are answered with 304 by send_file
+    entry = get_song_entry(full_path)
+    etag = entry.etag if entry else True
+    
     # Use send_file instead of send_from_directory for better path handling
-    return send_file(full_path, as_attachment=True, download_name=os.path.basename(full_path))
+    return send_file(full_path, as_attachment=True, download_name=os.path.basename(full_path), etag=etag)
 
 @storage_bp.route('/api/song_data', methods=['POST'])
 @admin_token
@@ -151,6 +283,9 @@ def upload_song_data():
         # Save the file
         file.save(file_path)
         
+        # Keep the song catalog in sync
+        update_song_file(file_path)
+        
         return jsonify({
             'success': True,
             'message': 'JSON file uploaded successfully',
@@ -165,6 +300,7 @@ def upload_song_data():
     except json.JSONDecodeError:
         return jsonify({'error': 'Invalid JSON format'}), 400
     except Exception as e:
+        db.session.rollback()
         # Clean up if file was partially created
         if 'file_path' in locals() and os.path.exists(file_path):
             try:
@@ -172,7 +308,41 @@ def upload_song_data():
             except OSError:
                 pass
         return jsonify({'error': f'Failed to save file: {str(e)}'}), 500
-    
+
+@storage_bp.route('/api/song_data/import', methods=['POST'])
+@admin_token
+def import_song_data():
+    """
+    Bulk import plain-text / ChordPro songs (files and/or zip archives in 'files') - requires admin token.
+    Form fields: folder (target subfolder), key (used when a song names none), overwrite.
+    """
+    uploads = request.files.getlist('files') or request.files.getlist('file')
+    if not uploads:
+        return jsonify({'error': 'No file part'}), 400
+
+    files = []
+    try:
+        for upload in uploads:
+            if upload.filename.lower().endswith('.zip'):
+                files.extend(collect_from_zip(upload.read()))
+            elif is_importable(upload.filename):
+                raw = upload.read(MAX_SONG_FILE_SIZE + 1)
+                files.append((upload.filename, decode_song_text(raw) if len(raw) <= MAX_SONG_FILE_SIZE else None))
+    except zipfile.BadZipFile:
+        return jsonify({'error': 'Invalid zip archive'}), 400
+    if not files:
+        return jsonify({'error': 'No importable files (.txt, .cho, .chopro, .chordpro, .crd, .pro)'}), 400
+
+    overwrite = request.form.get('overwrite', 'false').lower() in ('1', 'true', 'yes')
+    try:
+        report = import_songs(files, request.form.get('folder', ''), request.form.get('key') or 'C', overwrite)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Import failed, nothing was saved: {str(e)}'}), 500
+
+    return jsonify({'success': True, **summarize(report), 'report': report})
+
 @storage_bp.route('/api/song_data/<filename>', methods=['DELETE'])
 @admin_token
 def delete_song_data(filename):
@@ -187,11 +357,13 @@ def delete_song_data(filename):
     
     try:
         os.remove(file_path)
+        delete_song_file(file_path)
         return jsonify({
             'success': True,
             'message': 'File deleted successfully'
         })
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 # --- API ENDPOINTS FOR STANDARD FILE/FOLDER OPERATIONS (Called by storage.js) ---
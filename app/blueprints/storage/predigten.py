@@ -7,15 +7,21 @@ import pathlib
 import tempfile
 from datetime import datetime
 
-from flask import jsonify, render_template, request, Response, stream_with_context
+from flask import current_app, jsonify, render_template, request, Response, stream_with_context, url_for
 
-from app.workables.predigt_upload.youtube import get_last_livestream_data, download_youtube_audio_from_url
-from app.workables.predigt_upload.ftp_handler import list_ftp_files, refresh_website, upload_file_ftp
-from app.workables.predigt_upload.audio import compress_audio, generate_id3_tags
+from app.workables.predigt_upload.youtube import get_last_livestream_data
+from app.workables.predigt_upload.ftp_handler import iter_upload_file_ftp, list_ftp_files, refresh_website, upload_file_ftp
+from app.workables.predigt_upload.jobs import JobQueueFull, TERMINAL_STATUSES, get_live_job, is_job_live, submit_predigt_job
+from app.workables.config.manager import config_error
+from app import db
+from app.models.predigt import Predigt
         
 from app.utils.auth import admin_token, admin_required, predigt_user_required
 from app.blueprints.storage import storage_bp
 
+# Finished, tagged MP3s waiting for the FTP upload
+PROCESSED_FOLDER = pathlib.Path(__file__).parent / "processed_files"
+
 
 @storage_bp.route('/admin/predigt_upload/page')
 @predigt_user_required
@@ -29,8 +35,8 @@ def predigt_upload_item(video_id):
     return render_template('storage/predigt_upload/action.html', video_id=video_id)
 
 
-@predigt_user_required
 @storage_bp.route('/api/predigt_upload/action/<int:limit>', methods=['GET'])
+@predigt_user_required
 def get_action_data(limit):
     """
     Returns last livestreams with title, date (YYYY-MM-DD), and whether a file with
@@ -86,12 +92,13 @@ def get_action_data(limit):
         logging.exception("Error in /action")
         return jsonify({"status": "error", "message": str(e)}), 500
 
-@predigt_user_required
 @storage_bp.route('/predigt_upload/audio/process', methods=['POST'])
+@predigt_user_required
 def process_audio_stream():
     """
-    Processes an audio stream from a YouTube URL and streams NDJSON progress.
+    Queues processing of a YouTube livestream and returns the job id right away.
     Expects JSON: { "id": "...", "prediger": "...", "titel": "...", "datum": "YYYY-MM-DD" }
+    Progress: GET /predigt_upload/audio/jobs/<job_id> (poll) or .../stream (NDJSON).
     """
     data = request.get_json(silent=True) or {}
     vid = data.get("id")
@@ -111,68 +118,87 @@ def process_audio_stream():
     except Exception:
         return jsonify({"status": "error", "message": "Invalid date format. Use YYYY-MM-DD"}), 400
 
-    video_url = f"https://www.youtube.com/watch?v={vid}"
+    # Fail before downloading anything if config.json is broken
+    cfg_error = config_error()
+    if cfg_error:
+        return jsonify({"status": "error", "message": f"Konfigurationsfehler: {cfg_error}"}), 500
+
+    try:
+        job_id = submit_predigt_job(current_app._get_current_object(), vid, prediger, titel, datum_dt, PROCESSED_FOLDER)
+    except JobQueueFull as e:
+        return jsonify({"status": "error", "message": str(e)}), 429
+
+    return jsonify({
+        "status": "queued",
+        "job_id": job_id,
+        "status_url": url_for('storage.predigt_job_status', job_id=job_id),
+        "stream_url": url_for('storage.predigt_job_stream', job_id=job_id),
+    }), 202
+
+
+@storage_bp.route('/predigt_upload/audio/jobs/<string:job_id>', methods=['GET'])
+@predigt_user_required
+def predigt_job_status(job_id):
+    """Current state of a processing job (for polling)."""
+    predigt = Predigt.query.filter_by(job_id=job_id).first()
+    if predigt is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+
+    lost = predigt.status not in TERMINAL_STATUSES and not is_job_live(job_id)
+    if lost:
+        # The job may have finished after the row was read; its final state is committed by now
+        db.session.refresh(predigt)
+        lost = predigt.status not in TERMINAL_STATUSES
+    job = predigt.job_to_dict()
+    # Not finished but no longer running in this process (e.g. server restart)
+    job["lost"] = lost
+    return jsonify(job), 200
+
+
+@storage_bp.route('/predigt_upload/audio/jobs/<string:job_id>/stream', methods=['GET'])
+@predigt_user_required
+def predigt_job_stream(job_id):
+    """
+    NDJSON progress of a job. Replays all events so far and follows the job
+    until it finishes; clients can re-attach at any time.
+    """
+    predigt = Predigt.query.filter_by(job_id=job_id).first()
+    if predigt is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+
+    live = get_live_job(job_id)
+    if live is None and predigt.status not in TERMINAL_STATUSES:
+        # The job may have finished after the row was read; its final state is committed by now
+        db.session.refresh(predigt)
+    stored_events = list(predigt.events or [])
+    finished = predigt.status in TERMINAL_STATUSES
 
     def gen():
-        def nd(step, status, progress=None, message=None, **extra):
-            payload = {"step": step, "status": status}
-            if progress is not None:
-                payload["progress"] = f"{int(progress):02d}"
-            if message is not None:
-                payload["message"] = message
-            payload.update(extra)
-            return json.dumps(payload) + "\n"
-
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_dir_p = pathlib.Path(temp_dir)
-            try:
-                # 1) Download
-                yield nd("download", "in_progress", 5, "Starte Download…")
-                downloaded_path = download_youtube_audio_from_url(video_url)  # temp .mp3 path
-                downloaded_p = pathlib.Path(downloaded_path)
-                staged_p = temp_dir_p / downloaded_p.name
-                shutil.move(str(downloaded_p), staged_p)
-                yield nd("download", "completed", 15, "Download abgeschlossen.")
-
-                # 2) Compress
-                yield nd("compress", "in_progress", 30, "Starte Kompression…")
-                compressed_p = compress_audio(str(staged_p))
-                yield nd("compress", "completed", 60, "Kompression abgeschlossen.")
-
-                # 3) Tagging (stream sub-steps if your tagger yields events)
-                meta = {
-                    "title": titel,
-                    "speaker": prediger,
-                    "date": datum_dt.strftime("%Y-%m-%d"),
-                    "year": datum_dt.strftime("%Y"),
-                    "album": "Predigten aus Treffpunkt Leben Karlsruhe",
-                    "genre": "Predigt Online",
-                }
-                try:
-                    # If generate_id3_tags is a generator of dicts {step,status,message,...}
-                    for evt in generate_id3_tags(str(compressed_p), meta):
-                        yield json.dumps(evt) + "\n"
-                    yield nd("tags", "completed", 80, "ID3-Tags gesetzt.")
-                except TypeError:
-                    # If it returns bool
-                    ok = generate_id3_tags(str(compressed_p), meta)
-                    yield nd("tags", "completed" if ok else "skipped", 80,
-                             "ID3-Tags gesetzt." if ok else "ID3-Tags übersprungen.")
-
-                # 4) Finalize
-                final_name = f"predigt-{datum_dt.strftime('%Y-%m-%d')}_Treffpunkt_Leben_Karlsruhe.mp3"
-                yield nd("finalize", "in_progress", 90, f"Benennen in {final_name}…")
-                persistent_dir = pathlib.Path(__file__).parent / "processed_files"
-                persistent_dir.mkdir(exist_ok=True)
-                final_p = persistent_dir / final_name
-                if final_p.exists():
-                    final_p.unlink()
-                shutil.move(str(compressed_p), final_p)
-
-                yield nd("complete", "completed", 100, "Verarbeitung abgeschlossen!", final_path=str(final_p))
-            except Exception as e:
-                logging.exception("Error in processing stream")
-                yield nd("error", "failed", 0, f"Ein Fehler ist aufgetreten: {e}")
+        if live is None:
+            # Finished (or lost) - everything there is to say is stored on the row
+            for evt in stored_events:
+                yield json.dumps(evt) + "\n"
+            if not finished:
+                yield json.dumps({"step": "error", "status": "failed", "progress": "00",
+                                  "message": "Verarbeitung wurde unterbrochen. Bitte erneut starten."}) + "\n"
+            return
+
+        sent = 0
+        while True:
+            with live.condition:
+                while sent >= len(live.events) and not live.done:
+                    live.condition.wait(timeout=15)
+                    if sent >= len(live.events) and not live.done:
+                        break  # Timed out - send a keepalive below
+                pending = live.events[sent:]
+                done = live.done
+            if not pending and not done:
+                yield "\n"
+            for evt in pending:
+                yield json.dumps(evt) + "\n"
+            sent += len(pending)
+            if done and sent >= len(live.events):
+                return
 
     return Response(
         stream_with_context(gen()),
@@ -185,14 +211,41 @@ def process_audio_stream():
     )
 
 
-@predigt_user_required
 @storage_bp.route('/api/predigt_upload/ftp/upload', methods=['POST'])
+@predigt_user_required
 def ftp_upload():
     data = request.get_json(silent=True) or {}
     local_path = data.get('local_path')
     remote_name = data.get('remote_name')  # optional override
     if not local_path:
         return jsonify({"status": "error", "message": "local_path fehlt"}), 400
+
+    wants_stream = request.args.get('stream') == '1' or 'application/x-ndjson' in request.headers.get('Accept', '')
+    if wants_stream:
+        # Chunked upload with per-chunk throughput, followed by the website refresh
+        def generate():
+            last_status = None
+            try:
+                for evt in iter_upload_file_ftp(local_path, remote_name):
+                    last_status = evt["status"]
+                    yield json.dumps(evt) + "\n"
+                if last_status != "completed":
+                    return
+                yield json.dumps({"step": "refresh", "status": "in_progress", "message": "Aktualisiere Website…"}) + "\n"
+                if refresh_website():
+                    yield json.dumps({"step": "refresh", "status": "completed", "message": "Website aktualisiert."}) + "\n"
+                else:
+                    yield json.dumps({"step": "refresh", "status": "failed", "message": "Website refresh failed"}) + "\n"
+            except Exception as e:
+                logging.exception("FTP upload failed")
+                yield json.dumps({"step": "upload", "status": "failed", "message": str(e)}) + "\n"
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype="application/x-ndjson",
+            headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"},
+        )
+
     try:
         upload_success = upload_file_ftp(local_path, remote_name)
         refresh_success = refresh_website()
@@ -0,0 +1,71 @@
+import io
+import json
+import zipfile
+
+# Songs are read and written in chunks of this size, so a bundle never holds
+# more than one chunk (plus the zip bookkeeping) in memory
+CHUNK_SIZE = 64 * 1024
+
+
+class _StreamBuffer(io.RawIOBase):
+    """
+    Write-only, non-seekable sink for zipfile.
+    zipfile falls back to data descriptors for non-seekable output, so the archive
+    can be handed out chunk by chunk while it is being written.
+    """
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip_bundle(songs):
+    """
+    Yield a zip archive of the given songs piece by piece.
+    `songs` is a list of (archive_name, full_path) tuples.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for archive_name, full_path in songs:
+            try:
+                with open(full_path, 'rb') as src, zf.open(archive_name, 'w') as dest:
+                    while True:
+                        chunk = src.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        data = buffer.pop()
+                        if data:
+                            yield data
+            except OSError as e:
+                # File vanished between selection and streaming - skip it
+                print(f"Error adding {full_path} to bundle: {e}")
+            data = buffer.pop()
+            if data:
+                yield data
+    # Central directory
+    yield buffer.pop()
+
+
+def iter_ndjson_bundle(songs):
+    """
+    Yield one JSON line per song: {"path", "etag", "song"}.
+    `songs` is a list of (path, full_path, etag) tuples.
+    """
+    for path, full_path, etag in songs:
+        try:
+            with open(full_path, 'r', encoding='utf-8') as f:
+                song = json.load(f)
+            yield json.dumps({'path': path, 'etag': etag, 'song': song}, ensure_ascii=False) + "\n"
+        except (json.JSONDecodeError, IOError) as e:
+            yield json.dumps({'path': path, 'error': str(e)}) + "\n"
@@ -0,0 +1,213 @@
+import json
+import os
+import threading
+import time
+
+from sqlalchemy import func
+
+from app import db
+from app.models.storage import SongCatalogEntry
+from app.blueprints.storage.utils import SONG_DATA_FOLDER
+
+# Minimum number of seconds between two scans of SONG_DATA_FOLDER.
+# Uploads and deletes through the API update the catalog directly, so this only
+# limits how long a file copied into the folder by hand stays unnoticed.
+SCAN_INTERVAL = 30
+
+# Guards every catalog write so each change gets its own, strictly increasing version
+_catalog_lock = threading.RLock()
+_last_scan = None
+
+# Files that could not be parsed, mapped to the (mtime, size) they had at the time.
+# They are only retried once they change on disk.
+_unreadable = {}
+
+
+def _is_song_file(filename):
+    return filename.lower().endswith('.json')
+
+def _relative_path(file_path):
+    return os.path.relpath(file_path, SONG_DATA_FOLDER)
+
+def _read_song_metadata(file_path):
+    """Parse a song JSON file and return the fields kept in the catalog"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        json_content = json.load(f)
+
+    header = json_content.get('header', {}) or {}
+    return {
+        'name': header.get('name', 'Unknown'),
+        'authors': header.get('authors', []),
+        'key': header.get('key'),
+        'song_hash': json_content.get('hash'),
+    }
+
+def _current_version():
+    return db.session.query(func.max(SongCatalogEntry.version)).scalar() or 0
+
+def _index_song_file(file_path, version, entry=None, stat_result=None):
+    """
+    Parse a single song file and create or update its catalog entry.
+    Does not commit; raises json.JSONDecodeError / OSError if the file is unreadable.
+    """
+    relative_path = _relative_path(file_path)
+    if stat_result is None:
+        stat_result = os.stat(file_path)
+    if entry is None:
+        entry = SongCatalogEntry.query.filter_by(path=relative_path).first()
+
+    metadata = _read_song_metadata(file_path)
+
+    if entry is None:
+        entry = SongCatalogEntry(path=relative_path)
+        db.session.add(entry)
+
+    entry.filename = os.path.basename(file_path)
+    entry.name = metadata['name']
+    entry.authors = metadata['authors']
+    entry.key = metadata['key']
+    entry.song_hash = metadata['song_hash']
+    entry.mtime = stat_result.st_mtime
+    entry.size = stat_result.st_size
+    entry.version = version
+    entry.deleted = False
+    _unreadable.pop(relative_path, None)
+    return entry
+
+def _mark_deleted(entry, version):
+    entry.deleted = True
+    entry.version = version
+
+def update_song_file(file_path):
+    """Index a song file that was written through the API and commit it as a new catalog version"""
+    with _catalog_lock:
+        try:
+            entry = _index_song_file(file_path, _current_version() + 1)
+            db.session.commit()
+            return entry
+        except Exception:
+            db.session.rollback()
+            raise
+
+def update_song_files(file_paths):
+    """Index many song files in one transaction; they all share a single new catalog version"""
+    with _catalog_lock:
+        try:
+            version = _current_version() + 1
+            entries = [_index_song_file(file_path, version) for file_path in file_paths]
+            db.session.commit()
+            return entries
+        except Exception:
+            db.session.rollback()
+            raise
+
+def delete_song_file(file_path):
+    """Record the deletion of a song file as a new catalog version"""
+    relative_path = _relative_path(file_path)
+    with _catalog_lock:
+        _unreadable.pop(relative_path, None)
+        entry = SongCatalogEntry.query.filter_by(path=relative_path, deleted=False).first()
+        if entry is None:
+            return
+        try:
+            _mark_deleted(entry, _current_version() + 1)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+def refresh_catalog(force=False):
+    """
+    Bring the catalog in line with SONG_DATA_FOLDER.
+    Only files whose mtime or size changed since the last scan are parsed again;
+    all changes found by one scan share a single new catalog version.
+    """
+    global _last_scan
+
+    if not force and _last_scan is not None and time.monotonic() - _last_scan < SCAN_INTERVAL:
+        return
+
+    with _catalog_lock:
+        # Another request may have finished a scan while we were waiting
+        if not force and _last_scan is not None and time.monotonic() - _last_scan < SCAN_INTERVAL:
+            return
+
+        try:
+            entries = {entry.path: entry for entry in SongCatalogEntry.query.all()}
+            new_version = _current_version() + 1
+            seen = set()
+            changed = False
+
+            for root, dirs, filenames in os.walk(SONG_DATA_FOLDER):
+                for filename in filenames:
+                    if not _is_song_file(filename):
+                        continue
+
+                    file_path = os.path.join(root, filename)
+                    try:
+                        stat_result = os.stat(file_path)
+                    except OSError:
+                        continue
+
+                    relative_path = _relative_path(file_path)
+                    seen.add(relative_path)
+                    signature = (stat_result.st_mtime, stat_result.st_size)
+
+                    entry = entries.get(relative_path)
+                    if entry is not None and not entry.deleted and (entry.mtime, entry.size) == signature:
+                        continue
+                    if _unreadable.get(relative_path) == signature:
+                        continue
+
+                    try:
+                        _index_song_file(file_path, new_version, entry, stat_result)
+                    except (json.JSONDecodeError, IOError) as e:
+                        print(f"Error reading {file_path}: {e}")
+                        _unreadable[relative_path] = signature
+                        if entry is not None and not entry.deleted:
+                            _mark_deleted(entry, new_version)
+                    changed = True
+
+            # Files that vanished from disk
+            for path, entry in entries.items():
+                if path not in seen and not entry.deleted:
+                    _mark_deleted(entry, new_version)
+                    changed = True
+            for path in list(_unreadable):
+                if path not in seen:
+                    del _unreadable[path]
+
+            if changed:
+                db.session.commit()
+            _last_scan = time.monotonic()
+        except Exception:
+            db.session.rollback()
+            raise
+
+def catalog_version():
+    """Current catalog version; changes whenever a song is added, changed or deleted"""
+    refresh_catalog()
+    return _current_version()
+
+def list_catalog():
+    """Return all live catalog entries ordered by path"""
+    refresh_catalog()
+    return SongCatalogEntry.query.filter_by(deleted=False).order_by(SongCatalogEntry.path).all()
+
+def catalog_changes(since):
+    """Return the entries (including tombstones) changed after catalog version `since`"""
+    refresh_catalog()
+    return SongCatalogEntry.query.filter(SongCatalogEntry.version > since).order_by(SongCatalogEntry.path).all()
+
+def get_song_entry(file_path):
+    """Return the up-to-date catalog entry of an existing song file, or None if it cannot be indexed"""
+    relative_path = _relative_path(file_path)
+    entry = SongCatalogEntry.query.filter_by(path=relative_path, deleted=False).first()
+    try:
+        stat_result = os.stat(file_path)
+        if entry is not None and (entry.mtime, entry.size) == (stat_result.st_mtime, stat_result.st_size):
+            return entry
+        return update_song_file(file_path)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Error indexing {file_path}: {e}")
+        return None
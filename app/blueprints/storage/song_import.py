@@ -0,0 +1,309 @@
+# Bulk import of plain-text and ChordPro songs into song_data.
+# Files are parsed and finalized in a process pool, written to song_data and
+# registered in the song catalog in a single transaction.
+import io
+import json
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.utils import secure_filename
+
+from app.blueprints.ocr.functions.cData import PreliminaryLine, PreliminarySection
+from app.blueprints.ocr.functions.converter import finalize_song_data, parse_raw_text_to_preliminary
+from app.blueprints.storage.song_catalog import update_song_files
+from app.blueprints.storage.utils import SONG_DATA_FOLDER
+
+TEXT_EXTENSIONS = {'.txt'}
+CHORDPRO_EXTENSIONS = {'.cho', '.chopro', '.chordpro', '.crd', '.pro'}
+IMPORT_EXTENSIONS = TEXT_EXTENSIONS | CHORDPRO_EXTENSIONS
+
+MAX_IMPORT_FILES = 5000
+MAX_SONG_FILE_SIZE = 1024 * 1024  # 1MB, songs are small text files
+POOL_THRESHOLD = 20  # Fewer files are parsed inline, a pool would cost more than it saves
+
+_directive_pattern = re.compile(r'^\s*\{\s*([A-Za-z_]+)\s*(?::\s*(.*?))?\s*\}\s*$')
+_inline_chord_pattern = re.compile(r'\[([^\]]+)\]')
+_metadata_pattern = re.compile(r'^\s*(title|titel|key|tonart|authors?|autoren?)\s*:\s*(.+?)\s*$', re.IGNORECASE)
+
+_SECTION_DIRECTIVES = {
+    'start_of_chorus': 'Chorus', 'soc': 'Chorus',
+    'start_of_verse': 'Verse', 'sov': 'Verse',
+    'start_of_bridge': 'Bridge', 'sob': 'Bridge',
+    'start_of_tab': 'Tab', 'sot': 'Tab',
+}
+_END_DIRECTIVES = {'end_of_chorus', 'eoc', 'end_of_verse', 'eov', 'end_of_bridge', 'eob', 'end_of_tab', 'eot'}
+
+
+def is_importable(filename):
+    return os.path.splitext(filename)[1].lower() in IMPORT_EXTENSIONS
+
+def decode_song_text(raw):
+    for encoding in ('utf-8-sig', 'cp1252'):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return raw.decode('latin-1')
+
+def _split_inline_chords(line):
+    """'Amazing [G]grace' -> ('        G', 'Amazing grace'), chords placed above their syllables"""
+    lyrics = ''
+    chords = []
+    last = 0
+    for match in _inline_chord_pattern.finditer(line):
+        lyrics += line[last:match.start()]
+        chords.append((len(lyrics), match.group(1).strip()))
+        last = match.end()
+    lyrics += line[last:]
+
+    chord_line = ''
+    for position, chord in chords:
+        # Keep at least one space between chords that sit on neighbouring syllables
+        position = max(position, len(chord_line) + 1 if chord_line else 0)
+        chord_line += ' ' * (position - len(chord_line)) + chord
+    return chord_line, lyrics.rstrip()
+
+def _unique_titles(sections):
+    """Section titles are keys of the song's data dict, so repeated titles get a number"""
+    seen = {}
+    for section in sections:
+        count = seen.get(section.title, 0) + 1
+        seen[section.title] = count
+        if count > 1:
+            section.title = f"{section.title} {count}"
+    return sections
+
+def parse_chordpro(text):
+    """Return (metadata, sections) for a ChordPro song"""
+    metadata = {}
+    sections = []
+    current = None
+
+    def start_section(title):
+        nonlocal current
+        current = PreliminarySection(title=title, lines=[])
+        sections.append(current)
+
+    for raw_line in text.splitlines():
+        directive = _directive_pattern.match(raw_line)
+        if directive:
+            name, value = directive.group(1).lower(), (directive.group(2) or '').strip()
+            if name in ('title', 't'):
+                metadata['title'] = value
+            elif name == 'key':
+                metadata['key'] = value
+            elif name in ('artist', 'composer', 'lyricist', 'subtitle', 'st'):
+                metadata.setdefault('authors', []).append(value)
+            elif name in _SECTION_DIRECTIVES:
+                start_section(value or _SECTION_DIRECTIVES[name])
+            elif name in _END_DIRECTIVES:
+                current = None
+            elif name in ('comment', 'c', 'ci', 'comment_italic') and value:
+                # Commonly used as section label ("{c: Verse 2}")
+                start_section(value)
+            continue
+
+        if raw_line.lstrip().startswith('#') or not raw_line.strip():
+            continue
+        if current is None:
+            start_section('Verse')
+
+        chord_line, lyrics = _split_inline_chords(raw_line)
+        if chord_line:
+            current.lines.append(PreliminaryLine(chord_line, True, 1.0))
+        if lyrics.strip():
+            current.lines.append(PreliminaryLine(lyrics, False, 1.0))
+
+    return metadata, [section for section in sections if section.lines]
+
+def parse_plain_text(text):
+    """
+    Return (metadata, sections) for a plain-text song: optional 'Title:', 'Key:' and
+    'Authors:' lines at the top, then chord-over-lyrics text with [Section] headers.
+    """
+    metadata = {}
+    lines = text.splitlines()
+    while lines:
+        match = _metadata_pattern.match(lines[0])
+        if not match:
+            if lines[0].strip():
+                break
+            lines.pop(0)
+            continue
+        field, value = match.group(1).lower(), match.group(2)
+        if field in ('title', 'titel'):
+            metadata['title'] = value
+        elif field in ('key', 'tonart'):
+            metadata['key'] = value
+        else:
+            metadata['authors'] = [a.strip() for a in value.split(',') if a.strip()]
+        lines.pop(0)
+    return metadata, parse_raw_text_to_preliminary('\n'.join(lines))
+
+def parse_song_file(args):
+    """
+    Parse and finalize one song. Runs in a worker process, so it only takes and
+    returns plain data: (source, text, default_key) -> report dict with 'song' on success.
+    """
+    source, text, default_key = args
+    try:
+        extension = os.path.splitext(source)[1].lower()
+        is_chordpro = extension in CHORDPRO_EXTENSIONS or _directive_pattern.search(text.split('\n', 1)[0] or '')
+        metadata, sections = parse_chordpro(text) if is_chordpro else parse_plain_text(text)
+        if not sections:
+            return {'source': source, 'status': 'error', 'message': 'No song content found'}
+
+        title = metadata.get('title') or os.path.splitext(os.path.basename(source))[0]
+        key = metadata.get('key') or default_key
+        song = finalize_song_data(_unique_titles(sections), title, key, metadata.get('authors', []))
+        return {
+            'source': source,
+            'status': 'parsed',
+            'title': title,
+            'key': key,
+            'sections': len(sections),
+            'format': 'chordpro' if is_chordpro else 'text',
+            'song': song
+        }
+    except Exception as e:
+        return {'source': source, 'status': 'error', 'message': f'{type(e).__name__}: {e}'}
+
+def collect_from_zip(data, source_name=''):
+    """
+    [(name, text)] for all importable files in a zip archive. Entries keep their path
+    inside the archive, below the folder source_name if one is given.
+    """
+    files = []
+    with zipfile.ZipFile(io.BytesIO(data) if isinstance(data, bytes) else data) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not is_importable(info.filename):
+                continue
+            if info.file_size > MAX_SONG_FILE_SIZE:
+                files.append((os.path.join(source_name, info.filename), None))
+                continue
+            files.append((os.path.join(source_name, info.filename), decode_song_text(archive.read(info))))
+    return files
+
+def collect_from_path(path):
+    """[(name, text)] for a song file, a directory (recursively) or a zip archive"""
+    if os.path.isdir(path):
+        files = []
+        for root, dirs, filenames in os.walk(path):
+            dirs.sort()
+            for filename in sorted(filenames):
+                full_path = os.path.join(root, filename)
+                name = os.path.relpath(full_path, path)
+                if filename.lower().endswith('.zip'):
+                    # Unpacked where the archive lies, like a zip imported on its own
+                    files.extend(collect_from_zip(full_path, os.path.dirname(name)))
+                elif is_importable(filename):
+                    files.append((name, _read_text_file(full_path)))
+        return files
+    if path.lower().endswith('.zip'):
+        return collect_from_zip(path)
+    return [(os.path.basename(path), _read_text_file(path))]
+
+def _read_text_file(path):
+    if os.path.getsize(path) > MAX_SONG_FILE_SIZE:
+        return None
+    with open(path, 'rb') as f:
+        return decode_song_text(f.read())
+
+def _target_path(target_folder, source, title):
+    """Relative song_data path for an imported song, mirroring the source's subfolders"""
+    parts = [secure_filename(part) for part in (target_folder or '').replace('\\', '/').split('/')]
+    parts += [secure_filename(part) for part in os.path.dirname(source).replace('\\', '/').split('/')]
+    filename = secure_filename(os.path.splitext(os.path.basename(source))[0]) or secure_filename(title) or 'untitled'
+    return os.path.join(*[part for part in parts if part], filename + '.json')
+
+def import_songs(files, target_folder='', default_key='C', overwrite=False, workers=None):
+    """
+    Import [(name, text)] into song_data. Returns a per-file report; each entry has
+    'source', 'status' ('imported', 'skipped' or 'error') and 'path' / 'message'.
+    Either all parsed songs are written and registered, or (on a write/DB error) none are.
+    """
+    if len(files) > MAX_IMPORT_FILES:
+        raise ValueError(f'At most {MAX_IMPORT_FILES} files can be imported at once')
+
+    report = [None] * len(files)  # In input order
+    jobs = []
+    job_indices = []
+    for index, (name, text) in enumerate(files):
+        if text is None:
+            report[index] = {'source': name, 'status': 'error', 'message': 'File too large'}
+        else:
+            jobs.append((name, text, default_key))
+            job_indices.append(index)
+
+    if len(jobs) >= POOL_THRESHOLD and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(parse_song_file, jobs, chunksize=16))
+    else:
+        parsed = [parse_song_file(job) for job in jobs]
+
+    to_write = []
+    claimed = set()
+    for index, result in zip(job_indices, parsed):
+        report[index] = result
+        if result['status'] != 'parsed':
+            continue
+        song = result.pop('song')
+        relative_path = _target_path(target_folder, result['source'], result['title'])
+        full_path = os.path.join(SONG_DATA_FOLDER, relative_path)
+        result['path'] = relative_path.replace(os.sep, '/')
+        if relative_path in claimed or (os.path.exists(full_path) and not overwrite):
+            result.update(status='skipped', message='File already exists')
+        else:
+            claimed.add(relative_path)
+            to_write.append((full_path, song))
+            result['status'] = 'imported'
+
+    _write_and_register(to_write)
+    return report
+
+def _write_and_register(to_write):
+    """
+    Write all songs next to their targets first, then move them into place and register
+    them in one catalog transaction. On any error the previous state of song_data is restored.
+    """
+    staged = []    # temp files written so far
+    replaced = []  # (full_path, backup_path or None) moved into place so far
+    try:
+        for full_path, song in to_write:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            temp_path = full_path + '.importing'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(song, f, ensure_ascii=False, indent=2)
+            staged.append((temp_path, full_path))
+
+        for temp_path, full_path in staged:
+            backup_path = None
+            if os.path.exists(full_path):
+                backup_path = full_path + '.backup'
+                os.replace(full_path, backup_path)
+            os.replace(temp_path, full_path)
+            replaced.append((full_path, backup_path))
+
+        update_song_files([full_path for full_path, _ in replaced])
+    except Exception:
+        for full_path, backup_path in replaced:
+            if backup_path is not None:
+                os.replace(backup_path, full_path)
+            else:
+                os.remove(full_path)
+        for temp_path, _ in staged:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        raise
+
+    for _, backup_path in replaced:
+        if backup_path is not None:
+            os.remove(backup_path)
+
+def summarize(report):
+    counts = {'imported': 0, 'skipped': 0, 'error': 0}
+    for entry in report:
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+    return counts
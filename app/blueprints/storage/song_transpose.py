@@ -0,0 +1,59 @@
+import json
+import threading
+
+from cachetools import LRUCache
+
+from app.blueprints.ocr.functions.chord_utils import ChordUtils
+
+# Rendered songs per (catalog etag, key). The etag covers the song hash plus
+# mtime and size, because the song hash alone does not change with the chords.
+TRANSPOSE_CACHE_SIZE = 1024
+
+_lock = threading.Lock()
+_cache = LRUCache(maxsize=TRANSPOSE_CACHE_SIZE)
+
+
+def normalize_key(key):
+    """Return the key as used by ChordUtils ('bb' -> 'Bb', 'f#m' -> 'F#m'), raising ValueError if unknown"""
+    key = (key or '').strip()
+    if not key:
+        raise ValueError('key is required')
+    key = key[0].upper() + key[1:]
+    ChordUtils._key_table(key)  # Raises ValueError for unknown roots
+    return key
+
+def render_song_file(full_path, etag, key):
+    """
+    Return the song at full_path with its Nashville chords rendered in `key`.
+    Results are cached until the file changes (new etag).
+    Raises OSError / json.JSONDecodeError for unreadable files.
+    """
+    cache_key = (etag, key)
+    with _lock:
+        rendered = _cache.get(cache_key)
+    if rendered is not None:
+        return rendered
+
+    with open(full_path, 'r', encoding='utf-8') as f:
+        song = json.load(f)
+    rendered = ChordUtils.render_song(song, key)
+
+    with _lock:
+        _cache[cache_key] = rendered
+    return rendered
+
+def iter_transposed_ndjson(songs, key):
+    """
+    Yield one JSON line per song: {"path", "etag", "key", "song"}.
+    `songs` is a list of (path, full_path, etag) tuples.
+    """
+    for path, full_path, etag in songs:
+        try:
+            song = render_song_file(full_path, etag, key)
+            yield json.dumps({'path': path, 'etag': etag, 'key': key, 'song': song}, ensure_ascii=False) + "\n"
+        except (json.JSONDecodeError, IOError) as e:
+            yield json.dumps({'path': path, 'error': str(e)}) + "\n"
+
+def transpose_cache_stats():
+    with _lock:
+        return {'size': len(_cache), 'max_size': TRANSPOSE_CACHE_SIZE}
@@ -56,8 +56,11 @@ class Person(db.Model):
     def __repr__(self):
         return f'<Person {self.custom_id} - {self.name}>'
     
-    def to_dict(self):
-        """Convert person to dictionary for API responses"""
+    def to_dict(self, category_counts=None):
+        """
+        Convert person to dictionary for API responses.
+        category_counts ({category_id: person_count}) avoids a COUNT query per category.
+        """
         return {
             'id': self.id,
             'name': self.name,
@@ -71,7 +74,10 @@ class Person(db.Model):
             'last_contact_date': self.last_contact_date.isoformat() if self.last_contact_date else None,
             'position_x': self.position_x,
             'position_y': self.position_y,
-            'categories': [cat.to_dict() for cat in self.categories],
+            'categories': [
+                cat.to_dict(category_counts.get(cat.id, 0) if category_counts is not None else None)
+                for cat in self.categories
+            ],
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
@@ -97,7 +103,8 @@ class Category(db.Model):
     def __repr__(self):
         return f'<Category {self.name}>'
     
-    def to_dict(self):
+    def to_dict(self, person_count=None):
+        """person_count can be passed in when it was already counted in bulk (see category_person_counts)"""
         return {
             'id': self.id,
             'name': self.name,
@@ -105,13 +112,22 @@ class Category(db.Model):
             'color': self.color,
             'icon': self.icon,
             'description': self.description,
-            'person_count': self.persons.count(),
+            'person_count': self.persons.count() if person_count is None else person_count,
             'position_x': self.position_x,
             'position_y': self.position_y,
             'created_at': self.created_at.isoformat()
         }
 
 
+def category_person_counts():
+    """{category_id: number of persons} for all categories, in one grouped query over person_category"""
+    rows = db.session.query(
+        person_category.c.category_id,
+        db.func.count(person_category.c.person_id)
+    ).group_by(person_category.c.category_id).all()
+    return dict(rows)
+
+
 class Connection(db.Model):
     """
     Represents connections between people (e.g., "Sarah introduced me to Anna")
@@ -198,4 +214,38 @@ class GraphSnapshot(db.Model):
             'description': self.description,
             'layout_data': self.layout_data,
             'created_at': self.created_at.isoformat()
-        }
\ No newline at end of file
+        }
+
+class GraphChange(db.Model):
+    """
+    Change log of the dating graph. Every added, changed or removed node / edge gets
+    a row; the highest id is the current graph version (see dating_graph/versioning.py).
+    """
+    __table_args__ = {'sqlite_autoincrement': True}  # Versions must never be reused
+
+    id = db.Column(db.Integer, primary_key=True)
+    element_id = db.Column(db.String(100), nullable=False, index=True)  # 'person_1', 'cat_2', 'person_1-cat_2', ...
+    kind = db.Column(db.String(20), nullable=False)  # node, edge, other
+    action = db.Column(db.String(10), nullable=False)  # add, update, move (position only), remove
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<GraphChange {self.id} {self.action} {self.element_id}>'
+
+
+class GraphStatistics(db.Model):
+    """
+    Materialized counts behind /api/statistics and /api/quick-stats. A single row (id 1),
+    kept current by the session events in dating_graph/statistics.py.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    total_persons = db.Column(db.Integer, nullable=False, default=0)
+    total_categories = db.Column(db.Integer, nullable=False, default=0)
+    total_dates = db.Column(db.Integer, nullable=False, default=0)
+    total_connections = db.Column(db.Integer, nullable=False, default=0)  # person_category assignments
+    status_counts = db.Column(db.JSON, nullable=False, default=dict)  # {status: count}
+    category_counts = db.Column(db.JSON, nullable=False, default=dict)  # {category_id: {name, color, count}}
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<GraphStatistics {self.total_persons} persons>'
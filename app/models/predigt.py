@@ -1,6 +1,8 @@
 from app import db
 from datetime import datetime, timezone
 
+from sqlalchemy import inspect, text
+
 class Predigt(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -15,6 +17,50 @@ class Predigt(db.Model):
     status = db.Column(db.String(50), default='streamed') # e.g., streamed,cut, downloaded, compressed, uploaded, error
     error_message = db.Column(db.Text, nullable=True) # To store any error messages during processing
 
+    # Background processing job (see workables/predigt_upload/jobs.py)
+    job_id = db.Column(db.String(36), unique=True, nullable=True, index=True)
+    speaker = db.Column(db.String(255), nullable=True)
+    current_step = db.Column(db.String(50), nullable=True)
+    progress = db.Column(db.Integer, default=0)
+    events = db.Column(db.JSON, nullable=True) # NDJSON progress events, replayed when a client re-attaches
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    def job_to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'video_id': self.youtube_video_id,
+            'title': self.title,
+            'speaker': self.speaker,
+            'status': self.status,
+            'step': self.current_step,
+            'progress': self.progress or 0,
+            'final_path': self.local_file_path,
+            'error': self.error_message,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 
     def __repr__(self):
-        return f'<Predigt {self.id} - {self.title}>'
\ No newline at end of file
+        return f'<Predigt {self.id} - {self.title}>'
+
+
+def upgrade_predigt_table():
+    """
+    Add columns introduced after the predigt table was first created (e.g. the job columns).
+    db.create_all() never alters existing tables; safe to run on every start.
+    """
+    table = Predigt.__table__
+    inspector = inspect(db.engine)
+    if not inspector.has_table(table.name):
+        return
+    existing = {column['name'] for column in inspector.get_columns(table.name)}
+    missing = [column for column in table.columns if column.name not in existing]
+    if not missing:
+        return
+    with db.engine.begin() as connection:
+        for column in missing:
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+        # UNIQUE can't be added with ALTER TABLE in SQLite, the unique index on job_id enforces it
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
@@ -28,4 +28,38 @@ class File(db.Model):
     directory_id = db.Column(db.Integer, db.ForeignKey('directory.id'), nullable=True)
     
     def __repr__(self):
-        return f'<File {self.name}>'
\ No newline at end of file
+        return f'<File {self.name}>'
+
+class SongCatalogEntry(db.Model):
+    """Cached metadata of a JSON file in the song_data folder (see storage/song_catalog.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(512), unique=True, nullable=False)  # Relative to SONG_DATA_FOLDER
+    filename = db.Column(db.String(256), nullable=False)
+    name = db.Column(db.String(256), nullable=True)
+    authors = db.Column(db.JSON, nullable=True)
+    key = db.Column(db.String(16), nullable=True)
+    song_hash = db.Column(db.String(64), nullable=True)
+    mtime = db.Column(db.Float, nullable=False)
+    size = db.Column(db.Integer, nullable=False)  # Size in bytes
+    version = db.Column(db.Integer, default=0, nullable=False, index=True)  # Catalog version of the last change
+    deleted = db.Column(db.Boolean, default=False, nullable=False)  # Tombstone, kept for delta sync
+
+    @property
+    def etag(self):
+        """ETag of the file: the song hash plus the on-disk signature (the hash only covers lyrics)"""
+        return f"{self.song_hash or 'nohash'}-{int(self.mtime)}-{self.size}"
+
+    def to_dict(self):
+        return {
+            'filename': self.filename,
+            'path': self.path,
+            'name': self.name,
+            'authors': self.authors or [],
+            'key': self.key,
+            'hash': self.song_hash,
+            'etag': self.etag,
+            'version': self.version,
+        }
+
+    def __repr__(self):
+        return f'<SongCatalogEntry {self.path}>'
@@ -15,12 +15,8 @@ class ApiToken(db.Model):
     def is_valid(self):
         expires_at_aware = self.expires_at
         if hasattr(self.expires_at, 'tzinfo') and self.expires_at.tzinfo is None:
-            print(f"  self.expires_at.tzinfo is None. Assuming UTC and making it aware.")
+            # Assume UTC for naive datetimes (SQLite drops the tzinfo)
             expires_at_aware = self.expires_at.replace(tzinfo=timezone.utc)
-        elif hasattr(self.expires_at, 'tzinfo'):
-            print(f"  self.expires_at.tzinfo: {self.expires_at.tzinfo}")
-        else:
-            print(f"  self.expires_at has no tzinfo attribute (should not happen with datetime objects)")
 
         current_utc_time = datetime.now(timezone.utc) 
         return self.is_active and expires_at_aware > current_utc_time
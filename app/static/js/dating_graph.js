@@ -4,6 +4,9 @@
 
 
 let network = null;
+let graphNodes = null;
+let graphEdges = null;
+let graphVersion = null;
 let currentView = 'cards';
 let persons = [];
 let categories = [];
@@ -277,10 +280,16 @@ async function initializeNetwork() {
         
         const nodes = new vis.DataSet(graphData.nodes);
         const edges = new vis.DataSet(graphData.edges);
+        graphNodes = nodes;
+        graphEdges = edges;
+        graphVersion = graphData.version;
+        
+        // Positions are computed server side; physics is only needed if some are missing
+        const allPositioned = graphData.nodes.every(node => node.x !== null && node.y !== null);
         
         const options = {
             physics: {
-                enabled: true,
+                enabled: !allPositioned,
                 stabilization: { enabled: true, iterations: 200 },
                 barnesHut: {
                     gravitationalConstant: -20000,
@@ -370,9 +379,25 @@ async function refreshNetwork() {
     if (!network) return;
     await loadPersons();
     await loadCategories();
-    const response = await fetch('/dating_graph/api/graph-data');
+    
+    // Only fetch what changed since the version we already show
+    const url = graphVersion === null
+        ? '/dating_graph/api/graph-data'
+        : `/dating_graph/api/graph-data?since=${graphVersion}`;
+    const response = await fetch(url);
     const graphData = await response.json();
-    network.setData({ nodes: graphData.nodes, edges: graphData.edges });
+    
+    if (Array.isArray(graphData.nodes)) {
+        graphNodes = new vis.DataSet(graphData.nodes);
+        graphEdges = new vis.DataSet(graphData.edges);
+        network.setData({ nodes: graphNodes, edges: graphEdges });
+    } else {
+        graphEdges.remove(graphData.edges.removed);
+        graphNodes.remove(graphData.nodes.removed);
+        graphNodes.update([...graphData.nodes.added, ...graphData.nodes.changed]);
+        graphEdges.update([...graphData.edges.added, ...graphData.edges.changed]);
+    }
+    graphVersion = graphData.version;
     showNotification('Netzwerk aktualisiert', 'success');
 }
 
@@ -198,11 +198,24 @@
         if (ct.includes('text/html') || text.startsWith('<')) {
           throw new Error('Nicht angemeldet. Bitte einloggen und erneut versuchen.');
         }
-        throw new Error(`HTTP ${resp.status} ${resp.statusText}`);
+        let message = `HTTP ${resp.status} ${resp.statusText}`;
+        try { message = JSON.parse(text).message || message; } catch {}
+        throw new Error(message);
       }
 
+      // The server queues a background job; follow its progress stream.
+      // Aborting only detaches from the stream, the job keeps running.
+      const job = await resp.json();
+      log(`Job ${job.job_id} gestartet.`);
+      const streamResp = await fetch(job.stream_url, {
+        headers: { 'Accept': 'application/x-ndjson', ...(token ? { 'Authorization': `Bearer ${token}` } : {}) },
+        credentials: 'same-origin',
+        signal: controller.signal
+      });
+      if (!streamResp.ok) throw new Error(`HTTP ${streamResp.status} ${streamResp.statusText}`);
+
       let finalPath = null;
-      const reader = resp.body.getReader();
+      const reader = streamResp.body.getReader();
       const decoder = new TextDecoder();
       let buffer = '';
 
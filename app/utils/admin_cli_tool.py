@@ -121,4 +121,31 @@ def create_dating_graph_user(username, password, first_name, last_name):
     user.set_password(password)
     db.session.add(user)
     db.session.commit()
-    click.echo(f'Dating Graph user {username} created successfully.')
\ No newline at end of file
+    click.echo(f'Dating Graph user {username} created successfully.')
+
+
+@click.command('import-songs')
+@click.argument('source', type=click.Path(exists=True))
+@click.option('--folder', default='', help="Subfolder of song_data to import into.")
+@click.option('--key', default='C', help="Key used for songs that do not name one.")
+@click.option('--overwrite', is_flag=True, help="Replace songs that already exist.")
+@click.option('--workers', default=None, type=int, help="Number of parser processes (default: CPU count).")
+@with_appcontext
+def import_songs(source, folder, key, overwrite, workers):
+    """Import plain-text / ChordPro songs from a file, directory or zip archive into song_data."""
+    from app.blueprints.storage.song_import import collect_from_path, import_songs as run_import, summarize
+
+    files = collect_from_path(source)
+    if not files:
+        click.echo('No importable files found.')
+        return
+
+    report = run_import(files, folder, key, overwrite, workers)
+    for entry in report:
+        detail = entry.get('path') or ''
+        if entry.get('message'):
+            detail = f"{detail} ({entry['message']})" if detail else entry['message']
+        click.echo(f"{entry['status']:<9} {entry['source']} {detail}")
+
+    counts = summarize(report)
+    click.echo(f"Imported {counts['imported']}, skipped {counts['skipped']}, failed {counts['error']}.")
@@ -1,8 +1,8 @@
 from functools import wraps
 from flask import request, jsonify, g, redirect, url_for, flash
 from flask_login import current_user
-from app.models.token import ApiToken
 from app.models.user import User
+from app.utils.token_cache import lookup_token
 
 
 def _get_token_from_request():
@@ -26,7 +26,8 @@ def valid_token(f):
         if not token_str:
             return jsonify({'error': 'Token is missing!'}), 401
 
-        token_record = ApiToken.query.filter_by(token=token_str).first()
+        # Served from the in-process token cache, DB lookup only on a miss
+        token_record = lookup_token(token_str)
         if not token_record or not token_record.is_valid():
             return jsonify({'error': 'Invalid or expired token!'}), 401
         # Set context for downstream use
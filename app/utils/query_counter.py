@@ -0,0 +1,34 @@
+import logging
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_listening = False
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g._query_count = g.get('_query_count', 0) + 1
+
+def query_count():
+    """Number of SQL statements executed so far in the current request"""
+    return g.get('_query_count', 0) if has_request_context() else 0
+
+def init_query_counter(app):
+    """
+    Count the SQL statements of every request. In debug mode the count is returned
+    in the X-Query-Count header and logged, which makes N+1 query patterns easy to spot.
+    """
+    global _listening
+    if not _listening:
+        event.listen(Engine, 'before_cursor_execute', _count_query)
+        _listening = True
+
+    @app.after_request
+    def add_query_count(response):
+        if app.debug:
+            count = query_count()
+            response.headers['X-Query-Count'] = str(count)
+            logging.debug("%s %s: %s queries", request.method, request.path, count)
+        return response
@@ -0,0 +1,109 @@
+import hashlib
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from cachetools import TTLCache
+
+# Validated tokens are kept for at most this many seconds. Changes made through the
+# admin pages invalidate the cache right away; the TTL bounds staleness for
+# anything else (other worker processes, CLI, direct DB edits).
+TOKEN_CACHE_TTL = 60
+TOKEN_CACHE_SIZE = 1024
+
+_lock = threading.Lock()
+_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+_stats = {}  # token id -> {'hits': n, 'misses': n}
+_unknown_misses = 0
+
+
+@dataclass(frozen=True)
+class CachedToken:
+    """Detached snapshot of an ApiToken row, safe to share between requests"""
+    id: int
+    user_id: int
+    is_active: bool
+    is_admin: bool
+    expires_at: datetime
+
+    @classmethod
+    def from_record(cls, record):
+        expires_at = record.expires_at
+        if expires_at is not None and expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return cls(
+            id=record.id,
+            user_id=record.user_id,
+            is_active=bool(record.is_active),
+            is_admin=bool(record.is_admin),
+            expires_at=expires_at
+        )
+
+    def is_valid(self):
+        # Re-checked on every hit so tokens still expire while cached
+        if self.expires_at is None:
+            return False
+        return self.is_active and self.expires_at > datetime.now(timezone.utc)
+
+
+def _token_key(token_str):
+    return hashlib.sha256(token_str.encode('utf-8')).hexdigest()
+
+def _count(token_id, field):
+    counters = _stats.setdefault(token_id, {'hits': 0, 'misses': 0})
+    counters[field] += 1
+
+def lookup_token(token_str):
+    """
+    Return a CachedToken for the given token string, or None if it does not exist.
+    Only the DB is consulted on a cache miss; unknown tokens are not cached.
+    """
+    global _unknown_misses
+    from app.models.token import ApiToken
+
+    key = _token_key(token_str)
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _count(cached.id, 'hits')
+            return cached
+
+    record = ApiToken.query.filter_by(token=token_str).first()
+
+    with _lock:
+        if record is None:
+            _unknown_misses += 1
+            return None
+        cached = CachedToken.from_record(record)
+        _count(cached.id, 'misses')
+        _cache[key] = cached
+    return cached
+
+def invalidate_token(token_id, forget_stats=False):
+    """Drop a token from the cache after it was changed or deleted"""
+    with _lock:
+        for key in [k for k, v in _cache.items() if v.id == token_id]:
+            _cache.pop(key, None)
+        if forget_stats:
+            _stats.pop(token_id, None)
+
+def invalidate_user_tokens(user_id):
+    """Drop all cached tokens of a user (user deleted, approval or role changed)"""
+    with _lock:
+        for key in [k for k, v in _cache.items() if v.user_id == user_id]:
+            _cache.pop(key, None)
+
+def clear_token_cache():
+    with _lock:
+        _cache.clear()
+
+def token_cache_stats():
+    """Cache size and per-token hit/miss counters"""
+    with _lock:
+        return {
+            'size': len(_cache),
+            'max_size': TOKEN_CACHE_SIZE,
+            'ttl_seconds': TOKEN_CACHE_TTL,
+            'unknown_token_misses': _unknown_misses,
+            'tokens': {token_id: dict(counters) for token_id, counters in _stats.items()}
+        }
@@ -1,6 +1,8 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, Optional
 import os
 import json
+import threading
 # Define the path to the project root relative to this file
 # This file is in app/workables/config/
 # Project root is ../../../../ from this file's location
@@ -8,61 +10,168 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..
 CONFIG_FILE_PATH = os.path.join(PROJECT_ROOT, 'HomeServer', 'instance', 'config.json')
 
 
-def get_config():
-    """Loads configuration from instance/config.json."""
+class ConfigError(ValueError):
+    """Raised when config.json exists but does not contain a valid configuration."""
+
+
+@dataclass(frozen=True)
+class Config:
+    YOUTUBE_API_KEY: Optional[str] = None
+    channel_id: Optional[str] = None
+
+    # FTP (accepts server_url | server | ftp_host, name | ftp_user, password | ftp_pass)
+    server: Optional[str] = None
+    name: Optional[str] = None
+    password: Optional[str] = None
+    default_remote_path: str = '/'
+
+    website_exists: Optional[bool] = None
+    website_url: Optional[str] = None
+    update_url: Optional[str] = None
+
+    # Audio compression (ffmpeg acompressor)
+    threshold_db: float = -12
+    ratio: float = 4
+    attack: float = 20
+    release: float = 250
+    # Transcode the downloaded stream straight to the final MP3 (see audio.transcode_audio)
+    single_pass_transcode: bool = True
+
+    # OCR inference worker processes (see app/blueprints/ocr/inference.py)
+    ocr_workers: int = 1
+    ocr_max_pending: int = 16
+    ocr_warmup: bool = True
+    ocr_preload: bool = False
+    ocr_pdf_dpi: int = 200
+    ocr_upload_ttl: int = 6 * 3600      # Seconds before a file in ocr_temp is deleted
+    ocr_temp_quota_mb: int = 500
+
+    # Everything from config.json, including keys not modelled above
+    raw: Dict[str, Any] = field(default_factory=dict, compare=False, repr=False)
+
+    @property
+    def has_ftp_credentials(self) -> bool:
+        return bool(self.server and self.name and self.password)
+
+    @staticmethod
+    def from_dict(data: dict) -> 'Config':
+        """Build a Config from the parsed JSON, raising ConfigError with every problem found."""
+        if not isinstance(data, dict):
+            raise ConfigError("Configuration must be a JSON object")
+
+        errors = []
+        values = {
+            'YOUTUBE_API_KEY': data.get('YOUTUBE_API_KEY'),
+            'channel_id': data.get('channel_id'),
+            'server': data.get('server_url') or data.get('server') or data.get('ftp_host'),
+            'name': data.get('name') or data.get('ftp_user'),
+            'password': data.get('password') or data.get('ftp_pass'),
+            'default_remote_path': data.get('default_remote_path') or '/',
+            'website_exists': data.get('website_exists'),
+            'website_url': data.get('website_url'),
+            'update_url': data.get('update_url'),
+        }
+        for key, value in values.items():
+            if key != 'website_exists' and value is not None and not isinstance(value, str):
+                errors.append(f"'{key}' must be a string")
+
+        defaults = {f.name: f.default for f in fields(Config)}
+        for key in ('threshold_db', 'ratio', 'attack', 'release'):
+            value = data.get(key, defaults[key])
+            try:
+                values[key] = float(value)
+            except (TypeError, ValueError):
+                errors.append(f"'{key}' must be a number, got {value!r}")
+
+        for key in ('single_pass_transcode', 'ocr_warmup', 'ocr_preload'):
+            value = data.get(key, defaults[key])
+            if isinstance(value, bool):
+                values[key] = value
+            else:
+                errors.append(f"'{key}' must be true or false")
+
+        for key, minimum in (('ocr_workers', 1), ('ocr_max_pending', 1), ('ocr_pdf_dpi', 72),
+                             ('ocr_upload_ttl', 60), ('ocr_temp_quota_mb', 1)):
+            value = data.get(key, defaults[key])
+            if isinstance(value, int) and not isinstance(value, bool) and value >= minimum:
+                values[key] = value
+            else:
+                errors.append(f"'{key}' must be an integer >= {minimum}, got {value!r}")
+
+        if errors:
+            raise ConfigError("Invalid configuration: " + "; ".join(errors))
+
+        return Config(raw=dict(data), **values)
+
+
+_lock = threading.Lock()
+_config = Config()
+_config_mtime = None
+_config_error = None
+
+
+def _load_from_disk():
+    """Parse and validate config.json. Raises FileNotFoundError, ConfigError."""
+    with open(CONFIG_FILE_PATH, 'r', encoding='utf-8') as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ConfigError(f"Invalid JSON in configuration file at {CONFIG_FILE_PATH}: {e}") from e
+    return Config.from_dict(data)
+
+def reload_config(force=False):
+    """
+    Re-read config.json if it changed on disk (or always with force=True).
+    On errors the last valid configuration stays active and the error is kept
+    for config_error(). Returns the active Config.
+    """
+    global _config, _config_mtime, _config_error
+
     try:
-        with open(CONFIG_FILE_PATH, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        return config
-    except FileNotFoundError:
-        print(f"Error: Configuration file not found at {CONFIG_FILE_PATH}")
-        return {} # Return empty dict or raise an error
-    except json.JSONDecodeError:
-        print(f"Error: Invalid JSON in configuration file at {CONFIG_FILE_PATH}")
-        return {} # Return empty dict or raise an error
-    except Exception as e:
-        print(f"An unexpected error occurred while reading config: {e}")
-        return {}
-    
-
-
-#### I LIKE THIS BUT NOT IMPLEMENTED BECAUSE NOT WANT TO BREACK
-
-#config = None
-#@dataclass
-#class Config:
-#    config_json_not_empty: str
-#    
-#    YOUTUBE_API_KEY: str
-#    channel_id: str
-#    
-#    server: str
-#    name: str
-#    password: str
-#    
-#    website_exists: str
-#    website_url: str
-#    update_url: str
-#
-#    threshold_db: str
-#    ratio: str
-#    attack: str
-#    release: str
-#
-#    @staticmethod
-#    def from_dict(data: dict):
-#        return Config(
-#            config_json_not_empty=data.get("config_json_not_empty", None),
-#            YOUTUBE_API_KEY=data.get("YOUTUBE_API_KEY", None),
-#            channel_id=data.get("channel_id", None),
-#            server=data.get("server", None),
-#            name=data.get("name", None),
-#            password=data.get("password", None),
-#            website_exists=data.get("website_exists", None),
-#            website_url=data.get("website_url", None),
-#            update_url=data.get("update_url", None),
-#            threshold_db=data.get("threshold_db", None),
-#            ratio=data.get("ratio", None),
-#            attack=data.get("attack", None),
-#            release=data.get("release", None)
-#        )
+        mtime = os.path.getmtime(CONFIG_FILE_PATH)
+    except OSError:
+        mtime = None
+
+    if not force and mtime == _config_mtime:
+        return _config
+
+    with _lock:
+        if not force and mtime == _config_mtime:
+            return _config
+        try:
+            _config = _load_from_disk()
+            _config_error = None
+        except FileNotFoundError:
+            # Not an error: every setting has a default or is checked where it is needed
+            print(f"Error: Configuration file not found at {CONFIG_FILE_PATH}")
+            _config = Config()
+            _config_error = None
+        except ConfigError as e:
+            print(f"Error: {e}")
+            _config_error = str(e)
+        except Exception as e:
+            print(f"An unexpected error occurred while reading config: {e}")
+            _config_error = str(e)
+        _config_mtime = mtime
+    return _config
+
+def validate_config_data(config_text):
+    """Validate config.json content before it is written. Raises ConfigError."""
+    try:
+        data = json.loads(config_text)
+    except json.JSONDecodeError as e:
+        raise ConfigError(f"Invalid JSON: {e}") from e
+    return Config.from_dict(data)
+
+def get_typed_config() -> Config:
+    """Return the active Config, parsed only when config.json changed."""
+    return reload_config()
+
+def config_error():
+    """Error of the last (re)load attempt, or None if the active config is current."""
+    reload_config()
+    return _config_error
+
+def get_config():
+    """Loads configuration from instance/config.json (cached, reloaded when the file changes)."""
+    return reload_config().raw
@@ -0,0 +1,95 @@
+# PaddleOCR model loading and result extraction.
+# Kept free of Flask and blueprint imports: OCR worker processes (see worker.py) import
+# this module, and spawn-started children must not build the app.
+import logging
+
+import numpy as np
+
+# Lazy load PaddleOCR
+_ocr_reader = None
+
+def get_ocr_reader():
+    """Lazy initialize OCR reader"""
+    global _ocr_reader
+    if _ocr_reader is None:
+        try:
+            from paddleocr import PaddleOCR
+            _ocr_reader = PaddleOCR(use_angle_cls=True, lang='en')
+        except ImportError as e:
+            raise ImportError(
+                "PaddleOCR dependencies not installed. "
+                "Install with: pip install paddlepaddle paddleocr"
+            ) from e
+    return _ocr_reader
+
+def to_polygons(boxes):
+    """
+    Convert detector boxes to an (N, 4, 2) float array.
+    Accepts an (N, 4, 2) array as returned by PaddleX, or a sequence of boxes given as
+    4 points, a flat [x1, y1, ..., x4, y4] list or [x_min, y_min, x_max, y_max].
+    Returns (polygons, valid) where valid is a boolean mask over the input boxes.
+    """
+    try:
+        # PaddleX returns a list of (4, 2) arrays - stacked in one go
+        array = np.asarray(boxes, dtype=np.float64)
+    except (TypeError, ValueError):
+        array = None  # Mixed formats, handled box by box below
+    if array is not None and array.ndim == 3 and array.shape[1:] == (4, 2):
+        return array, np.ones(len(array), dtype=bool)
+
+    polygons = np.zeros((len(boxes), 4, 2), dtype=np.float64)
+    valid = np.zeros(len(boxes), dtype=bool)
+    for i, box in enumerate(boxes):
+        if box is None:
+            continue
+        try:
+            points = np.asarray(box, dtype=np.float64)
+        except (TypeError, ValueError):
+            continue
+        if points.shape == (4, 2) or (points.ndim == 2 and points.shape[0] >= 4 and points.shape[1] == 2):
+            polygons[i] = points[:4]
+        elif points.shape == (8,):
+            polygons[i] = points.reshape(4, 2)
+        elif points.shape == (4,):
+            x_min, y_min, x_max, y_max = points
+            polygons[i] = [[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]]
+        else:
+            continue
+        valid[i] = True
+    return polygons, valid
+
+def extract_ocr_data(ocr_result):
+    """
+    Extract data from OCRResult object.
+    PaddleX OCRResult has: rec_texts, rec_scores, dt_polys (or rec_polys)
+    Returns [[bbox, (text, score)], ...] with bbox as four [x, y] points.
+    """
+    if not hasattr(ocr_result, 'keys') or 'rec_texts' not in ocr_result:
+        logging.warning("Could not extract data from OCR result, available keys: %s",
+                        list(ocr_result.keys()) if hasattr(ocr_result, 'keys') else 'N/A')
+        return []
+
+    texts = list(ocr_result['rec_texts'] or [])
+    if 'dt_polys' in ocr_result:
+        boxes = ocr_result['dt_polys']
+    elif 'rec_polys' in ocr_result:
+        boxes = ocr_result['rec_polys']
+    else:
+        logging.warning("OCR result has texts but no polygons")
+        return []
+    scores = ocr_result.get('rec_scores')
+    if scores is None:
+        scores = [0.9] * len(texts)
+
+    count = min(len(texts), len(boxes))
+    if count == 0:
+        return []
+    polygons, valid = to_polygons(boxes[:count])
+    scores = np.asarray(scores[:count], dtype=np.float64)
+    if len(scores) < count:
+        scores = np.concatenate([scores, np.full(count - len(scores), 0.9)])
+
+    keep = [i for i in range(count) if valid[i] and texts[i]]  # Skip None or empty texts
+    bboxes = polygons[keep].tolist()
+    return [[bbox, (texts[i], float(scores[i]))] for bbox, i in zip(bboxes, keep)]
+
@@ -0,0 +1,38 @@
+# Entry point of the OCR worker processes started by app.blueprints.ocr.inference.
+# Workers are started with the spawn method and unpickle their target by module name,
+# so this module only imports the OCR engine, never Flask or the blueprints.
+import os
+import time
+
+import numpy as np
+
+from app.workables.ocr.engine import extract_ocr_data, get_ocr_reader
+
+
+def worker_main(worker_id, tasks, results, warmup):
+    """Entry point of a worker process: load the model once, then serve tasks until None."""
+    started = time.monotonic()
+    try:
+        reader = get_ocr_reader()
+        if warmup:
+            reader.predict(np.full((64, 256, 3), 255, dtype=np.uint8))
+    except Exception as e:
+        results.put(('failed', worker_id, os.getpid(), repr(e)))
+        return
+    results.put(('ready', worker_id, os.getpid(), time.monotonic() - started))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, images = task
+        results.put(('started', worker_id, task_id))
+        started = time.monotonic()
+        try:
+            # One predict call for the whole batch
+            predictions = list(reader.predict(images if len(images) > 1 else images[0]) or [])
+            boxes = [extract_ocr_data(p) if p else [] for p in predictions]
+            boxes += [[] for _ in range(len(images) - len(boxes))]
+            results.put(('done', worker_id, task_id, boxes, None, time.monotonic() - started))
+        except Exception as e:
+            results.put(('done', worker_id, task_id, None, repr(e), time.monotonic() - started))
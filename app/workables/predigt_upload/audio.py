@@ -3,16 +3,16 @@ import math
 import os
 import tempfile
 from pathlib import Path
-from typing import Any, Dict, Generator
+from typing import Any, Dict, Generator, Optional
 from mutagen.mp3 import MP3
 from mutagen.id3 import TIT2, TPE1, TALB, TPE2, COMM, TDRC, TRCK, TCON, TCOP, TYER, TLEN
 
-from app.workables.config.manager import get_config
+from app.workables.config.manager import get_typed_config
 from app.workables.predigt_upload.ffmpeg_setup import get_ffmpeg_path  
 import ffmpeg
 
 def compress_audio(file_name):
-    config = get_config()
+    config = get_typed_config()
 
     try:
         ffmpeg_location = get_ffmpeg_path()
@@ -20,10 +20,10 @@ def compress_audio(file_name):
     except FileNotFoundError as e:
         raise Exception(f"FFmpeg setup failed: {e}")
 
-    threshold_db = config.get('threshold_db', -12) 
-    ratio = config.get('ratio', 4)        
-    attack = config.get('attack', 20)  
-    release = config.get('release', 250)
+    threshold_db = config.threshold_db
+    ratio = config.ratio
+    attack = config.attack
+    release = config.release
     temp_file = tempfile.NamedTemporaryFile(suffix='.mp3', delete=False)
 
     try:
@@ -77,6 +77,76 @@ def compress_audio(file_name):
         raise
 
 
+# ID3 frames written by ffmpeg for these metadata keys (id3v2.3):
+# title=TIT2, artist=TPE1, album=TALB, genre=TCON, copyright=TCOP,
+# date=TYER+TDAT (a YYYY-MM-DD date is split; id3v2.3's form of TDRC).
+# Keys named like a frame (TYER, TLEN) are written as that frame, which gives the
+# same tags as generate_id3_tags().
+def _ffmpeg_metadata_args(metadata: Dict[str, str], duration_ms: Optional[int] = None) -> Dict[str, str]:
+    tags = {
+        "title": metadata.get("title", ""),
+        "artist": metadata.get("speaker", ""),
+        "album": metadata.get("album", "Predigten aus Treffpunkt Leben Karlsruhe"),
+        "date": metadata.get("date", ""),
+        "TYER": metadata.get("year", ""),
+        "genre": metadata.get("genre", "Predigt Online"),
+        "copyright": metadata.get("copyright", "Treffpunkt Leben Karlsruhe - alle Rechte vorbehalten"),
+        "TLEN": str(duration_ms) if duration_ms is not None else "",
+    }
+    # ffmpeg-python can't repeat a flag, but -metadata:g:N is the same option
+    return {f"metadata:g:{i}": f"{key}={value}" for i, (key, value) in enumerate(tags.items()) if value}
+
+
+def _duration_ms(source_path: str, ffmpeg_location: Optional[str]) -> Optional[int]:
+    """Duration of the source in milliseconds for TLEN (the filters keep the length), None if unknown"""
+    probe_cmd = str(Path(ffmpeg_location) / 'ffprobe.exe') if ffmpeg_location else 'ffprobe'
+    try:
+        return int(float(ffmpeg.probe(source_path, cmd=probe_cmd)['format']['duration']) * 1000)
+    except (ffmpeg.Error, KeyError, ValueError) as e:
+        logging.warning(f"Could not determine the duration of {source_path}: {e}")
+        return None
+
+
+def transcode_audio(source_path: str, target_path: str, metadata: Dict[str, str]) -> str:
+    """
+    Single ffmpeg pass from the downloaded audio stream to the final MP3:
+    compression, 128k encode and ID3 tags together, without the intermediate
+    192k MP3 that compress_audio() needs.
+    """
+    config = get_typed_config()
+
+    try:
+        ffmpeg_location = get_ffmpeg_path()
+        print(f"FFmpeg location: {ffmpeg_location}")
+    except FileNotFoundError as e:
+        raise Exception(f"FFmpeg setup failed: {e}")
+
+    af = f'acompressor=threshold={config.threshold_db}dB:ratio={config.ratio}:attack={config.attack}:release={config.release}'
+    run_kwargs = {'capture_stdout': True, 'capture_stderr': True}
+    if ffmpeg_location:
+        run_kwargs['cmd'] = str(Path(ffmpeg_location) / 'ffmpeg.exe')
+
+    duration_ms = _duration_ms(source_path, ffmpeg_location)
+    try:
+        (
+            ffmpeg.input(source_path)
+            .output(target_path, vn=None, acodec='libmp3lame', audio_bitrate='128k', af=af,
+                    id3v2_version=3, **_ffmpeg_metadata_args(metadata, duration_ms))
+            .overwrite_output()
+            .run(**run_kwargs)
+        )
+        return target_path
+    except ffmpeg.Error as e:
+        error_msg = e.stderr.decode() if e.stderr else str(e)
+        print(f"FFmpeg Error: {error_msg}")
+        if os.path.exists(target_path):
+            try:
+                os.unlink(target_path)
+            except OSError:
+                pass
+        raise Exception(f"FFmpeg error: {error_msg}")
+
+
 def generate_id3_tags(file_path: str, metadata: Dict[str, str]) -> Generator[Dict[str, Any], None, None]:
     """Generates and applies ID3 tags to an MP3 file."""
     yield {
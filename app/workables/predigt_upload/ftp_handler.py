@@ -1,34 +1,133 @@
 import os
 import json
+import threading
+import time
+from contextlib import contextmanager
 from ftplib import FTP, error_perm
 
 import requests
 
-from app.workables.config.manager import get_config
+from app.workables.config.manager import get_typed_config
 import ftplib
 import socket
 import logging
 
+FTP_TIMEOUT = 15
+CHUNK_SIZE = 256 * 1024      # Bytes per data-connection write
+MAX_RETRIES = 3              # Reconnect + resume attempts per upload
+REPORT_INTERVAL = 0.5        # Seconds between two progress events
+POOL_SIZE = 2                # Idle logged-in connections kept per server/user
+POOL_IDLE_SECONDS = 60       # Idle connections older than this are closed instead of reused
+FTP_LIST_TTL = 30            # Seconds a successful directory listing is reused
+
+_listing_lock = threading.Lock()
+_listing_cache = None        # (fetched_at, files) of the last successful listing
+
+
+class FtpPool:
+    """
+    Small pool of logged-in FTP connections, shared by listing and uploads.
+    Connections are checked with NOOP before reuse and returned to their
+    login directory; a connection that saw an error is closed, never reused.
+    """
+    def __init__(self, size=POOL_SIZE, idle_seconds=POOL_IDLE_SECONDS):
+        self.size = size
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._idle = {}  # (host, user, password) -> [(ftp, home_dir, last_used)]
+
+    def _open(self, host, user, pwd):
+        ftp = FTP(host, timeout=FTP_TIMEOUT)
+        ftp.login(user=user, passwd=pwd)
+        return ftp, ftp.pwd()
+
+    @staticmethod
+    def _close(ftp):
+        try:
+            ftp.quit()
+        except Exception:
+            ftp.close()
+
+    def _acquire(self, key):
+        while True:
+            with self._lock:
+                idle = self._idle.get(key) or []
+                if not idle:
+                    break
+                ftp, home, last_used = idle.pop()
+            if time.monotonic() - last_used > self.idle_seconds:
+                self._close(ftp)
+                continue
+            try:
+                ftp.voidcmd('NOOP')
+                return ftp, home
+            except ftplib.all_errors:
+                ftp.close()
+        return self._open(*key)
+
+    def _release(self, key, ftp, home):
+        try:
+            ftp.cwd(home)
+        except ftplib.all_errors:
+            ftp.close()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.size:
+                idle.append((ftp, home, time.monotonic()))
+                return
+        self._close(ftp)
+
+    @contextmanager
+    def connection(self, host, user, pwd):
+        key = (host, user, pwd)
+        ftp, home = self._acquire(key)
+        try:
+            yield ftp
+        except BaseException:
+            # Includes GeneratorExit from an abandoned upload stream: state unknown, don't reuse
+            ftp.close()
+            raise
+        else:
+            self._release(key, ftp, home)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for ftp, _, _ in connections:
+                self._close(ftp)
+
+
+_pool = FtpPool()
+
+
 def list_ftp_files():
     """
     Return (status_code, [filenames]) and never raise.
     Accepts config keys: server_url | server | ftp_host, name | ftp_user, password | ftp_pass.
     """
-    cfg = get_config() or {}
-    host = cfg.get("server_url") or cfg.get("server") or cfg.get("ftp_host")
-    user = cfg.get("name") or cfg.get("ftp_user")
-    pwd  = cfg.get("password") or cfg.get("ftp_pass")
+    cfg = get_typed_config()
+    host = cfg.server
+    user = cfg.name
+    pwd  = cfg.password
 
     if not host or not user or not pwd:
         msg = "Missing FTP credentials (server/name/password)."
         logging.error(msg)
         return 400, []
 
+    global _listing_cache
+    with _listing_lock:
+        if _listing_cache is not None and time.monotonic() - _listing_cache[0] < FTP_LIST_TTL:
+            return 200, list(_listing_cache[1])
+
     try:
-        with ftplib.FTP(host, timeout=15) as ftp:
-            ftp.login(user=user, passwd=pwd)
+        with _pool.connection(host, user, pwd) as ftp:
             files = ftp.nlst()  # or a specific directory if needed
-            return 200, files
+        with _listing_lock:
+            _listing_cache = (time.monotonic(), list(files))
+        return 200, files
     except (ftplib.all_errors, socket.error) as e:
         logging.error(f"FTP error: {e}")
         return 502, []
@@ -36,6 +135,158 @@ def list_ftp_files():
         logging.exception("Unexpected FTP error")
         return 500, []
 
+def invalidate_ftp_listing():
+    """Forget the cached directory listing, e.g. after a file was uploaded."""
+    global _listing_cache
+    with _listing_lock:
+        _listing_cache = None
+
+def _change_to_target_dir(ftp, target_path):
+    """cwd into target_path, creating it (one level) if needed. Returns False on failure."""
+    if not target_path or target_path == '/':
+        return True
+    try:
+        ftp.cwd(target_path)
+        print(f"Changed directory to: {target_path} for upload.")
+        return True
+    except error_perm as e:
+        # Attempt to create directory if it doesn't exist
+        print(f"Directory '{target_path}' not found or permission error: {e}. Attempting to create it.")
+        try:
+            # ftplib doesn't have a direct way to create nested dirs,
+            # so this will only work for one level or if parent exists.
+            ftp.mkd(target_path)
+            print(f"Created directory: {target_path}")
+            ftp.cwd(target_path)
+            return True
+        except error_perm as e_mkd:
+            print(f"ERROR: Could not create or change to directory '{target_path}': {e_mkd}")
+            return False
+
+def _remote_size(ftp, remote_file_name):
+    """Size of a partially or fully uploaded file on the server, 0 if it doesn't exist."""
+    try:
+        return ftp.size(remote_file_name) or 0
+    except error_perm:
+        return 0
+
+def _partial_name(remote_file_name):
+    """Name the upload is written to until it is complete"""
+    return f"{remote_file_name}.part"
+
+def _move_into_place(ftp, partial_name, remote_file_name):
+    """Rename the finished upload to its final name, replacing an existing file."""
+    try:
+        ftp.rename(partial_name, remote_file_name)
+    except error_perm:
+        # Some servers refuse RNTO onto an existing file
+        try:
+            ftp.delete(remote_file_name)
+        except error_perm:
+            pass
+        ftp.rename(partial_name, remote_file_name)
+
+def _upload_event(status, sent, total, message, **extra):
+    progress = int(sent * 100 / total) if total else 100
+    payload = {
+        "step": "upload",
+        "status": status,
+        "progress": f"{progress:02d}",
+        "message": message,
+        "bytes_sent": sent,
+        "total_bytes": total,
+    }
+    payload.update(extra)
+    return payload
+
+def iter_upload_file_ftp(local_file_path, remote_file_name, remote_subdir=None):
+    """
+    Upload a file in chunks and yield NDJSON-style progress events
+    ({"step": "upload", "status", "progress", "bytes_sent", "bytes_per_sec", ...}).
+    The data goes to "<remote_file_name>.part", which is renamed once complete, so a
+    file under the final name is never partial. Only that .part file is resumed
+    with APPE; dropped connections are retried up to MAX_RETRIES times from
+    where they stopped. An existing file under the final name is replaced.
+    The last event has status "completed" or "failed".
+    """
+    ftp_config = get_typed_config()
+    if not ftp_config.has_ftp_credentials:
+        yield _upload_event("failed", 0, 0, "Missing FTP credentials (server/name/password).")
+        return
+
+    if not os.path.exists(local_file_path):
+        print(f"ERROR: Local file not found: {local_file_path}")
+        yield _upload_event("failed", 0, 0, f"Local file not found: {local_file_path}")
+        return
+
+    target_path = remote_subdir if remote_subdir is not None else ftp_config.default_remote_path
+    total = os.path.getsize(local_file_path)
+    attempt = 0
+
+    while True:
+        sent = 0
+        try:
+            with _pool.connection(ftp_config.server, ftp_config.name, ftp_config.password) as ftp:
+                print(f"Connected to FTP server: {ftp_config.server} for upload.")
+                if not _change_to_target_dir(ftp, target_path):
+                    yield _upload_event("failed", 0, total, f"Could not change to directory '{target_path}'")
+                    return
+
+                ftp.voidcmd('TYPE I')
+                partial_name = _partial_name(remote_file_name)
+                offset = _remote_size(ftp, partial_name)
+                if offset > total:
+                    offset = 0  # Left over from a different file - overwrite
+
+                if offset:
+                    print(f"Resuming upload of '{partial_name}' at byte {offset}.")
+                    yield _upload_event("in_progress", offset, total, f"Setze Upload bei {offset} Bytes fort…")
+                command = f'APPE {partial_name}' if offset else f'STOR {partial_name}'
+
+                with open(local_file_path, 'rb') as f_local:
+                    f_local.seek(offset)
+                    sent = offset
+                    started = last_report = time.monotonic()
+                    conn = ftp.transfercmd(command)
+                    try:
+                        while True:
+                            chunk = f_local.read(CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            chunk_started = time.monotonic()
+                            conn.sendall(chunk)
+                            now = time.monotonic()
+                            sent += len(chunk)
+                            if now - last_report >= REPORT_INTERVAL:
+                                last_report = now
+                                yield _upload_event(
+                                    "in_progress", sent, total, "Lade hoch…",
+                                    bytes_per_sec=int(len(chunk) / max(now - chunk_started, 1e-6)),
+                                    avg_bytes_per_sec=int((sent - offset) / max(now - started, 1e-6))
+                                )
+                    finally:
+                        conn.close()
+                    ftp.voidresp()
+
+                _move_into_place(ftp, partial_name, remote_file_name)
+
+            print(f"File '{remote_file_name}' uploaded successfully.")
+            invalidate_ftp_listing()
+            yield _upload_event("completed", total, total, "Upload abgeschlossen.")
+            return
+        except (ftplib.all_errors, socket.error) as e:
+            attempt += 1
+            print(f"FTP error during upload (attempt {attempt}/{MAX_RETRIES}): {e}")
+            if attempt > MAX_RETRIES:
+                yield _upload_event("failed", sent, total, f"FTP error during upload: {e}")
+                return
+            yield _upload_event("retrying", sent, total, f"Verbindung unterbrochen ({e}), neuer Versuch…")
+            time.sleep(min(2 ** attempt, 10))
+        except Exception as e:
+            print(f"An unexpected error occurred during FTP upload: {e}")
+            yield _upload_event("failed", sent, total, f"Unexpected error during FTP upload: {e}")
+            return
+
 def upload_file_ftp(local_file_path, remote_file_name, remote_subdir=None):
     """
     Uploads a local file to the FTP server in a specified subdirectory.
@@ -49,59 +300,10 @@ def upload_file_ftp(local_file_path, remote_file_name, remote_subdir=None):
     Returns:
         bool: True if upload was successful, False otherwise.
     """
-    ftp_config = get_config()
-    if not ftp_config:
-        return False
-
-    if not os.path.exists(local_file_path):
-        print(f"ERROR: Local file not found: {local_file_path}")
-        return False
-
-    server_url = ftp_config['server']
-    username = ftp_config['name']
-    password = ftp_config['password']
-    target_path = remote_subdir if remote_subdir is not None else ftp_config.get('default_remote_path', '/')
-
-
-    try:
-        with FTP(server_url) as ftp:
-            ftp.login(user=username, passwd=password)
-            print(f"Successfully connected to FTP server: {server_url} for upload.")
-
-            if target_path and target_path != '/':
-                try:
-                    ftp.cwd(target_path)
-                    print(f"Changed directory to: {target_path} for upload.")
-                except error_perm as e:
-                    # Attempt to create directory if it doesn't exist
-                    print(f"Directory '{target_path}' not found or permission error: {e}. Attempting to create it.")
-                    try:
-                        # ftplib doesn't have a direct way to create nested dirs,
-                        # so this will only work for one level or if parent exists.
-                        ftp.mkd(target_path)
-                        print(f"Created directory: {target_path}")
-                        ftp.cwd(target_path)
-                    except error_perm as e_mkd:
-                        print(f"ERROR: Could not create or change to directory '{target_path}': {e_mkd}")
-                        return False
-            
-            remote_full_path = os.path.join(ftp.pwd(), remote_file_name).replace('\\', '/') # Ensure forward slashes
-
-            with open(local_file_path, 'rb') as f_local:
-                print(f"Uploading '{local_file_path}' to '{remote_full_path}'...")
-                ftp.storbinary(f'STOR {remote_file_name}', f_local)
-            
-            print(f"File '{remote_file_name}' uploaded successfully to '{ftp.pwd()}'.")
-            return True
-    except ftplib.all_errors as e:
-        print(f"FTP error during upload: {e}")
-        return False
-    except FileNotFoundError: # Should be caught by pre-check, but good to have
-        print(f"ERROR: Local file not found during FTP operation: {local_file_path}")
-        return False
-    except Exception as e:
-        print(f"An unexpected error occurred during FTP upload: {e}")
-        return False
+    last_event = None
+    for last_event in iter_upload_file_ftp(local_file_path, remote_file_name, remote_subdir):
+        pass
+    return bool(last_event) and last_event["status"] == "completed"
 
 
 def refresh_website():
@@ -110,12 +312,8 @@ def refresh_website():
     Returns True if successful, False otherwise.
     """
     try:
-        config = get_config()
-        if not config:
-            print("ERROR: No config available for website refresh.")
-            return False
-        
-        update_url = config.get('update_url')
+        config = get_typed_config()
+        update_url = config.update_url
         if not update_url:
             print("WARNING: No 'update_url' found in config. Skipping website refresh.")
             return False
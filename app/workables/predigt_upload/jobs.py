@@ -0,0 +1,209 @@
+# Background jobs for the predigt pipeline (download -> compress -> ID3 tags -> finalize).
+# Progress is stored on the Predigt row, so clients can poll or re-attach to the
+# NDJSON stream while the work continues independently of any HTTP request.
+import logging
+import pathlib
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from app import db
+from app.models.predigt import Predigt
+from app.workables.predigt_upload.youtube import download_youtube_audio_from_url
+from app.workables.predigt_upload.audio import compress_audio, generate_id3_tags, transcode_audio
+from app.workables.config.manager import get_typed_config
+
+MAX_WORKERS = 2   # ffmpeg runs are CPU heavy, don't run too many at once
+MAX_PENDING = 8   # Queued + running jobs before new submissions are refused
+
+TERMINAL_STATUSES = ('processed', 'error')
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='predigt-job')
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+_live_lock = threading.Lock()
+_live_jobs = {}  # job_id -> _LiveJob, only while the job is queued or running
+
+
+class JobQueueFull(Exception):
+    """Raised when MAX_PENDING jobs are already queued or running."""
+
+
+class _LiveJob:
+    """In-memory event log of a running job, used to wake up attached streams."""
+    def __init__(self):
+        self.events = []
+        self.done = False
+        self.condition = threading.Condition()
+
+    def publish(self, event, done=False):
+        with self.condition:
+            self.events.append(event)
+            self.done = self.done or done
+            self.condition.notify_all()
+
+
+def _event(step, status, progress=None, message=None, **extra):
+    payload = {"step": step, "status": status}
+    if progress is not None:
+        payload["progress"] = f"{int(progress):02d}"
+    if message is not None:
+        payload["message"] = message
+    payload.update(extra)
+    return payload
+
+
+def submit_predigt_job(app, video_id, prediger, titel, datum_dt, output_dir):
+    """
+    Queue the pipeline for a video and return its job id.
+    If the video is already being processed, the running job's id is returned.
+    Raises JobQueueFull when the queue is full.
+    """
+    video_url = f"https://www.youtube.com/watch?v={video_id}"
+
+    predigt = Predigt.query.filter_by(youtube_url=video_url).first()
+    if predigt and predigt.job_id and is_job_live(predigt.job_id):
+        return predigt.job_id
+
+    if not _slots.acquire(blocking=False):
+        raise JobQueueFull(f"Es laufen bereits {MAX_PENDING} Verarbeitungen")
+
+    try:
+        if predigt is None:
+            predigt = Predigt(youtube_url=video_url)
+            db.session.add(predigt)
+
+        job_id = str(uuid.uuid4())
+        queued = _event("queued", "in_progress", 0, "In Warteschlange…", job_id=job_id)
+        predigt.job_id = job_id
+        predigt.youtube_video_id = video_id
+        predigt.title = titel or video_id
+        predigt.speaker = prediger
+        predigt.status = 'queued'
+        predigt.current_step = 'queued'
+        predigt.progress = 0
+        predigt.error_message = None
+        predigt.events = [queued]
+        predigt.updated_at = datetime.now(timezone.utc)
+        db.session.commit()
+
+        live = _LiveJob()
+        live.publish(queued)
+        with _live_lock:
+            _live_jobs[job_id] = live
+
+        _executor.submit(_run_job, app, job_id, video_url, prediger, titel, datum_dt, pathlib.Path(output_dir))
+        return job_id
+    except Exception:
+        db.session.rollback()
+        _slots.release()
+        raise
+
+
+def is_job_live(job_id):
+    with _live_lock:
+        return job_id in _live_jobs
+
+
+def get_live_job(job_id):
+    with _live_lock:
+        return _live_jobs.get(job_id)
+
+
+def _record(job_id, event, status=None, **fields):
+    """Persist a progress event on the Predigt row and publish it to attached streams."""
+    predigt = Predigt.query.filter_by(job_id=job_id).first()
+    if predigt is not None:
+        predigt.events = (predigt.events or []) + [event]
+        predigt.current_step = event.get("step")
+        if event.get("progress") is not None:
+            predigt.progress = int(event["progress"])
+        if status is not None:
+            predigt.status = status
+        for name, value in fields.items():
+            setattr(predigt, name, value)
+        predigt.updated_at = datetime.now(timezone.utc)
+        db.session.commit()
+
+    live = get_live_job(job_id)
+    if live is not None:
+        live.publish(event, done=status in TERMINAL_STATUSES)
+
+
+def _run_job(app, job_id, video_url, prediger, titel, datum_dt, output_dir):
+    with app.app_context():
+        try:
+            _run_pipeline(job_id, video_url, prediger, titel, datum_dt, output_dir)
+        except Exception as e:
+            logging.exception("Error in predigt job %s", job_id)
+            try:
+                db.session.rollback()
+                _record(job_id, _event("error", "failed", 0, f"Ein Fehler ist aufgetreten: {e}"),
+                        status='error', error_message=str(e))
+            except Exception:
+                logging.exception("Could not record failure of predigt job %s", job_id)
+        finally:
+            live = get_live_job(job_id)
+            if live is not None and not live.done:
+                live.publish(_event("error", "failed", 0, "Job beendet ohne Ergebnis."), done=True)
+            with _live_lock:
+                _live_jobs.pop(job_id, None)
+            _slots.release()
+
+
+def _run_pipeline(job_id, video_url, prediger, titel, datum_dt, output_dir):
+    single_pass = get_typed_config().single_pass_transcode
+    meta = {
+        "title": titel,
+        "speaker": prediger,
+        "date": datum_dt.strftime("%Y-%m-%d"),
+        "year": datum_dt.strftime("%Y"),
+        "album": "Predigten aus Treffpunkt Leben Karlsruhe",
+        "genre": "Predigt Online",
+    }
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir_p = pathlib.Path(temp_dir)
+
+        # 1) Download (single pass: keep the original audio stream, no 192k MP3 encode)
+        _record(job_id, _event("download", "in_progress", 5, "Starte Download…"), status='downloading')
+        downloaded_path = download_youtube_audio_from_url(video_url, extract_mp3=not single_pass)
+        downloaded_p = pathlib.Path(downloaded_path)
+        staged_p = temp_dir_p / downloaded_p.name
+        shutil.move(str(downloaded_p), staged_p)
+        _record(job_id, _event("download", "completed", 15, "Download abgeschlossen."),
+                status='downloaded', downloaded_at=datetime.now(timezone.utc))
+
+        if single_pass:
+            # 2+3) Compression, 128k encode and ID3 tags in one ffmpeg run
+            _record(job_id, _event("compress", "in_progress", 30, "Starte Kompression und Tagging…"))
+            compressed_p = temp_dir_p / "transcoded.mp3"
+            transcode_audio(str(staged_p), str(compressed_p), meta)
+            _record(job_id, _event("compress", "completed", 60, "Kompression abgeschlossen."),
+                    status='compressed', is_compressed=True, compressed_at=datetime.now(timezone.utc))
+            _record(job_id, _event("tags", "completed", 80, "ID3-Tags gesetzt."), status='tagged')
+        else:
+            # 2) Compress
+            _record(job_id, _event("compress", "in_progress", 30, "Starte Kompression…"))
+            compressed_p = compress_audio(str(staged_p))
+            _record(job_id, _event("compress", "completed", 60, "Kompression abgeschlossen."),
+                    status='compressed', is_compressed=True, compressed_at=datetime.now(timezone.utc))
+
+            # 3) Tagging
+            for evt in generate_id3_tags(str(compressed_p), meta):
+                _record(job_id, evt)
+            _record(job_id, _event("tags", "completed", 80, "ID3-Tags gesetzt."), status='tagged')
+
+        # 4) Finalize
+        final_name = f"predigt-{datum_dt.strftime('%Y-%m-%d')}_Treffpunkt_Leben_Karlsruhe.mp3"
+        _record(job_id, _event("finalize", "in_progress", 90, f"Benennen in {final_name}…"))
+        output_dir.mkdir(exist_ok=True)
+        final_p = output_dir / final_name
+        if final_p.exists():
+            final_p.unlink()
+        shutil.move(str(compressed_p), final_p)
+
+        _record(job_id, _event("complete", "completed", 100, "Verarbeitung abgeschlossen!", final_path=str(final_p)),
+                status='processed', local_file_path=str(final_p))
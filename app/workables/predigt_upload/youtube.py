@@ -6,22 +6,40 @@ from datetime import datetime
 from pathlib import Path
 import tempfile
 import os
+import threading
+import time
 import isodate
+from cachetools import TTLCache
 
-from app.workables.config.manager import get_config
+from app.workables.config.manager import get_typed_config
 from app.workables.predigt_upload.ffmpeg_setup import get_ffmpeg_path
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 import yt_dlp
 
 youtube_service = None
+_youtube_service_key = None  # API key the cached service was built with
+
+# Livestream listings are served from memory and refreshed in the background once
+# older than LISTING_TTL. search().list costs 100 quota units per call.
+LISTING_TTL = 300
+# Video details (snippet/contentDetails/liveStreamingDetails) of completed
+# livestreams rarely change; only ids missing here are sent to videos().list.
+VIDEO_TTL = 6 * 3600
+VIDEO_CACHE_SIZE = 512
+
+_cache_lock = threading.Lock()
+_listings = {}  # channel_id -> {'ids': [...], 'limit': n, 'fetched_at': monotonic}
+_refreshing = set()  # channel ids with a background refresh in flight
+_video_cache = TTLCache(maxsize=VIDEO_CACHE_SIZE, ttl=VIDEO_TTL)
 
 def _get_youtube_service():
-    global youtube_service
-    if youtube_service is not None:
+    global youtube_service, _youtube_service_key
+    api_key = get_typed_config().YOUTUBE_API_KEY
+    # Rebuild when the key changed in config.json
+    if youtube_service is not None and api_key == _youtube_service_key:
         return youtube_service
-    cfg = get_config() or {}
-    api_key = cfg.get("YOUTUBE_API_KEY")
+    _youtube_service_key = api_key
     if not api_key:
         logging.error("ERROR: YOUTUBE_API_KEY not found in configuration for Google API Client.")
         youtube_service = None
@@ -55,13 +73,110 @@ def _format_duration(sec: int | None) -> str | None:
     s = sec % 60
     return f"{h}:{m:02d}:{s:02d}" if h else f"{m}:{s:02d}"
 
+def _video_to_item(vid, v):
+    snip = v.get("snippet", {}) or {}
+    thumbs = snip.get("thumbnails") or {}
+    lsd = v.get("liveStreamingDetails", {}) or {}
+    cd = v.get("contentDetails", {}) or {}
+
+    # Prefer actualStartTime (fallback to publishedAt)
+    actual_start = (lsd.get("actualStartTime") or snip.get("publishedAt") or "")
+    date = actual_start[:10] if len(actual_start) >= 10 else None
+
+    # Best available thumbnail
+    t = thumbs.get("maxres") or thumbs.get("standard") or thumbs.get("high") or thumbs.get("medium") or thumbs.get("default") or {}
+    thumb_url = t.get("url")
+
+    iso = cd.get("duration")
+    dur_sec = _iso8601_to_seconds(iso)
+    dur_str = _format_duration(dur_sec)
+
+    return {
+        "id": vid,
+        "title": snip.get("title") or "",
+        "date": date,
+        "thumbnail_url": thumb_url,
+        "duration_seconds": dur_sec,
+        "duration_string": dur_str,
+    }
+
+def _fetch_video_details(yt, ids):
+    """Return {video_id: item} for the given ids, calling videos().list only for uncached ones."""
+    with _cache_lock:
+        details = {vid: _video_cache[vid] for vid in ids if vid in _video_cache}
+    missing = [vid for vid in ids if vid not in details]
+
+    # videos().list accepts at most 50 ids per call
+    for i in range(0, len(missing), 50):
+        vres = yt.videos().list(
+            part="snippet,contentDetails,liveStreamingDetails",
+            id=",".join(missing[i:i + 50])
+        ).execute()
+        fetched = {v["id"]: v for v in vres.get("items", [])}
+        with _cache_lock:
+            _video_cache.update(fetched)
+        details.update(fetched)
+    return details
+
+def _fetch_listing(channel_id, limit):
+    """Search the latest completed livestreams of a channel and store the ids in the listing cache."""
+    yt = _get_youtube_service()
+    if not yt:
+        return None
+
+    # Find completed livestreams (no Shorts, no uploads, no upcoming/live)
+    search_res = yt.search().list(
+        part="id",
+        channelId=channel_id,
+        type="video",
+        eventType="completed",   # ONLY previous livestreams
+        order="date",
+        maxResults=limit
+    ).execute()
+
+    items = search_res.get("items", [])
+    ids = [it.get("id", {}).get("videoId") for it in items if it.get("id", {}).get("videoId")]
+    # Warm the detail cache so the next page load needs no API call at all
+    _fetch_video_details(yt, ids)
+
+    listing = {'ids': ids, 'limit': limit, 'fetched_at': time.monotonic()}
+    with _cache_lock:
+        _listings[channel_id] = listing
+    return listing
+
+def _refresh_listing_async(channel_id, limit):
+    with _cache_lock:
+        if channel_id in _refreshing:
+            return
+        _refreshing.add(channel_id)
+
+    def run():
+        try:
+            _fetch_listing(channel_id, limit)
+        except Exception:
+            logging.exception("Background refresh of livestream listing failed")
+        finally:
+            with _cache_lock:
+                _refreshing.discard(channel_id)
+
+    threading.Thread(target=run, name=f"yt-listing-{channel_id}", daemon=True).start()
+
+def invalidate_livestream_cache(channel_id=None):
+    """Forget cached listings (all channels or one); video details stay cached."""
+    with _cache_lock:
+        if channel_id is None:
+            _listings.clear()
+        else:
+            _listings.pop(channel_id, None)
+
 def get_last_livestream_data(limit=7):
     """
     Returns ONLY completed livestreams as a list of dicts:
     { id, title, date, thumbnail_url, duration_seconds, duration_string }
+    Served from the per-channel cache; a stale listing is returned right away
+    and refreshed in the background.
     """
-    cfg = get_config() or {}
-    channel_id = cfg.get("channel_id")
+    channel_id = get_typed_config().channel_id
     yt = _get_youtube_service()
     if not yt:
         return []
@@ -70,59 +185,28 @@ def get_last_livestream_data(limit=7):
         logging.error("channel_id missing in config")
         return []
 
+    limit = min(int(limit or 7), 50)
     try:
-        # 1) Find completed livestreams (no Shorts, no uploads, no upcoming/live)
-        search_res = yt.search().list(
-            part="id",
-            channelId=channel_id,
-            type="video",
-            eventType="completed",   # ONLY previous livestreams
-            order="date",
-            maxResults=min(int(limit or 7), 50)
-        ).execute()
+        with _cache_lock:
+            listing = _listings.get(channel_id)
 
-        items = search_res.get("items", [])
-        ids = [it.get("id", {}).get("videoId") for it in items if it.get("id", {}).get("videoId")]
+        if listing is None or listing['limit'] < limit:
+            # Nothing usable cached yet: fetch synchronously
+            listing = _fetch_listing(channel_id, limit)
+            if listing is None:
+                return []
+        elif time.monotonic() - listing['fetched_at'] > LISTING_TTL:
+            _refresh_listing_async(channel_id, listing['limit'])
+
+        ids = listing['ids'][:limit]
         if not ids:
             return []
 
-        # 2) Fetch details (duration, thumbnails, title, actual times)
-        vres = yt.videos().list(
-            part="snippet,contentDetails,liveStreamingDetails",
-            id=",".join(ids)
-        ).execute()
-        details_by_id = {v["id"]: v for v in vres.get("items", [])}
+        # Details of the listed ids (normally all cached)
+        details_by_id = _fetch_video_details(yt, ids)
 
         # Preserve order from search
-        out = []
-        for vid in ids:
-            v = details_by_id.get(vid, {})
-            snip = v.get("snippet", {}) or {}
-            thumbs = snip.get("thumbnails") or {}
-            lsd = v.get("liveStreamingDetails", {}) or {}
-            cd = v.get("contentDetails", {}) or {}
-
-            # Prefer actualStartTime (fallback to publishedAt)
-            actual_start = (lsd.get("actualStartTime") or snip.get("publishedAt") or "")
-            date = actual_start[:10] if len(actual_start) >= 10 else None
-
-            # Best available thumbnail
-            t = thumbs.get("maxres") or thumbs.get("standard") or thumbs.get("high") or thumbs.get("medium") or thumbs.get("default") or {}
-            thumb_url = t.get("url")
-
-            iso = cd.get("duration")
-            dur_sec = _iso8601_to_seconds(iso)
-            dur_str = _format_duration(dur_sec)
-
-            out.append({
-                "id": vid,
-                "title": snip.get("title") or "",
-                "date": date,
-                "thumbnail_url": thumb_url,
-                "duration_seconds": dur_sec,
-                "duration_string": dur_str,
-            })
-        return out[: int(limit or 7)]
+        return [_video_to_item(vid, details_by_id.get(vid, {})) for vid in ids]
     except HttpError as e:
         logging.error(f"YouTube API error: {e}")
         return []
@@ -148,7 +232,12 @@ def _update_yt_dlp():
         logging.exception(f"Unexpected error updating yt-dlp: {e}")
         return False
 
-def download_youtube_audio_from_url(URL: str, retry_with_update: bool = True) -> str:
+def download_youtube_audio_from_url(URL: str, retry_with_update: bool = True, extract_mp3: bool = True) -> str:
+    """
+    Download the best audio stream of a video to a temp file and return its path.
+    With extract_mp3=False the stream is kept as delivered (m4a/webm/opus) so the
+    caller can transcode it in a single ffmpeg pass instead of encoding twice.
+    """
     temp_file = tempfile.NamedTemporaryFile(delete=False)
     base = temp_file.name
     temp_file.close()
@@ -167,7 +256,7 @@ def download_youtube_audio_from_url(URL: str, retry_with_update: bool = True) ->
             "key": "FFmpegExtractAudio",
             "preferredcodec": "mp3",
             "preferredquality": "192",
-        }],
+        }] if extract_mp3 else [],
         "keepvideo": False,
         "overwrites": True,
         "verbose": False,
@@ -181,8 +270,8 @@ def download_youtube_audio_from_url(URL: str, retry_with_update: bool = True) ->
         mp3 = Path(f"{base}.mp3")
         if mp3.exists():
             return str(mp3)
-        # Fallback: best-effort find something
-        for ext in (".m4a", ".webm", ".opus"):
+        # Fallback: best-effort find something (the raw stream when extract_mp3 is False)
+        for ext in (".m4a", ".webm", ".opus", ".mp4", ".ogg"):
             p = Path(f"{base}{ext}")
             if p.exists():
                 return str(p)
@@ -197,7 +286,7 @@ def download_youtube_audio_from_url(URL: str, retry_with_update: bool = True) ->
                 if _update_yt_dlp():
                     logging.info("Retrying download after yt-dlp update...")
                     # Retry once without update flag to prevent infinite loop
-                    return download_youtube_audio_from_url(URL, retry_with_update=False)
+                    return download_youtube_audio_from_url(URL, retry_with_update=False, extract_mp3=extract_mp3)
                 else:
                     logging.error("yt-dlp update failed, cannot retry download")
             raise
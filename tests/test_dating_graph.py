@@ -0,0 +1,127 @@
+from app import db
+from app.models.dating_graph import Category, GraphChange, Person
+
+
+def _create_category(client, name, color='#111111'):
+    response = client.post('/dating_graph/api/categories', json={'name': name, 'color': color})
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def _create_person(client, name, category_ids):
+    response = client.post('/dating_graph/api/persons', json={'name': name, 'category_ids': category_ids})
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def test_recolour_category_with_members(app, client):
+    category_id = _create_category(client, 'Hinge')
+    person_id = _create_person(client, 'Anna', [category_id])
+    version = client.get('/dating_graph/api/graph-data').get_json()['version']
+
+    response = client.put(f'/dating_graph/api/categories/{category_id}', json={'color': '#222222'})
+    assert response.status_code == 200
+    assert response.get_json()['color'] == '#222222'
+
+    diff = client.get(f'/dating_graph/api/graph-data?since={version}').get_json()
+    changed_edges = {edge['id']: edge for edge in diff['edges']['changed']}
+    assert changed_edges[f'person_{person_id}-cat_{category_id}']['color']['color'] == '#222222'
+
+
+def test_delete_category_with_members(app, client):
+    category_id = _create_category(client, 'Tinder')
+    person_id = _create_person(client, 'Berta', [category_id])
+    client.get('/dating_graph/api/statistics')  # Materialize the statistics row
+    version = client.get('/dating_graph/api/graph-data').get_json()['version']
+
+    response = client.delete(f'/dating_graph/api/categories/{category_id}')
+    assert response.status_code == 200
+
+    with app.app_context():
+        assert db.session.get(Category, category_id) is None
+        assert db.session.get(Person, person_id).categories == []
+
+    diff = client.get(f'/dating_graph/api/graph-data?since={version}').get_json()
+    assert f'cat_{category_id}' in diff['nodes']['removed']
+    assert f'person_{person_id}-cat_{category_id}' in diff['edges']['removed']
+
+    stats = client.get('/dating_graph/api/statistics').get_json()
+    assert stats['total_categories'] == 0
+    assert stats['total_connections'] == 0
+    assert stats['category_stats'] == []
+
+
+def test_statistics_follow_changes(app, client):
+    client.get('/dating_graph/api/statistics')
+    category_id = _create_category(client, 'Event')
+    person_id = _create_person(client, 'Clara', [category_id])
+    client.put(f'/dating_graph/api/persons/{person_id}', json={'status': 'dating'})
+
+    stats = client.get('/dating_graph/api/statistics').get_json()
+    assert stats['total_persons'] == 1
+    assert stats['total_connections'] == 1
+    assert stats['status_breakdown'] == {'dating': 1}
+    assert stats['category_stats'] == [{'name': 'Event', 'count': 1, 'color': '#111111'}]
+
+
+def test_position_saves_keep_analytics_cached(app, client, monkeypatch):
+    from app.blueprints.dating_graph import analytics
+    monkeypatch.setattr(analytics, '_analytics', None)
+    category_id = _create_category(client, 'Bumble')
+    person_id = _create_person(client, 'Dora', [category_id])
+    graph_version = client.get('/dating_graph/api/graph-data').get_json()['version']
+    analytics_version = client.get('/dating_graph/api/analytics/components').get_json()['version']
+
+    response = client.post('/dating_graph/api/graph-data/save-positions', json={'positions': {
+        f'person_{person_id}': {'x': 10, 'y': 20}, f'cat_{category_id}': {'x': -5, 'y': 0}
+    }})
+    assert response.get_json()['updated'] == 2
+
+    diff = client.get(f'/dating_graph/api/graph-data?since={graph_version}').get_json()
+    assert {node['id'] for node in diff['nodes']['changed']} == {f'person_{person_id}', f'cat_{category_id}'}
+    assert client.get('/dating_graph/api/analytics/components').get_json()['version'] == analytics_version
+
+    client.put(f'/dating_graph/api/persons/{person_id}', json={'name': 'Dorothea'})
+    components = client.get('/dating_graph/api/analytics/components').get_json()
+    assert components['version'] > analytics_version
+    assert components['components'][0]['persons'][0]['name'] == 'Dorothea'
+
+
+def test_repeated_moves_keep_one_change_per_node(app, client):
+    from app.blueprints.dating_graph.positions import write_positions
+    person_id = _create_person(client, 'Emma', [])
+    version = client.get('/dating_graph/api/graph-data').get_json()['version']
+
+    with app.app_context():
+        for x in range(5):
+            write_positions({f'person_{person_id}': (float(x), 1.0)})
+        assert GraphChange.query.filter_by(element_id=f'person_{person_id}', action='move').count() == 1
+
+    diff = client.get(f'/dating_graph/api/graph-data?since={version}').get_json()
+    assert diff['nodes']['changed'][0]['x'] == 4.0
+
+
+def test_pruned_change_log_sends_full_graph(app, client, monkeypatch):
+    from datetime import datetime, timedelta
+    from app.blueprints.dating_graph import versioning
+    _create_person(client, 'Frida', [])
+    with app.app_context():
+        GraphChange.query.update({'created_at': datetime.utcnow() - timedelta(days=60)})
+        db.session.commit()
+
+    monkeypatch.setattr(versioning, '_last_prune', None)
+    person_id = _create_person(client, 'Greta', [])
+    with app.app_context():
+        assert {change.element_id for change in GraphChange.query} == {f'person_{person_id}'}
+
+    data = client.get('/dating_graph/api/graph-data?since=0').get_json()
+    assert isinstance(data['nodes'], list) and len(data['nodes']) == 2
+
+
+def test_non_finite_positions_are_skipped():
+    from app.blueprints.dating_graph.positions import parse_positions
+    positions, skipped = parse_positions({
+        'person_1': {'x': 'nan', 'y': 1}, 'person_2': {'x': 1, 'y': 'inf'}, 'cat_3': {'x': '2.5', 'y': -1}
+    })
+    assert positions == {'cat_3': (2.5, -1.0)}
+    assert skipped == 2
@@ -0,0 +1,70 @@
+import threading
+from ftplib import FTP
+
+import pytest
+
+pytest.importorskip('pyftpdlib')
+from pyftpdlib.authorizers import DummyAuthorizer
+from pyftpdlib.handlers import FTPHandler
+from pyftpdlib.servers import FTPServer
+
+from app.workables.config.manager import Config
+from app.workables.predigt_upload import ftp_handler
+
+
+@pytest.fixture
+def ftp_root(tmp_path, monkeypatch):
+    """A pyftpdlib server on a free port, with the upload code pointed at it"""
+    root = tmp_path / 'ftp'
+    root.mkdir()
+    authorizer = DummyAuthorizer()
+    authorizer.add_user('user', 'secret', str(root), perm='elradfmw')
+    handler = type('Handler', (FTPHandler,), {'authorizer': authorizer})
+    server = FTPServer(('127.0.0.1', 0), handler)
+    port = server.address[1]
+    thread = threading.Thread(target=server.serve_forever, kwargs={'timeout': 0.1}, daemon=True)
+    thread.start()
+
+    def open_connection(host, user, pwd):
+        ftp = FTP(timeout=ftp_handler.FTP_TIMEOUT)
+        ftp.connect(host, port)
+        ftp.login(user=user, passwd=pwd)
+        return ftp, ftp.pwd()
+
+    pool = ftp_handler.FtpPool()
+    monkeypatch.setattr(pool, '_open', open_connection)
+    monkeypatch.setattr(ftp_handler, '_pool', pool)
+    monkeypatch.setattr(ftp_handler, 'get_typed_config',
+                        lambda: Config(server='127.0.0.1', name='user', password='secret'))
+    yield root
+    pool.close_all()
+    server.close_all()
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def local_file(tmp_path):
+    path = tmp_path / 'predigt.mp3'
+    path.write_bytes(bytes(range(256)) * 4096)
+    return path
+
+
+def test_resumes_partial_upload(ftp_root, local_file):
+    data = local_file.read_bytes()
+    (ftp_root / 'predigt.mp3.part').write_bytes(data[:300000])
+
+    events = list(ftp_handler.iter_upload_file_ftp(str(local_file), 'predigt.mp3'))
+
+    assert events[0]['status'] == 'in_progress' and events[0]['bytes_sent'] == 300000
+    assert events[-1]['status'] == 'completed'
+    assert (ftp_root / 'predigt.mp3').read_bytes() == data
+    assert not (ftp_root / 'predigt.mp3.part').exists()
+
+
+def test_overwrites_existing_file_of_same_size(ftp_root, local_file):
+    data = local_file.read_bytes()
+    (ftp_root / 'predigt.mp3').write_bytes(b'x' * len(data))
+
+    assert ftp_handler.upload_file_ftp(str(local_file), 'predigt.mp3')
+    assert (ftp_root / 'predigt.mp3').read_bytes() == data
+    assert not (ftp_root / 'predigt.mp3.part').exists()
@@ -0,0 +1,13 @@
+import io
+
+
+def test_unreadable_pdf_is_a_client_error(client):
+    response = client.post('/ocr/api/upload', data={'file': (io.BytesIO(b'not a pdf'), 'scan.pdf')},
+                           content_type='multipart/form-data')
+    file_id = response.get_json()['file_id']
+
+    response = client.post('/ocr/api/process', json={'file_id': file_id})
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Could not read PDF')
+
+    assert client.delete(f'/ocr/api/file/{file_id}').status_code == 200
@@ -0,0 +1,32 @@
+import uuid
+
+import pytest
+
+from app.blueprints.ocr import uploads
+
+
+@pytest.fixture
+def upload_folder(tmp_path, monkeypatch):
+    """An empty ocr_temp in tmp_path with a fresh registry and no sweeper thread"""
+    monkeypatch.setattr(uploads, 'OCR_UPLOAD_FOLDER', str(tmp_path))
+    monkeypatch.setattr(uploads, '_uploads', {})
+    monkeypatch.setattr(uploads, '_total_size', 0)
+    monkeypatch.setattr(uploads, '_loaded', False)
+    monkeypatch.setattr(uploads, '_sweeper', object())
+    return tmp_path
+
+
+def test_upload_saved_by_another_process_is_found(upload_folder):
+    assert uploads.get_upload('unknown') is None  # Scans ocr_temp once, like the first request of a worker
+    file_id = str(uuid.uuid4())
+    path = upload_folder / f'{file_id}.png'
+    path.write_bytes(b'\x89PNG')
+
+    record = uploads.get_upload(file_id)
+    assert record is not None and record.path == str(path) and record.type == 'png' and record.size == 4
+    assert uploads._total_size == 4
+
+    assert uploads.remove_upload(file_id)
+    assert not path.exists()
+    assert uploads.get_upload(file_id) is None
+    assert uploads._total_size == 0
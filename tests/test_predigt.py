@@ -0,0 +1,39 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import inspect
+
+from app import create_app, db
+
+
+@pytest.mark.parametrize('path', ['/predigt_upload/audio/jobs/abc', '/predigt_upload/audio/jobs/abc/stream'])
+def test_job_endpoints_require_login(client, path):
+    response = client.get(path)
+    assert response.status_code == 302
+    assert '/auth/login' in response.headers['Location']
+
+
+def test_existing_predigt_table_gets_job_columns(tmp_path):
+    path = tmp_path / 'old.db'
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            'CREATE TABLE predigt (id INTEGER PRIMARY KEY, title VARCHAR(255) NOT NULL, '
+            'youtube_url VARCHAR(255) NOT NULL UNIQUE, youtube_video_id VARCHAR(50), downloaded_at DATETIME, '
+            'local_file_path VARCHAR(512), is_compressed BOOLEAN, compressed_at DATETIME, '
+            'ftp_remote_path VARCHAR(512), uploaded_to_ftp_at DATETIME, status VARCHAR(50), error_message TEXT)'
+        )
+        connection.execute("INSERT INTO predigt (title, youtube_url) VALUES ('Alt', 'https://youtu.be/x')")
+
+    for _ in range(2):  # The upgrade runs on every start
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'TESTING': True})
+
+    with app.app_context():
+        inspector = inspect(db.engine)
+        columns = {column['name'] for column in inspector.get_columns('predigt')}
+        assert {'job_id', 'speaker', 'current_step', 'progress', 'events', 'updated_at'} <= columns
+        assert any(index['unique'] and index['column_names'] == ['job_id'] for index in inspector.get_indexes('predigt'))
+
+        from app.models.predigt import Predigt
+        predigt = Predigt.query.one()
+        assert predigt.title == 'Alt' and predigt.events is None
+        db.engine.dispose()
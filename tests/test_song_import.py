@@ -0,0 +1,57 @@
+import io
+import secrets
+import zipfile
+
+import pytest
+
+from app import db
+from app.blueprints.storage import song_catalog, song_import
+from app.models.storage import SongCatalogEntry
+from app.models.token import ApiToken
+
+SONG = "Title: Amazing Grace\nKey: G\n\n[Verse]\nG       C\nAmazing grace\n"
+
+
+@pytest.fixture
+def song_data(tmp_path, monkeypatch):
+    monkeypatch.setattr(song_import, 'SONG_DATA_FOLDER', str(tmp_path))
+    monkeypatch.setattr(song_catalog, 'SONG_DATA_FOLDER', str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def admin_headers(app):
+    token = secrets.token_urlsafe(32)
+    with app.app_context():
+        db.session.add(ApiToken(token=token, is_admin=True, is_active=True))
+        db.session.commit()
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _zip(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, text in entries.items():
+            archive.writestr(name, text)
+    buffer.seek(0)
+    return buffer
+
+
+def test_uploaded_zip_keeps_its_inner_layout(app, client, song_data, admin_headers):
+    response = client.post('/api/song_data/import', headers=admin_headers, content_type='multipart/form-data',
+                           data={'files': (_zip({'worship/amazing.txt': SONG}), 'library.zip')})
+    assert response.status_code == 200
+    assert [entry['path'] for entry in response.get_json()['report']] == ['worship/amazing.json']
+
+    assert (song_data / 'worship' / 'amazing.json').exists()
+    with app.app_context():
+        assert [entry.path.replace('\\', '/') for entry in SongCatalogEntry.query] == ['worship/amazing.json']
+
+
+def test_report_follows_input_order(app, song_data):
+    files = [('a.txt', SONG), ('too_big.txt', None), ('b.txt', SONG)]
+    with app.app_context():
+        report = song_import.import_songs(files, workers=1)
+    assert [(entry['source'], entry['status']) for entry in report] == [
+        ('a.txt', 'imported'), ('too_big.txt', 'error'), ('b.txt', 'imported')
+    ]